@@ -6,16 +6,93 @@ Cada agente tiene personalidad única y gestiona un proyecto específico
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from database import DatabaseManager
+from scheduler import TaskScheduler
+from fanout import build_fanout_graph
+from rate_limiter import TokenBucketRateLimiter, estimate_tokens
+from routing import ModelRouter
+from memory_index import build_agent_index, conversation_item
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 import os
 import json
+import threading
+import time
 
 # Configurar OpenAI API (ya está preconfigurada en el ambiente)
 llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.7)
 
+# Límite compartido de solicitudes/tokens por minuto (LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+rate_limiter = TokenBucketRateLimiter.from_env()
+
+
+_llm_clients = {}
+
+
+def get_llm_client(model, temperature):
+    """Cliente de chat para un modelo (el cliente por defecto se reutiliza)"""
+    if model == llm.model_name and temperature == llm.temperature:
+        return llm
+    key = (model, temperature)
+    if key not in _llm_clients:
+        _llm_clients[key] = ChatOpenAI(model=model, temperature=temperature)
+    return _llm_clients[key]
+
+
+def invoke_llm(messages, client=None):
+    """Invoca el LLM respetando el límite de tasa compartido (espera en lugar de fallar)"""
+    client = client or llm
+    estimated = 0
+    if rate_limiter.enabled:
+        estimated = estimate_tokens([message.content for message in messages], model=client.model_name)
+        rate_limiter.acquire(tokens=estimated)
+    response = client.invoke(messages)
+    usage = getattr(response, 'usage_metadata', None)
+    if rate_limiter.enabled and usage:
+        rate_limiter.adjust_tokens(estimated, usage.get('total_tokens'))
+    return response
+
+
+# Elección de modelo por agente según prioridad, tamaño del prompt y resultados previos
+router = ModelRouter.from_env(client_factory=get_llm_client, invoke=invoke_llm)
+
+
+def subtask_specs(result, parent=None):
+    """Convierte las subtareas (y sus dependencias) de una respuesta en especificaciones de tareas hijas.
+    
+    Las dependencias vienen como {"3": [1, 2]} (números de subtarea, desde 1);
+    solo se conservan las que apuntan a subtareas anteriores.
+    """
+    dependencies = result.get('dependencias') or {}
+    if not isinstance(dependencies, dict):
+        dependencies = {}
+    specs = []
+    positions = {}  # Número de subtarea -> índice en specs
+    for number, subtask in enumerate(result.get('subtareas') or [], 1):
+        title = subtask.get('titulo') if isinstance(subtask, dict) else subtask
+        title = str(title or '').strip()
+        if not title:
+            continue
+        depends_on = []
+        for dependency in dependencies.get(str(number)) or []:
+            try:
+                dependency = int(dependency)
+            except (TypeError, ValueError):
+                continue
+            if dependency < number and dependency in positions:
+                depends_on.append(positions[dependency])
+        description = f"Subtarea de: {parent['title']}\n\n{parent.get('description') or ''}" if parent else None
+        positions[number] = len(specs)
+        specs.append({'title': title[:200], 'description': description, 'depends_on': depends_on})
+    return specs
+
+
 class BaseAgent:
     """Clase base para todos los agentes"""
     
+    # Recuerdos relevantes incluidos en el prompt (MEMORY_TOP_K, MEMORY_MAX_TOKENS)
+    memory_top_k = int(os.getenv("MEMORY_TOP_K", "8"))
+    memory_max_tokens = int(os.getenv("MEMORY_MAX_TOKENS", "600"))
+    
     def __init__(self, agent_id, project, personality, db_manager):
         self.agent_id = agent_id
         self.project = project
@@ -28,9 +105,77 @@ class BaseAgent:
             project=project,
             personality_traits=personality
         )
+        
+        # Índice de relevancia sobre toda la memoria (se construye en segundo plano)
+        self._memory_index = None
+        self._memory_index_pending = None  # Entradas registradas durante la construcción
+        self._memory_index_lock = threading.Lock()
+        self._memory_index_ready = threading.Event()
+        threading.Thread(
+            target=self._build_memory_index, name=f'memory-index-{agent_id}', daemon=True
+        ).start()
     
-    def get_system_prompt(self):
-        """Genera el prompt del sistema basado en la personalidad"""
+    @property
+    def memory_index(self):
+        """Índice TF-IDF del historial y las decisiones completas del agente (None mientras se construye)"""
+        return self._memory_index
+    
+    def wait_memory_index(self, timeout=None):
+        """Espera a que el índice esté listo; True si lo está"""
+        return self._memory_index_ready.wait(timeout)
+    
+    def _build_memory_index(self):
+        try:
+            # La lectura va bajo el bloqueo: lo que se registre después queda en pendientes
+            with self._memory_index_lock:
+                items = self.db.get_memory_items(self.agent_id) or {}
+                self._memory_index_pending = []
+            index = build_agent_index(items.get('conversation_history'), items.get('decisions_made'))
+            with self._memory_index_lock:
+                index.add_many(self._memory_index_pending)
+                self._memory_index_pending = None
+                self._memory_index = index
+            self._memory_index_ready.set()
+        except Exception as e:
+            # Sin índice el prompt usa las últimas decisiones
+            with self._memory_index_lock:
+                self._memory_index_pending = None
+            self.db.log_event(
+                event_type='memory_index_error',
+                agent_id=self.agent_id,
+                description=f"No se pudo construir el índice de memoria: {e}",
+                error=True
+            )
+    
+    def remember(self, conversation_history):
+        """Registra una entrada del historial y la agrega al índice de relevancia"""
+        with self._memory_index_lock:
+            self.db.update_agent_memory(agent_id=self.agent_id, conversation_history=conversation_history)
+            text, display = conversation_item(conversation_history)
+            entries = [(text, {'kind': 'conversation', 'text': display})]
+            if self._memory_index is not None:
+                self._memory_index.add_many(entries)
+            elif self._memory_index_pending is not None:
+                # El índice se está construyendo desde una lectura anterior a esta entrada
+                self._memory_index_pending.extend(entries)
+    
+    def recall(self, query):
+        """Recuerdos más relevantes para la consulta, dentro del presupuesto de tokens"""
+        index = self._memory_index
+        if not query or index is None:
+            return []
+        return index.select(query, k=self.memory_top_k, max_tokens=self.memory_max_tokens)
+    
+    def get_system_prompt(self, query=None):
+        """Genera el prompt del sistema basado en la personalidad y en los recuerdos relevantes para la consulta"""
+        relevant = self.recall(query)
+        if relevant:
+            memory_section = "MEMORIA RELEVANTE:\n" + "\n".join(f"- {item['text']}" for item in relevant)
+        else:
+            # Sin consulta, sin coincidencias o con el índice en construcción: las últimas decisiones
+            memory_section = "DECISIONES RECIENTES:\n" + json.dumps(
+                self.memory.get('decisions_made', [])[-3:], indent=2, ensure_ascii=False
+            )
         return f"""Eres {self.agent_id}, un agente especializado en {self.project}.
 
 PERSONALIDAD:
@@ -39,15 +184,14 @@ PERSONALIDAD:
 CONTEXTO ACTUAL:
 {self.memory.get('context', 'Sin contexto previo')}
 
-DECISIONES RECIENTES:
-{json.dumps(self.memory.get('decisions_made', [])[-3:], indent=2, ensure_ascii=False)}
+{memory_section}
 
 Tu objetivo es gestionar tareas de manera efectiva manteniendo tu personalidad única.
 Siempre proporciona respuestas estructuradas, accionables y alineadas con tu rol."""
     
     def process_task(self, task):
         """Procesa una tarea y genera una respuesta"""
-        system_prompt = self.get_system_prompt()
+        system_prompt = self.get_system_prompt(query=f"{task['title']} {task.get('description') or ''}")
         
         user_message = f"""TAREA: {task['title']}
 
@@ -67,23 +211,31 @@ Responde en formato JSON con esta estructura:
     "analisis": "tu análisis de la tarea",
     "plan_accion": ["paso 1", "paso 2", "paso 3"],
     "subtareas": ["subtarea 1", "subtarea 2"],
+    "dependencias": {{"2": [1]}},
     "proximos_pasos": ["paso inmediato 1", "paso inmediato 2"],
     "estado_sugerido": "pending|in_progress|completed",
     "notas": "observaciones adicionales"
-}}"""
+}}
+
+En "dependencias" indica, por número de subtarea, de qué subtareas anteriores depende (omite las independientes)."""
         
+        started = time.perf_counter()
         try:
-            response = llm.invoke([
+            response, tier = router.invoke(self.agent_id, [
                 SystemMessage(content=system_prompt),
                 HumanMessage(content=user_message)
-            ])
+            ], priority=task.get('priority'))
+            latency_ms = (time.perf_counter() - started) * 1000
             
             # Parsear respuesta
-            result = json.loads(response.content)
+            try:
+                result = json.loads(response.content)
+            except ValueError:
+                router.record_failure(self.agent_id, tier)
+                raise
             
             # Registrar en memoria
-            self.db.update_agent_memory(
-                agent_id=self.agent_id,
+            self.remember(
                 conversation_history={
                     'timestamp': datetime.utcnow().isoformat(),
                     'task_id': task['id'],
@@ -97,12 +249,22 @@ Responde en formato JSON con esta estructura:
                 agent_id=self.agent_id,
                 task_id=task['id'],
                 description=f"Tarea procesada: {task['title']}",
-                metadata=result
+                metadata=result,
+                duration_ms=latency_ms
             )
             
             return result
             
         except Exception as e:
+            self.db.log_event(
+                event_type='task_error',
+                agent_id=self.agent_id,
+                task_id=task['id'],
+                description=f"Error al procesar la tarea: {task['title']}",
+                metadata={'error': str(e)},
+                duration_ms=(time.perf_counter() - started) * 1000,
+                error=True
+            )
             return {
                 "error": str(e),
                 "analisis": "Error al procesar la tarea",
@@ -115,17 +277,16 @@ Responde en formato JSON con esta estructura:
     
     def chat(self, message):
         """Conversa con el agente"""
-        system_prompt = self.get_system_prompt()
+        system_prompt = self.get_system_prompt(query=message)
         
         try:
-            response = llm.invoke([
+            response, _ = router.invoke(self.agent_id, [
                 SystemMessage(content=system_prompt),
                 HumanMessage(content=message)
             ])
             
             # Registrar conversación
-            self.db.update_agent_memory(
-                agent_id=self.agent_id,
+            self.remember(
                 conversation_history={
                     'timestamp': datetime.utcnow().isoformat(),
                     'user_message': message,
@@ -230,20 +391,36 @@ class MentorEmprendedor(BaseAgent):
 class ProjectCoordinator:
     """Coordinador que gestiona todos los agentes"""
     
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, scheduler=None, subtask_workers=4):
         self.db = db_manager
         self.agents = {
             'ConsorcioOpt': OptimizadorConsorcio(db_manager),
             'SocialConsorcio': SocialManagerConsorcio(db_manager),
             'SocialEmprendedores': MentorEmprendedor(db_manager)
         }
+        self.scheduler = scheduler or TaskScheduler()
+        self.subtask_workers = subtask_workers
+        self._fanout_graphs = {}
+        self._dispatcher_stop = threading.Event()
+        self._dispatcher_thread = None
     
-    def assign_task(self, task):
-        """Asigna una tarea al agente apropiado"""
+    def assign_task(self, task, run_subtasks=False, claim=True):
+        """Asigna una tarea al agente apropiado (con run_subtasks=True también ejecuta sus subtareas).
+        
+        Con claim=True la tarea se reclama de forma atómica: si otro hilo o
+        worker (p.ej. el despachador de la cola) ya la tomó, no se procesa.
+        """
         project = task['project']
         if project in self.agents:
             agent = self.agents[project]
             
+            if claim and not self.db.claim_task(task['id'], agent.agent_id):
+                return {
+                    'task_id': task['id'],
+                    'agent': agent.agent_id,
+                    'error': 'La tarea ya fue tomada por otro proceso'
+                }
+            
             # Actualizar tarea con agente asignado
             self.db.update_task(
                 task['id'],
@@ -255,23 +432,263 @@ class ProjectCoordinator:
             result = agent.process_task(task)
             
             # Actualizar tarea con resultados
-            self.db.update_task(
+            updated = self.db.update_task(
                 task['id'],
                 notes=json.dumps(result, ensure_ascii=False),
                 subtasks=result.get('subtareas', []),
                 status=result.get('estado_sugerido', 'in_progress')
             )
+            if updated:
+                self.db.notify('task.processed', {'task': updated, 'agent': agent.agent_id, 'result': result})
             
-            return {
+            response = {
                 'task_id': task['id'],
                 'agent': agent.agent_id,
                 'result': result
             }
+            if run_subtasks and not result.get('error'):
+                self.materialize_subtasks(task, result)
+                response['subtasks'] = self.run_subtasks(task['id'])
+            return response
         else:
             return {
                 'error': f'No hay agente disponible para el proyecto {project}'
             }
     
+    def fan_out_task(self, task, projects):
+        """Procesa una tarea en paralelo con los agentes de varios proyectos y combina sus planes"""
+        projects = list(dict.fromkeys(projects))
+        unknown = [project for project in projects if project not in self.agents]
+        if unknown or not projects:
+            return {
+                'error': f'No hay agente disponible para los proyectos {", ".join(unknown) or "(ninguno)"}'
+            }
+        
+        key = tuple(projects)
+        if key not in self._fanout_graphs:
+            self._fanout_graphs[key] = build_fanout_graph(self.agents, projects)
+        graph = self._fanout_graphs[key]
+        
+        agent_ids = [self.agents[project].agent_id for project in projects]
+        owner = self.agents.get(task['project'], self.agents[projects[0]])
+        if not self.db.claim_task(task['id'], owner.agent_id):
+            return {'task_id': task['id'], 'error': 'La tarea ya fue tomada por otro proceso'}
+        self.db.update_task(
+            task['id'],
+            assigned_agent=owner.agent_id,
+            status='in_progress'
+        )
+        
+        started = time.perf_counter()
+        state = graph.invoke({'task': task, 'results': {}})
+        merged = state['merged']
+        
+        # Persistir el plan combinado
+        metadata = dict(task.get('metadata') or {})
+        metadata['fan_out'] = {'projects': projects, 'agents': agent_ids}
+        updated = self.db.update_task(
+            task['id'],
+            notes=json.dumps(merged, ensure_ascii=False),
+            subtasks=merged['subtareas'],
+            status=merged['estado_sugerido'],
+            extra_data=metadata
+        )
+        if updated:
+            self.db.notify('task.processed', {'task': updated, 'agent': owner.agent_id, 'result': merged})
+        self.db.log_event(
+            event_type='task_fanout_merged',
+            agent_id=owner.agent_id,
+            task_id=task['id'],
+            description=f"Plan combinado de {', '.join(agent_ids)}: {task['title']}",
+            metadata={'projects': projects},
+            duration_ms=(time.perf_counter() - started) * 1000
+        )
+        
+        return {
+            'task_id': task['id'],
+            'agents': agent_ids,
+            'results': {self.agents[project].agent_id: state['results'][project] for project in projects},
+            'merged': merged
+        }
+    
+    # --- SUBTAREAS ---
+    
+    def materialize_subtasks(self, task, result=None):
+        """Crea las subtareas propuestas por el agente como tareas hijas (solo la primera vez)"""
+        existing = self.db.get_subtasks(task['id'])
+        if existing:
+            return existing
+        if result is None:
+            try:
+                result = json.loads(task.get('notes') or '')
+            except ValueError:
+                return []
+        specs = subtask_specs(result, parent=task)
+        if not specs:
+            return []
+        return self.db.create_subtasks(task['id'], specs) or []
+    
+    def run_subtasks(self, task_id, max_workers=None):
+        """Procesa las subtareas pendientes en paralelo respetando sus dependencias.
+        
+        Cada subtarea se lanza en cuanto terminan las que necesita, así que el
+        plan completo tarda lo que su camino crítico. Las que dependen de una
+        subtarea bloqueada se bloquean sin llamar al LLM. El estado de la tarea
+        padre se actualiza a partir del de sus subtareas.
+        """
+        children = {child['id']: child for child in self.db.get_subtasks(task_id)}
+        finished = {child_id: child['status'] for child_id, child in children.items() if child['status'] != 'pending'}
+        waiting = {child_id: child for child_id, child in children.items() if child_id not in finished}
+        results = {}
+        started = time.perf_counter()
+        
+        with ThreadPoolExecutor(max_workers=max_workers or self.subtask_workers) as pool:
+            running = {}
+            while waiting or running:
+                for child_id, child in self._ready_subtasks(children, waiting, finished, results):
+                    # La cola no toma subtareas: run_subtasks es el único que las procesa
+                    running[pool.submit(self.assign_task, child, claim=False)] = child_id
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    child_id = running.pop(future)
+                    try:
+                        results[child_id] = future.result()
+                        child = self.db.get_task(child_id)
+                        finished[child_id] = child['status'] if child else 'blocked'
+                    except Exception as e:
+                        results[child_id] = {'task_id': child_id, 'error': str(e)}
+                        finished[child_id] = 'blocked'
+        
+        parent = self.db.get_task(task_id)
+        if results:
+            self.db.log_event(
+                event_type='subtasks_processed',
+                agent_id=parent.get('assigned_agent') if parent else None,
+                task_id=task_id,
+                description=f"Subtareas procesadas: {len(results)} de {len(children)}",
+                metadata={'statuses': finished},
+                duration_ms=(time.perf_counter() - started) * 1000
+            )
+        return {
+            'task_id': task_id,
+            'status': parent['status'] if parent else None,
+            'subtasks': self.db.get_subtasks(task_id),
+            'results': results
+        }
+    
+    def _ready_subtasks(self, children, waiting, finished, results):
+        """Saca de `waiting` las subtareas listas para ejecutarse; bloquea las que ya no pueden"""
+        ready = []
+        changed = True
+        while changed:
+            changed = False
+            for child_id, child in list(waiting.items()):
+                # Dependencias eliminadas (fuera de `children`) se ignoran
+                dependencies = [d for d in child.get('depends_on') or [] if d in children]
+                if any(finished.get(d) == 'blocked' for d in dependencies):
+                    del waiting[child_id]
+                    self.db.update_task(child_id, status='blocked', notes='Bloqueada: depende de una subtarea bloqueada')
+                    finished[child_id] = 'blocked'
+                    results[child_id] = {'task_id': child_id, 'error': 'Dependencia bloqueada'}
+                    changed = True
+                elif all(d in finished for d in dependencies):
+                    del waiting[child_id]
+                    ready.append((child_id, child))
+        return ready
+    
+    # --- PLANIFICACIÓN ---
+    
+    def enqueue_task(self, task):
+        """Encola una tarea para ser procesada por el planificador"""
+        return self.scheduler.enqueue(task)
+    
+    def enqueue_pending_tasks(self):
+        """Encola las tareas pendientes que ningún agente tomó todavía"""
+        tasks = self.db.get_all_tasks(status='pending')
+        # get_all_tasks ordena de la más nueva a la más antigua; las subtareas las ejecuta run_subtasks.
+        # Las ya procesadas pueden seguir en 'pending' (estado sugerido por el agente): tienen assigned_agent
+        return sum(
+            1 for task in reversed(tasks)
+            if not task.get('parent_id') and not task.get('assigned_agent') and self.scheduler.enqueue(task)
+        )
+    
+    def dispatch_next(self):
+        """Asigna la próxima tarea elegida por el planificador"""
+        while True:
+            task_id = self.scheduler.next_task()
+            if task_id is None:
+                return None
+            task = self.db.get_task(task_id)
+            # La tarea pudo haber sido eliminada o procesada mientras esperaba
+            if not task or task['status'] != 'pending' or task.get('assigned_agent'):
+                continue
+            agent = self.agents.get(task['project'])
+            # Otro hilo o worker (cada uno con su propia cola) pudo haberla tomado primero
+            if agent is None or self.db.claim_task(task_id, agent.agent_id):
+                break
+        
+        started = time.monotonic()
+        try:
+            return self.assign_task(task, claim=False)
+        finally:
+            self.scheduler.record_usage(task['project'], time.monotonic() - started)
+    
+    def process_queue(self, max_tasks=None):
+        """Procesa la cola hasta vaciarla o alcanzar max_tasks"""
+        results = []
+        while max_tasks is None or len(results) < max_tasks:
+            result = self.dispatch_next()
+            if result is None:
+                break
+            results.append(result)
+        return results
+    
+    def start_dispatcher(self, poll_interval=1.0, rescan_interval=None):
+        """Procesa la cola en un hilo de fondo.
+        
+        Con `rescan_interval` (segundos) vuelve a encolar periódicamente las
+        tareas pendientes sin agente, así también se procesan las encoladas por
+        otros workers; por defecto no lo hace.
+        """
+        if self._dispatcher_thread is None:
+            self._dispatcher_stop.clear()
+            self._dispatcher_thread = threading.Thread(
+                target=self._dispatch_loop, args=(poll_interval, rescan_interval),
+                name='task-dispatcher', daemon=True
+            )
+            self._dispatcher_thread.start()
+        return self._dispatcher_thread
+    
+    def stop_dispatcher(self, timeout=None):
+        self._dispatcher_stop.set()
+        if self._dispatcher_thread is not None:
+            self._dispatcher_thread.join(timeout)
+            self._dispatcher_thread = None
+    
+    def _dispatch_loop(self, poll_interval, rescan_interval):
+        next_rescan = time.monotonic() + rescan_interval if rescan_interval else None
+        while not self._dispatcher_stop.is_set():
+            try:
+                if next_rescan is not None and time.monotonic() >= next_rescan:
+                    self.enqueue_pending_tasks()
+                    next_rescan = time.monotonic() + rescan_interval
+                if self.dispatch_next() is None:
+                    self._dispatcher_stop.wait(poll_interval)
+            except Exception as e:
+                self.db.log_event(
+                    event_type='task_error',
+                    agent_id=None,
+                    description=f"Error en el despachador de la cola: {e}",
+                    error=True
+                )
+                self._dispatcher_stop.wait(poll_interval)
+    
+    def get_scheduler_stats(self):
+        """Obtiene estadísticas de la cola de tareas"""
+        return self.scheduler.get_stats()
+    
     def get_agent(self, project):
         """Obtiene un agente específico"""
         return self.agents.get(project)
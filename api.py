@@ -3,15 +3,25 @@ API REST para el Sistema Multi-Agente
 Permite control externo desde otras IAs o aplicaciones
 """
 
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, Header, File, UploadFile, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+import atexit
+import json
+import os
+import random
 import uvicorn
 
-from database import DatabaseManager
-from agents import ProjectCoordinator
+from backup import import_ndjson, iter_export
+from coalescing import SingleFlight
+from database import BACKUP_TABLES, WEBHOOK_EVENTS, DatabaseManager, IdempotencyKeyConflict
+from partitioning import PartitionedDatabaseManager
+from agents import ProjectCoordinator, rate_limiter, router
+from profiling import ProfileStore, profile_request, track_thread
+from webhooks import WebhookDispatcher, validate_url
 
 # Inicializar FastAPI
 app = FastAPI(
@@ -29,9 +39,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Perfilado opt-in: header X-Debug-Profile o una fracción de las solicitudes (PROFILE_SAMPLE_RATE)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+profile_store = ProfileStore(
+    max_profiles=int(os.getenv("PROFILE_MAX_STORED", "50")),
+    directory=os.getenv("PROFILE_DIR") or None
+)
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    """Perfila la solicitud si lo pide el cliente o si cae en la muestra"""
+    requested = request.headers.get("X-Debug-Profile", "").lower() in ("1", "true", "yes")
+    sampled = PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+    if (requested or sampled) and not request.url.path.startswith("/api/profiles"):
+        return await profile_request(request, call_next, profile_store, interval=PROFILE_INTERVAL)
+    return await call_next(request)
+
 # Inicializar sistema
-db = DatabaseManager()
-coordinator = ProjectCoordinator(db)
+# Segundos durante los que un envío con el mismo contenido devuelve la tarea existente
+DEDUP_WINDOW_SECONDS = float(os.getenv("TASK_DEDUP_WINDOW_SECONDS", "0"))
+if os.getenv("DB_PARTITION_DIR"):
+    # Una base SQLite por proyecto en DB_PARTITION_DIR
+    db = PartitionedDatabaseManager(os.getenv("DB_PARTITION_DIR"), dedup_window_seconds=DEDUP_WINDOW_SECONDS)
+else:
+    db = DatabaseManager(dedup_window_seconds=DEDUP_WINDOW_SECONDS)
+# Subtareas que se procesan a la vez al ejecutar el plan de una tarea
+coordinator = ProjectCoordinator(db, subtask_workers=int(os.getenv("SUBTASK_MAX_WORKERS", "4")))
+
+# Encolar al iniciar las tareas pendientes sin agente de ejecuciones anteriores (o importadas): opcional,
+# porque cada una pasa por el LLM
+if os.getenv("QUEUE_RESUME_PENDING", "0") == "1":
+    coordinator.enqueue_pending_tasks()
+# Procesar la cola en segundo plano (QUEUE_POLL_SECONDS=0 lo desactiva: solo POST /api/coordinate/dispatch).
+# QUEUE_RESCAN_SECONDS > 0 vuelve a encolar periódicamente las pendientes sin agente (varios workers)
+QUEUE_POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "1"))
+QUEUE_RESCAN_SECONDS = float(os.getenv("QUEUE_RESCAN_SECONDS", "0"))
+if QUEUE_POLL_SECONDS > 0:
+    coordinator.start_dispatcher(poll_interval=QUEUE_POLL_SECONDS, rescan_interval=QUEUE_RESCAN_SECONDS or None)
+
+# Webhooks: los cambios de tareas se entregan en segundo plano, en lotes por suscripción
+webhook_dispatcher = WebhookDispatcher(
+    db,
+    batch_size=int(os.getenv("WEBHOOK_BATCH_SIZE", "50")),
+    flush_interval=float(os.getenv("WEBHOOK_FLUSH_INTERVAL", "0.5")),
+    max_attempts=int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+)
+db.add_listener(webhook_dispatcher.enqueue)
+webhook_dispatcher.start()
+atexit.register(webhook_dispatcher.stop)
+
+# Lecturas costosas: las solicitudes idénticas simultáneas comparten un cálculo (READ_CACHE_TTL_MS > 0 reutiliza el resultado)
+read_coalescer = SingleFlight(ttl=float(os.getenv("READ_CACHE_TTL_MS", "0")) / 1000)
+# Los cambios de tareas desde cualquier hilo (p.ej. el despachador de la cola) descartan lo calculado
+db.add_listener(lambda event_type, data: read_coalescer.invalidate())
+
+@app.middleware("http")
+async def invalidate_reads_middleware(request: Request, call_next):
+    """Tras una escritura (tareas, logs, memoria) las lecturas siguientes no reutilizan resultados anteriores"""
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        read_coalescer.invalidate()
+    return response
 
 # --- MODELOS PYDANTIC ---
 
@@ -42,6 +111,9 @@ class TaskCreate(BaseModel):
     priority: str = Field(default="medium", description="Prioridad: low, medium, high, urgent")
     metadata: Optional[Dict[str, Any]] = Field(default=None, description="Metadatos adicionales")
 
+class FanOutTaskCreate(TaskCreate):
+    projects: List[str] = Field(..., description="Proyectos cuyos agentes procesan la tarea en paralelo")
+
 class TaskUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -55,6 +127,27 @@ class ChatMessage(BaseModel):
 class ContextUpdate(BaseModel):
     context: str = Field(..., description="Nuevo contexto para el agente")
 
+class RoutingPolicyUpdate(BaseModel):
+    priority_tiers: Optional[Dict[str, str]] = Field(default=None, description="Nivel (small, standard, large) por prioridad")
+    small_prompt_tokens: Optional[int] = Field(default=None, description="Prompts con hasta estos tokens bajan un nivel (0 lo desactiva)")
+    large_prompt_tokens: Optional[int] = Field(default=None, description="Prompts desde estos tokens suben un nivel (0 lo desactiva)")
+    max_error_rate: Optional[float] = Field(default=None, description="Tasa de error a partir de la cual la ruta se degrada")
+    slow_latency_ms: Optional[float] = Field(default=None, description="Latencia a partir de la cual la ruta se degrada")
+    retry_after_seconds: Optional[float] = Field(default=None, description="Segundos tras los que una ruta degradada vuelve a probarse")
+
+class WebhookCreate(BaseModel):
+    url: str = Field(..., description="URL que recibe los eventos (POST JSON)")
+    project: Optional[str] = Field(default=None, description="Solo eventos de este proyecto (todos si se omite)")
+    event_types: Optional[List[str]] = Field(default=None, description="Tipos de evento: " + ", ".join(WEBHOOK_EVENTS) + " (todos si se omite)")
+    secret: Optional[str] = Field(default=None, description="Clave para firmar las entregas (HMAC-SHA256)")
+
+class SchedulerConfig(BaseModel):
+    priority_weights: Optional[Dict[str, float]] = Field(default=None, description="Peso por prioridad: low, medium, high, urgent")
+    project_shares: Optional[Dict[str, float]] = Field(default=None, description="Fracción relativa de capacidad LLM por proyecto")
+    aging_seconds: Optional[float] = Field(default=None, description="Segundos de espera que suman un punto de prioridad")
+    fairness_weight: Optional[float] = Field(default=None, description="Intensidad de la penalización por consumo excesivo")
+    usage_half_life: Optional[float] = Field(default=None, description="Vida media (segundos) del consumo registrado")
+
 # --- ENDPOINTS DE SALUD ---
 
 @app.get("/")
@@ -89,8 +182,21 @@ async def health_check():
 # --- ENDPOINTS DE TAREAS ---
 
 @app.post("/api/tasks", response_model=Dict[str, Any])
-async def create_task(task: TaskCreate):
-    """Crear una nueva tarea"""
+async def create_task(
+    task: TaskCreate,
+    queue: bool = False,
+    subtasks: bool = False,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
+):
+    """Crear una nueva tarea (con queue=true se encola en el planificador).
+    
+    Con subtasks=true las subtareas propuestas por el agente se crean como
+    tareas hijas y se procesan en paralelo respetando sus dependencias.
+    
+    Los reintentos con el mismo Idempotency-Key, o con el mismo contenido dentro
+    de la ventana TASK_DEDUP_WINDOW_SECONDS, devuelven la tarea ya creada sin
+    volver a procesarla.
+    """
     try:
         # Validar proyecto
         valid_projects = ['ConsorcioOpt', 'SocialConsorcio', 'SocialEmprendedores']
@@ -101,25 +207,61 @@ async def create_task(task: TaskCreate):
             )
         
         # Crear tarea en base de datos
-        new_task = db.create_task(
-            project=task.project,
-            title=task.title,
-            description=task.description,
-            priority=task.priority,
-            metadata=task.metadata
-        )
+        try:
+            new_task, created = db.submit_task(
+                project=task.project,
+                title=task.title,
+                description=task.description,
+                priority=task.priority,
+                metadata=task.metadata,
+                idempotency_key=idempotency_key
+            )
+        except IdempotencyKeyConflict as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        
+        if not created:
+            return {
+                "success": True,
+                "task": new_task,
+                "agent_response": _stored_agent_response(new_task),
+                "duplicate": True
+            }
+        
+        if queue:
+            coordinator.enqueue_task(new_task)
+            return {
+                "success": True,
+                "task": new_task,
+                "queued": True
+            }
         
         # Asignar automáticamente al agente
-        result = coordinator.assign_task(new_task)
+        result = coordinator.assign_task(new_task, run_subtasks=subtasks)
         
         return {
             "success": True,
             "task": new_task,
             "agent_response": result
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _stored_agent_response(task):
+    """Reconstruye la respuesta del agente guardada en las notas (None si aún no terminó)"""
+    if not task.get('assigned_agent') or not task.get('notes'):
+        return None
+    try:
+        result = json.loads(task['notes'])
+    except (TypeError, ValueError):
+        return None
+    return {
+        'task_id': task['id'],
+        'agent': task['assigned_agent'],
+        'result': result
+    }
+
 @app.get("/api/tasks", response_model=List[Dict[str, Any]])
 async def get_all_tasks(project: Optional[str] = None, status: Optional[str] = None):
     """Obtener todas las tareas con filtros opcionales"""
@@ -176,13 +318,41 @@ async def delete_task(task_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/tasks/{task_id}/subtasks", response_model=List[Dict[str, Any]])
+async def get_subtasks(task_id: str):
+    """Obtener las subtareas (tareas hijas) de una tarea"""
+    try:
+        if not db.get_task(task_id):
+            raise HTTPException(status_code=404, detail="Tarea no encontrada")
+        return db.get_subtasks(task_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/tasks/{task_id}/subtasks/run", response_model=Dict[str, Any])
+def run_subtasks(task_id: str, max_workers: Optional[int] = None):
+    """Crea (si aún no existen) y procesa las subtareas pendientes de una tarea ya procesada"""
+    track_thread()
+    try:
+        task = db.get_task(task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="Tarea no encontrada")
+        if not coordinator.materialize_subtasks(task):
+            raise HTTPException(status_code=400, detail="La tarea no tiene subtareas propuestas")
+        return coordinator.run_subtasks(task_id, max_workers=max_workers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # --- ENDPOINTS DE AGENTES ---
 
 @app.get("/api/agents", response_model=Dict[str, Any])
 async def get_all_agents():
     """Obtener estado de todos los agentes"""
     try:
-        return coordinator.get_all_agents_status()
+        return await read_coalescer.run("agents", coordinator.get_all_agents_status)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -299,30 +469,33 @@ async def get_project_tasks(project_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _project_status(project_id):
+    tasks = db.get_all_tasks(project=project_id)
+    
+    status_count = {}
+    for task in tasks:
+        status = task['status']
+        status_count[status] = status_count.get(status, 0) + 1
+    
+    agent = coordinator.get_agent(project_id)
+    agent_memory = db.get_agent_memory(agent.agent_id) if agent else None
+    
+    return {
+        "project_id": project_id,
+        "total_tasks": len(tasks),
+        "tasks_by_status": status_count,
+        "agent_status": {
+            "agent_id": agent.agent_id if agent else None,
+            "last_active": agent_memory.get('last_active') if agent_memory else None,
+            "total_completed": agent_memory.get('total_tasks_completed', 0) if agent_memory else 0
+        }
+    }
+
 @app.get("/api/projects/{project_id}/status", response_model=Dict[str, Any])
 async def get_project_status(project_id: str):
     """Obtener estado de un proyecto"""
     try:
-        tasks = db.get_all_tasks(project=project_id)
-        
-        status_count = {}
-        for task in tasks:
-            status = task['status']
-            status_count[status] = status_count.get(status, 0) + 1
-        
-        agent = coordinator.get_agent(project_id)
-        agent_memory = db.get_agent_memory(agent.agent_id) if agent else None
-        
-        return {
-            "project_id": project_id,
-            "total_tasks": len(tasks),
-            "tasks_by_status": status_count,
-            "agent_status": {
-                "agent_id": agent.agent_id if agent else None,
-                "last_active": agent_memory.get('last_active') if agent_memory else None,
-                "total_completed": agent_memory.get('total_tasks_completed', 0) if agent_memory else 0
-            }
-        }
+        return await read_coalescer.run("project_status", _project_status, project_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -341,18 +514,79 @@ async def manually_assign_task(task_id: str = Body(...), project: str = Body(...
             db.update_task(task_id, project=project)
             task = db.get_task(task_id)
         
-        result = coordinator.assign_task(task)
+        # Una tarea sin agente se reclama (la cola podría tomarla a la vez); una ya asignada se vuelve a procesar
+        result = coordinator.assign_task(task, claim=not task.get('assigned_agent'))
         return result
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/coordinate/fanout", response_model=Dict[str, Any])
+def fan_out_task(task: FanOutTaskCreate):
+    """Crear una tarea y procesarla en paralelo con los agentes de varios proyectos"""
+    # Sincrónico: las llamadas al LLM corren en el threadpool, no bloquean el event loop
+    track_thread()
+    try:
+        invalid = [p for p in [task.project] + task.projects if not coordinator.get_agent(p)]
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Proyectos inválidos: {', '.join(invalid)}")
+        
+        new_task = db.create_task(
+            project=task.project,
+            title=task.title,
+            description=task.description,
+            priority=task.priority,
+            metadata=task.metadata
+        )
+        
+        result = coordinator.fan_out_task(new_task, task.projects)
+        
+        return {
+            "success": True,
+            "task": db.get_task(new_task['id']),
+            "agent_response": result
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/coordinate/dispatch", response_model=Dict[str, Any])
+def dispatch_queued_tasks(max_tasks: int = 1):
+    """Procesar las próximas tareas de la cola según el planificador"""
+    track_thread()
+    try:
+        results = coordinator.process_queue(max_tasks=max_tasks)
+        return {
+            "dispatched": len(results),
+            "results": results,
+            "remaining": len(coordinator.scheduler)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/coordinate/scheduler", response_model=Dict[str, Any])
+async def get_scheduler_stats():
+    """Obtener profundidad de cola y tiempos de espera por prioridad"""
+    try:
+        return coordinator.get_scheduler_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/api/coordinate/scheduler", response_model=Dict[str, Any])
+async def configure_scheduler(config: SchedulerConfig):
+    """Actualizar pesos y parámetros del planificador"""
+    try:
+        return coordinator.scheduler.configure(**config.dict())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/coordinate/report", response_model=Dict[str, Any])
 async def get_system_report():
     """Obtener reporte general del sistema"""
     try:
-        return coordinator.generate_report()
+        return await read_coalescer.run("report", coordinator.generate_report)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -367,6 +601,235 @@ async def get_system_logs(limit: int = 50, agent_id: Optional[str] = None, event
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- ENDPOINTS DE WEBHOOKS ---
+
+@app.post("/api/webhooks", response_model=Dict[str, Any])
+async def create_webhook(webhook: WebhookCreate):
+    """Suscribirse a eventos de tareas (por proyecto y/o tipo de evento)"""
+    try:
+        try:
+            validate_url(webhook.url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        unknown = [event_type for event_type in webhook.event_types or [] if event_type not in WEBHOOK_EVENTS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Tipos de evento desconocidos: {', '.join(unknown)}")
+        if webhook.project and webhook.project not in coordinator.agents:
+            raise HTTPException(status_code=404, detail="Proyecto no encontrado")
+        subscription = db.create_webhook(
+            webhook.url, project=webhook.project, event_types=webhook.event_types, secret=webhook.secret
+        )
+        webhook_dispatcher.refresh_subscriptions()
+        return subscription
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/webhooks", response_model=List[Dict[str, Any]])
+async def list_webhooks():
+    """Listar las suscripciones a webhooks"""
+    try:
+        return db.get_webhooks()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/webhooks/{subscription_id}")
+async def delete_webhook(subscription_id: str):
+    """Eliminar una suscripción"""
+    try:
+        if not db.delete_webhook(subscription_id):
+            raise HTTPException(status_code=404, detail="Suscripción no encontrada")
+        webhook_dispatcher.refresh_subscriptions()
+        return {"success": True, "message": "Suscripción eliminada"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/webhooks/stats", response_model=Dict[str, Any])
+async def get_webhook_stats():
+    """Eventos encolados, entregados, reintentados y fallidos del despachador"""
+    try:
+        return webhook_dispatcher.get_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/webhooks/dead-letters", response_model=List[Dict[str, Any]])
+async def get_dead_letters(limit: int = 50, subscription_id: Optional[str] = None):
+    """Eventos que no se pudieron entregar tras agotar los reintentos"""
+    try:
+        return db.get_dead_letters(limit=limit, subscription_id=subscription_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/webhooks/dead-letters/{dead_letter_id}/retry", response_model=Dict[str, Any])
+async def retry_dead_letter(dead_letter_id: str):
+    """Volver a encolar un evento fallido para su suscripción"""
+    try:
+        dead_letter = db.get_dead_letter(dead_letter_id)
+        if not dead_letter:
+            raise HTTPException(status_code=404, detail="Evento fallido no encontrado")
+        if not webhook_dispatcher.redeliver(dead_letter):
+            raise HTTPException(status_code=409, detail="La suscripción ya no existe")
+        db.delete_dead_letter(dead_letter_id)
+        return {"success": True, "event_id": dead_letter['event_id']}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- ENDPOINTS DE MÉTRICAS ---
+
+@app.get("/api/llm/routes", response_model=Dict[str, Any])
+async def get_routing_stats():
+    """Obtener latencia, errores y costo estimado por agente y nivel de modelo"""
+    try:
+        return router.get_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/api/llm/routes/{project}", response_model=Dict[str, Any])
+async def update_routing_policy(project: str, policy: RoutingPolicyUpdate):
+    """Ajustar la política de enrutamiento de modelos de un agente"""
+    try:
+        agent = coordinator.get_agent(project)
+        if not agent:
+            raise HTTPException(status_code=404, detail="Agente no encontrado")
+        updated = router.set_policy(agent.agent_id, **policy.dict(exclude_none=True))
+        updated['priority_tiers'] = {str(k): v for k, v in updated['priority_tiers'].items()}
+        return updated
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/llm/rate-limit", response_model=Dict[str, Any])
+async def get_rate_limit_stats():
+    """Obtener límites configurados y esperas acumuladas del limitador del LLM"""
+    try:
+        return rate_limiter.get_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/stats/coalescing", response_model=Dict[str, Any])
+async def get_coalescing_stats():
+    """Solicitudes de lectura ejecutadas frente a agrupadas o servidas desde la micro-caché"""
+    try:
+        return read_coalescer.get_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/stats/timeseries", response_model=List[Dict[str, Any]])
+async def get_timeseries(
+    granularity: str = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    agent_id: Optional[str] = None,
+    event_type: Optional[str] = None
+):
+    """Throughput, latencia y tasa de error por agente y tipo de evento (desde agregados)"""
+    try:
+        return db.get_timeseries(
+            granularity=granularity,
+            start=start,
+            end=end,
+            agent_id=agent_id,
+            event_type=event_type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- ENDPOINTS DE PERFILADO ---
+
+@app.get("/api/profiles", response_model=List[Dict[str, Any]])
+async def list_profiles():
+    """Listar los perfiles de solicitudes más recientes"""
+    return profile_store.list()
+
+@app.get("/api/profiles/{profile_id}")
+async def download_profile(profile_id: str):
+    """Descargar un perfil en formato colapsado (entrada de flamegraph.pl / speedscope)"""
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return PlainTextResponse(
+        profile['collapsed'],
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.collapsed"'}
+    )
+
+# --- ENDPOINTS DE BÚSQUEDA ---
+
+@app.get("/api/search", response_model=Dict[str, Any])
+async def search(
+    q: str,
+    scope: str = "all",
+    project: Optional[str] = None,
+    status: Optional[str] = None,
+    event_type: Optional[str] = None,
+    limit: int = 20
+):
+    """Búsqueda de texto completo en tareas (título, descripción, notas) y logs"""
+    try:
+        if scope not in ("all", "tasks", "logs"):
+            raise HTTPException(status_code=400, detail="scope debe ser all, tasks o logs")
+        
+        results = {"query": q, "tasks": [], "logs": []}
+        if scope in ("all", "tasks"):
+            results["tasks"] = db.search_tasks(q, project=project, status=status, limit=limit)
+        if scope in ("all", "logs"):
+            # Los logs no guardan proyecto: se filtra por el agente que lo gestiona
+            agent = coordinator.get_agent(project) if project else None
+            if project and not agent:
+                results["logs"] = []
+            else:
+                results["logs"] = db.search_logs(
+                    q,
+                    agent_id=agent.agent_id if agent else None,
+                    event_type=event_type,
+                    limit=limit
+                )
+        return results
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- ENDPOINTS DE RESPALDO ---
+
+@app.get("/api/export")
+async def export_data(tables: Optional[str] = None, compress: Optional[str] = None):
+    """Exportar tareas, memoria y logs como NDJSON en streaming (compress=zstd opcional)"""
+    selected = tables.split(",") if tables else list(BACKUP_TABLES)
+    invalid = [t for t in selected if t not in BACKUP_TABLES]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Tablas inválidas: {', '.join(invalid)}")
+    if compress not in (None, "zstd"):
+        raise HTTPException(status_code=400, detail="compress solo admite zstd")
+    
+    filename = "export.ndjson" + (".zst" if compress else "")
+    return StreamingResponse(
+        iter_export(db, tables=selected, compress=bool(compress)),
+        media_type="application/zstd" if compress else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/api/import", response_model=Dict[str, Any])
+def import_data(file: UploadFile = File(...), batch_size: int = 1000):
+    """Importar un archivo NDJSON (plano o zstd) en transacciones por lotes"""
+    track_thread()
+    try:
+        counts = import_ndjson(db, file.file, batch_size=batch_size)
+        return {"success": True, "imported": counts}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # --- MAIN ---
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+"""
+Exportación e Importación NDJSON
+Copias de seguridad y migraciones en streaming de tareas, memoria de agentes y logs
+"""
+
+from datetime import datetime
+import io
+import json
+
+from sqlalchemy import DateTime
+import zstandard
+
+from database import BACKUP_TABLES
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def iter_ndjson(db, tables=None, batch_size=1000):
+    """Genera líneas NDJSON ({"table": ..., "row": {...}}) en bytes, con memoria constante"""
+    for table_name in tables or BACKUP_TABLES:
+        for row in db.iter_rows(table_name, batch_size=batch_size):
+            line = json.dumps({'table': table_name, 'row': row}, ensure_ascii=False, default=_json_default)
+            yield line.encode('utf-8') + b'\n'
+
+
+def iter_export(db, tables=None, compress=False, batch_size=1000, chunk_size=1 << 16):
+    """Genera la exportación en bloques de ~chunk_size bytes, opcionalmente comprimida con zstd"""
+    compressor = zstandard.ZstdCompressor(level=3).compressobj() if compress else None
+    buffer = []
+    buffered = 0
+    for line in iter_ndjson(db, tables=tables, batch_size=batch_size):
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= chunk_size:
+            chunk = b''.join(buffer)
+            buffer, buffered = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def export_ndjson(db, fileobj, tables=None, compress=False, batch_size=1000):
+    """Escribe la exportación en un archivo binario; devuelve los bytes escritos"""
+    written = 0
+    for chunk in iter_export(db, tables=tables, compress=compress, batch_size=batch_size):
+        fileobj.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def _open_lines(fileobj):
+    """Devuelve un lector de texto, descomprimiendo zstd si corresponde"""
+    start = fileobj.tell()
+    magic = fileobj.read(4)
+    fileobj.seek(start)
+    stream = fileobj
+    if magic == ZSTD_MAGIC:
+        stream = zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True, closefd=False)
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+
+def _decode_row(table_name, row):
+    """Convierte las fechas ISO de vuelta a datetime según las columnas de la tabla"""
+    table = BACKUP_TABLES[table_name]['model'].__table__
+    decoded = {}
+    for column in table.columns:
+        if column.name not in row:
+            continue
+        value = row[column.name]
+        if isinstance(column.type, DateTime) and isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        decoded[column.name] = value
+    return decoded
+
+
+def import_ndjson(db, fileobj, batch_size=1000):
+    """Carga una exportación NDJSON (plana o zstd) en transacciones por lotes.
+    
+    Las filas existentes se actualizan (upsert por id, o por agent_id en la
+    memoria de agentes). Devuelve la cantidad de filas importadas por tabla.
+    """
+    counts = {table_name: 0 for table_name in BACKUP_TABLES}
+    batches = {table_name: [] for table_name in BACKUP_TABLES}
+    lines = _open_lines(fileobj)
+    try:
+        for line_number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            table_name = record.get('table')
+            if table_name not in BACKUP_TABLES:
+                raise ValueError(f"Línea {line_number}: tabla desconocida {table_name!r}")
+            batch = batches[table_name]
+            batch.append(_decode_row(table_name, record['row']))
+            if len(batch) >= batch_size:
+                # Primero las tablas anteriores (tareas y memoria): con particiones,
+                # los logs y el historial se ubican según la memoria del agente
+                for previous in BACKUP_TABLES:
+                    if previous == table_name:
+                        break
+                    counts[previous] += db.bulk_upsert(previous, batches[previous])
+                    batches[previous].clear()
+                counts[table_name] += db.bulk_upsert(table_name, batch)
+                batch.clear()
+    finally:
+        # No cerrar el archivo del llamador
+        lines.detach()
+    for table_name, batch in batches.items():
+        counts[table_name] += db.bulk_upsert(table_name, batch)
+    return counts
@@ -0,0 +1,4 @@
+"""
+Benchmarks del Sistema Multi-Agente
+Bases sintéticas y mediciones repetibles de las operaciones de DatabaseManager
+"""
@@ -0,0 +1,80 @@
+"""
+Comparación de Resultados de Benchmarks
+Uso: python -m benchmarks.compare base.json nuevo.json [--threshold 10]
+
+Muestra la variación de p50 y throughput por operación y modo; termina con
+código 1 si alguna operación empeoró más que el umbral.
+"""
+
+import argparse
+import json
+import sys
+
+
+def _key(result):
+    return (result['operation'], result['mode'], result['workers'])
+
+
+def _change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(base, current, threshold=10.0):
+    """Devuelve filas (clave, p50 antes/después, ops/s antes/después, regresión)"""
+    previous = {_key(result): result for result in base['results']}
+    rows = []
+    for result in current['results']:
+        old = previous.get(_key(result))
+        if old is None:
+            continue
+        p50_change = _change(old['p50_ms'], result['p50_ms'])
+        ops_change = _change(old['ops_per_sec'], result['ops_per_sec'])
+        regression = (p50_change is not None and p50_change > threshold) or \
+                     (ops_change is not None and ops_change < -threshold)
+        rows.append({
+            'key': _key(result),
+            'p50_ms': (old['p50_ms'], result['p50_ms'], p50_change),
+            'ops_per_sec': (old['ops_per_sec'], result['ops_per_sec'], ops_change),
+            'errors': (old['errors'], result['errors']),
+            'regression': regression
+        })
+    return rows
+
+
+def _format_change(change):
+    return f"{change:+7.1f}%" if change is not None else '     n/a'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dos archivos de resultados de benchmarks")
+    parser.add_argument('base', help="Resultados de referencia (p.ej. del commit anterior)")
+    parser.add_argument('current', help="Resultados nuevos")
+    parser.add_argument('--threshold', type=float, default=10.0, help="Variación (%%) considerada regresión")
+    args = parser.parse_args()
+
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+    if base.get('dataset') != current.get('dataset'):
+        print(f"⚠ Los datasets difieren: {base.get('dataset')} vs {current.get('dataset')}")
+
+    print(f"{base.get('git_commit')} -> {current.get('git_commit')}")
+    rows = compare(base, current, threshold=args.threshold)
+    for row in rows:
+        operation, mode, workers = row['key']
+        old_p50, new_p50, p50_change = row['p50_ms']
+        old_ops, new_ops, ops_change = row['ops_per_sec']
+        marker = '✗' if row['regression'] else ' '
+        print(f"{marker} {operation:<22} {mode:<9} x{workers:<3} "
+              f"p50 {old_p50 or 0:>9.2f} -> {new_p50 or 0:>9.2f} ms {_format_change(p50_change)}   "
+              f"{old_ops or 0:>9.1f} -> {new_ops or 0:>9.1f} ops/s {_format_change(ops_change)}")
+    regressions = sum(row['regression'] for row in rows)
+    print(f"{len(rows)} mediciones comparadas, {regressions} regresiones (umbral {args.threshold}%)")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
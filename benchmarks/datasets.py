@@ -0,0 +1,186 @@
+"""
+Bases de Datos Sintéticas para Benchmarks
+Genera (y reutiliza) bases SQLite con tareas, memorias con historial largo y logs
+"""
+
+from datetime import datetime, timedelta
+import json
+import os
+import random
+import shutil
+import time
+
+from database import DatabaseManager
+
+PROJECTS = ['ConsorcioOpt', 'SocialConsorcio', 'SocialEmprendedores']
+AGENTS = {
+    'ConsorcioOpt': 'OptimizadorConsorcio',
+    'SocialConsorcio': 'SocialManagerConsorcio',
+    'SocialEmprendedores': 'MentorEmprendedor'
+}
+STATUSES = ['pending', 'in_progress', 'completed', 'blocked']
+STATUS_WEIGHTS = [0.3, 0.25, 0.4, 0.05]
+PRIORITIES = ['low', 'medium', 'high', 'urgent']
+PRIORITY_WEIGHTS = [0.2, 0.5, 0.25, 0.05]
+EVENT_TYPES = ['task_created', 'task_assigned', 'task_processed', 'task_updated', 'task_error']
+EVENT_WEIGHTS = [0.25, 0.25, 0.3, 0.15, 0.05]
+
+WORDS = (
+    'consorcio expensas pagos proveedores liquidación presupuesto asamblea reclamo mantenimiento '
+    'contenido publicación campaña audiencia engagement calendario métricas alcance seguidores '
+    'emprendedor financiamiento validación mercado modelo negocio clientes ventas mentoría pitch '
+    'análisis plan riesgo prioridad revisión propuesta documento reunión seguimiento entrega '
+    'proceso sistema datos reporte optimización estrategia objetivo semana equipo costo'
+).split()
+
+# Fecha de referencia fija: la misma semilla genera exactamente los mismos datos
+REFERENCE_TIME = datetime(2025, 1, 1)
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choices(WORDS, k=words))
+
+
+def synthetic_result(rng):
+    """Resultado JSON con la forma que devuelven los agentes (~1-2 KB)"""
+    return {
+        'analisis': _sentence(rng, rng.randint(60, 160)),
+        'plan_accion': [_sentence(rng, 10) for _ in range(rng.randint(3, 6))],
+        'subtareas': [_sentence(rng, 5) for _ in range(rng.randint(1, 4))],
+        'proximos_pasos': [_sentence(rng, 7) for _ in range(rng.randint(1, 3))],
+        'estado_sugerido': rng.choices(STATUSES[:3], weights=[0.2, 0.5, 0.3])[0],
+        'notas': _sentence(rng, 25)
+    }
+
+
+def dataset_name(tasks, logs, history, seed):
+    return f'bench_t{tasks}_l{logs}_h{history}_s{seed}.db'
+
+
+def _generate(path, tasks, logs, history, seed, processed_ratio, batch_size, verbose):
+    rng = random.Random(seed)
+    db = DatabaseManager(f'sqlite:///{path}')
+    now = REFERENCE_TIME
+    span_seconds = 90 * 24 * 3600
+    started = time.perf_counter()
+
+    def progress(label, done, total):
+        if verbose and (done == total or done % (batch_size * 20) == 0):
+            print(f"  {label}: {done}/{total} ({time.perf_counter() - started:.0f}s)", flush=True)
+
+    # Tareas: una fracción ya procesada, con el resultado del LLM en las notas
+    task_ids = []
+    batch = []
+    for i in range(tasks):
+        project = rng.choice(PROJECTS)
+        created_at = now - timedelta(seconds=rng.randint(0, span_seconds))
+        status = rng.choices(STATUSES, weights=STATUS_WEIGHTS)[0]
+        processed = rng.random() < processed_ratio
+        result = synthetic_result(rng) if processed else None
+        row = {
+            'id': f'{seed:04d}-{i:010d}',
+            'project': project,
+            'title': _sentence(rng, rng.randint(3, 8)).capitalize(),
+            'description': _sentence(rng, rng.randint(10, 40)),
+            'status': status,
+            'priority': rng.choices(PRIORITIES, weights=PRIORITY_WEIGHTS)[0],
+            'assigned_agent': AGENTS[project] if processed else None,
+            'created_at': created_at,
+            'updated_at': created_at + timedelta(seconds=rng.randint(0, 3600)),
+            'completed_at': created_at + timedelta(seconds=rng.randint(60, 86400)) if status == 'completed' else None,
+            'notes': json.dumps(result, ensure_ascii=False) if result else None,
+            'subtasks': result['subtareas'] if result else [],
+            'extra_data': {}
+        }
+        task_ids.append(row['id'])
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.bulk_upsert('tasks', batch)
+            batch = []
+            if i + 1 < tasks:
+                progress('tareas', i + 1, tasks)
+    db.bulk_upsert('tasks', batch)
+    progress('tareas', tasks, tasks)
+
+    # Memoria de agentes con historial largo
+    for project, agent_id in AGENTS.items():
+        entries = [
+            {
+                'timestamp': (now - timedelta(seconds=rng.randint(0, span_seconds))).isoformat(),
+                'task_id': rng.choice(task_ids) if task_ids else None,
+                'response': synthetic_result(rng)
+            }
+            for _ in range(history)
+        ]
+        entries.sort(key=lambda entry: entry['timestamp'])
+        db.bulk_upsert('agent_memory', [{
+            'id': f'{seed:04d}-{agent_id}',
+            'agent_id': agent_id,
+            'project': project,
+            'context': _sentence(rng, 30),
+            'personality_traits': {},
+            'conversation_history': entries,
+            'decisions_made': [_sentence(rng, 12) for _ in range(min(history, 200))],
+            'last_active': now,
+            'total_tasks_completed': history,
+            'extra_data': {}
+        }])
+
+    # Logs: los task_processed llevan el resultado completo, como en BaseAgent.process_task
+    batch = []
+    agent_ids = list(AGENTS.values())
+    for i in range(logs):
+        event_type = rng.choices(EVENT_TYPES, weights=EVENT_WEIGHTS)[0]
+        metadata = {}
+        if event_type == 'task_processed' and rng.random() < processed_ratio:
+            metadata = synthetic_result(rng)
+        elif event_type == 'task_error':
+            metadata = {'error': 'Timeout al llamar al modelo'}
+        batch.append({
+            'id': f'{seed:04d}-log-{i:011d}',
+            'timestamp': now - timedelta(seconds=rng.randint(0, span_seconds)),
+            'event_type': event_type,
+            'agent_id': rng.choice(agent_ids),
+            'task_id': rng.choice(task_ids) if task_ids else None,
+            'description': f"{event_type}: {_sentence(rng, 6)}",
+            'extra_data': metadata
+        })
+        if len(batch) >= batch_size:
+            db.bulk_upsert('system_logs', batch)
+            batch = []
+            if i + 1 < logs:
+                progress('logs', i + 1, logs)
+    db.bulk_upsert('system_logs', batch)
+    progress('logs', logs, logs)
+
+    db.rebuild_rollups()
+    db.engine.dispose()
+
+
+def ensure_dataset(tasks=10000, logs=100000, history=500, seed=42, processed_ratio=0.3,
+                   directory=DEFAULT_DIRECTORY, batch_size=5000, verbose=True):
+    """Devuelve la ruta de la base de referencia, generándola si no existe.
+
+    La generación es determinista (misma semilla, mismos datos) y el archivo
+    se reutiliza entre ejecuciones; los benchmarks trabajan sobre una copia.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, dataset_name(tasks, logs, history, seed))
+    if not os.path.exists(path):
+        if verbose:
+            print(f"Generando {os.path.basename(path)}...", flush=True)
+        partial = path + '.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+        _generate(partial, tasks, logs, history, seed, processed_ratio, batch_size, verbose)
+        os.replace(partial, path)
+    return path
+
+
+def working_copy(path, suffix='work'):
+    """Copia de trabajo de una base de referencia (las operaciones de escritura la modifican)"""
+    target = f'{path[:-3]}.{suffix}.db'
+    shutil.copyfile(path, target)
+    return target
@@ -0,0 +1,283 @@
+"""
+Benchmark de DatabaseManager
+Uso: python -m benchmarks.db_bench [--tasks N] [--logs N] [--history N] [--threads 4] [--processes 4]
+
+Mide cada operación en un hilo, con varios hilos sobre un mismo DatabaseManager
+(como la API) y con varios procesos sobre el mismo archivo (como varios workers),
+y guarda los resultados en JSON para compararlos con benchmarks/compare.py.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import time
+
+import sqlalchemy
+from sqlalchemy import text
+
+from database import DatabaseManager
+from benchmarks.datasets import AGENTS, PRIORITIES, PROJECTS, ensure_dataset, synthetic_result, working_copy
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+# --- OPERACIONES ---
+
+def _create_task(db, ctx, rng):
+    db.create_task(rng.choice(PROJECTS), 'Tarea de benchmark', 'Descripción de la tarea de benchmark',
+                   priority=rng.choice(PRIORITIES))
+
+
+def _get_task(db, ctx, rng):
+    db.get_task(rng.choice(ctx['task_ids']))
+
+
+def _get_all_tasks(db, ctx, rng):
+    db.get_all_tasks(project=rng.choice(PROJECTS))
+
+
+def _update_task(db, ctx, rng):
+    # Como assign_task: resultado del LLM en las notas y cambio de estado
+    result = synthetic_result(rng)
+    db.update_task(rng.choice(ctx['task_ids']), notes=json.dumps(result, ensure_ascii=False),
+                   subtasks=result['subtareas'], status=result['estado_sugerido'])
+
+
+def _update_agent_memory(db, ctx, rng):
+    db.update_agent_memory(rng.choice(ctx['agent_ids']), conversation_history={
+        'timestamp': datetime.utcnow().isoformat(),
+        'task_id': rng.choice(ctx['task_ids']),
+        'response': synthetic_result(rng)
+    })
+
+
+def _get_agent_memory(db, ctx, rng):
+    db.get_agent_memory(rng.choice(ctx['agent_ids']))
+
+
+def _log_event(db, ctx, rng):
+    db.log_event('task_processed', rng.choice(ctx['agent_ids']), 'Tarea procesada: benchmark',
+                 task_id=rng.choice(ctx['task_ids']), metadata=synthetic_result(rng),
+                 duration_ms=rng.uniform(500, 5000))
+
+
+def _get_logs(db, ctx, rng):
+    db.get_logs(limit=50)
+
+
+# Operación -> (función, fracción de las iteraciones); las lecturas de proyectos completos son más caras
+OPERATIONS = {
+    'create_task': (_create_task, 1.0),
+    'get_task': (_get_task, 1.0),
+    'get_all_tasks': (_get_all_tasks, 0.05),
+    'update_task': (_update_task, 1.0),
+    'update_agent_memory': (_update_agent_memory, 0.25),
+    'get_agent_memory': (_get_agent_memory, 0.25),
+    'log_event': (_log_event, 1.0),
+    'get_logs': (_get_logs, 1.0)
+}
+
+
+# --- EJECUCIÓN ---
+
+def _sample_context(db, samples, seed):
+    """Ids de tareas y agentes existentes, elegidos al azar pero de forma reproducible"""
+    rng = random.Random(seed)
+    with db.engine.connect() as conn:
+        max_rowid = conn.execute(text("SELECT MAX(rowid) FROM tasks")).scalar() or 0
+        rowids = sorted({rng.randint(1, max_rowid) for _ in range(samples)}) if max_rowid else []
+        task_ids = []
+        for i in range(0, len(rowids), 500):
+            chunk = rowids[i:i + 500]
+            task_ids += [row[0] for row in conn.execute(
+                text(f"SELECT id FROM tasks WHERE rowid IN ({', '.join(map(str, chunk))})")
+            )]
+        agent_ids = [row[0] for row in conn.execute(text("SELECT agent_id FROM agent_memory ORDER BY agent_id"))]
+    return {'task_ids': task_ids, 'agent_ids': agent_ids or list(AGENTS.values())}
+
+
+def _run_worker(db, operation, ctx, iterations, max_seconds, seed):
+    run = OPERATIONS[operation][0]
+    rng = random.Random(seed)
+    latencies = []
+    errors = {}
+    started = time.monotonic()
+    deadline = started + max_seconds
+    for _ in range(iterations):
+        op_started = time.perf_counter()
+        try:
+            run(db, ctx, rng)
+        except Exception as e:
+            # p.ej. "database is locked" con escrituras concurrentes
+            message = f"{type(e).__name__}: {str(e).splitlines()[0][:120]}"
+            errors[message] = errors.get(message, 0) + 1
+        latencies.append((time.perf_counter() - op_started) * 1000)
+        if time.monotonic() >= deadline:
+            break
+    return {'latencies': latencies, 'errors': errors, 'started': started, 'finished': time.monotonic()}
+
+
+def _process_worker(db_url, operation, ctx, iterations, max_seconds, seed):
+    db = DatabaseManager(db_url)
+    try:
+        return _run_worker(db, operation, ctx, iterations, max_seconds, seed)
+    finally:
+        db.engine.dispose()
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return round(ordered[index], 3)
+
+
+def _summarize(operation, mode, workers, runs):
+    latencies = sorted(latency for run in runs for latency in run['latencies'])
+    errors = {}
+    for run in runs:
+        for message, count in run['errors'].items():
+            errors[message] = errors.get(message, 0) + count
+    wall = max(run['finished'] for run in runs) - min(run['started'] for run in runs)
+    return {
+        'operation': operation,
+        'mode': mode,
+        'workers': workers,
+        'count': len(latencies),
+        'errors': sum(errors.values()),
+        'error_messages': errors,
+        'wall_seconds': round(wall, 3),
+        'ops_per_sec': round(len(latencies) / wall, 2) if wall > 0 else None,
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else None,
+        'p50_ms': _percentile(latencies, 0.50),
+        'p95_ms': _percentile(latencies, 0.95),
+        'p99_ms': _percentile(latencies, 0.99),
+        'max_ms': round(latencies[-1], 3) if latencies else None
+    }
+
+
+def run_operation(db, db_url, operation, mode, workers, ctx, iterations, max_seconds, seed=0):
+    """Ejecuta una operación en modo single, threads o processes y devuelve su resumen"""
+    iterations = max(1, int(iterations * OPERATIONS[operation][1]))
+    if mode == 'single':
+        runs = [_run_worker(db, operation, ctx, iterations, max_seconds, seed)]
+        workers = 1
+    else:
+        per_worker = max(1, iterations // workers)
+        if mode == 'threads':
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_run_worker, db, operation, ctx, per_worker, max_seconds, seed + i)
+                    for i in range(workers)
+                ]
+                runs = [future.result() for future in futures]
+        else:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = [
+                    pool.submit(_process_worker, db_url, operation, ctx, per_worker, max_seconds, seed + i)
+                    for i in range(workers)
+                ]
+                runs = [future.result() for future in futures]
+    return _summarize(operation, mode, workers, runs)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'sqlalchemy': sqlalchemy.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def write_results(results, output=None, prefix='db_bench'):
+    """Guarda los resultados en JSON; por defecto en benchmarks/results/<prefijo>-<commit>-<fecha>.json"""
+    if output is None:
+        os.makedirs(RESULTS_DIRECTORY, exist_ok=True)
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+        output = os.path.join(RESULTS_DIRECTORY, f"{prefix}-{results.get('git_commit') or 'nogit'}-{stamp}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las operaciones de DatabaseManager")
+    parser.add_argument('--tasks', type=int, default=10000, help="Tareas en la base sintética")
+    parser.add_argument('--logs', type=int, default=100000, help="Logs en la base sintética")
+    parser.add_argument('--history', type=int, default=500, help="Entradas del historial de cada agente")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--operations', nargs='+', choices=list(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument('--modes', nargs='+', choices=['single', 'threads', 'processes'],
+                        default=['single', 'threads', 'processes'])
+    parser.add_argument('--threads', nargs='+', type=int, default=[4], help="Cantidades de hilos a medir")
+    parser.add_argument('--processes', nargs='+', type=int, default=[4], help="Cantidades de procesos a medir")
+    parser.add_argument('--iterations', type=int, default=200, help="Iteraciones por operación y modo")
+    parser.add_argument('--max-seconds', type=float, default=20, help="Tiempo máximo por operación y modo")
+    parser.add_argument('--data-dir', default=None, help="Directorio de las bases sintéticas")
+    parser.add_argument('--output', default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    options = {'directory': args.data_dir} if args.data_dir else {}
+    reference = ensure_dataset(args.tasks, args.logs, args.history, args.seed, **options)
+    path = working_copy(reference)
+    db_url = f'sqlite:///{path}'
+    db = DatabaseManager(db_url)
+    ctx = _sample_context(db, samples=2000, seed=args.seed)
+
+    results = {
+        'suite': 'db_bench',
+        'timestamp': datetime.utcnow().isoformat(),
+        **environment(),
+        'dataset': {
+            'tasks': args.tasks,
+            'logs': args.logs,
+            'history': args.history,
+            'seed': args.seed,
+            'size_bytes': os.path.getsize(reference)
+        },
+        'config': {'iterations': args.iterations, 'max_seconds': args.max_seconds},
+        'results': []
+    }
+    plan = []
+    for mode in args.modes:
+        counts = {'single': [1], 'threads': args.threads, 'processes': args.processes}[mode]
+        plan += [(mode, workers) for workers in counts]
+    try:
+        for operation in args.operations:
+            for mode, workers in plan:
+                summary = run_operation(
+                    db, db_url, operation, mode, workers, ctx, args.iterations, args.max_seconds, seed=args.seed
+                )
+                results['results'].append(summary)
+                print(f"{operation:<22} {mode:<9} x{workers:<3} {summary['ops_per_sec'] or 0:>10.1f} ops/s  "
+                      f"p50 {summary['p50_ms'] or 0:>9.2f} ms  p95 {summary['p95_ms'] or 0:>9.2f} ms  "
+                      f"errores {summary['errors']}", flush=True)
+    finally:
+        db.engine.dispose()
+        os.remove(path)
+    print(f"✓ Resultados en {write_results(results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark de las Lecturas de Tareas y Logs: ORM frente a Core
+Uso: python -m benchmarks.read_path_bench [--rows 10000 100000] [--repeat 5]
+
+Compara el costo por fila de get_all_tasks, get_logs y get_task con la ruta
+ORM anterior (objetos Task/SystemLog + to_dict) y con la ruta Core actual
+(dicts armados desde las filas). Las dos rutas devuelven los mismos dicts.
+"""
+
+import argparse
+from datetime import datetime
+import os
+import random
+import time
+
+from database import DatabaseManager, SystemLog, Task, _payload_hash
+from benchmarks.datasets import ensure_dataset
+from benchmarks.db_bench import environment, write_results
+
+
+# --- RUTA ORM (implementación anterior, como referencia) ---
+
+def orm_get_task(db, task_id):
+    session = db.get_session()
+    try:
+        task = session.query(Task).filter(Task.id == task_id).first()
+        return task.to_dict() if task else None
+    finally:
+        session.close()
+
+
+def orm_get_all_tasks(db, project=None, status=None):
+    session = db.get_session()
+    try:
+        query = session.query(Task)
+        if project:
+            query = query.filter(Task.project == project)
+        if status:
+            query = query.filter(Task.status == status)
+        tasks = query.order_by(Task.created_at.desc()).all()
+        db._prefetch_payloads(session, [_payload_hash(task.notes) for task in tasks])
+        return [task.to_dict() for task in tasks]
+    finally:
+        session.close()
+
+
+def orm_get_logs(db, limit=50, agent_id=None, event_type=None):
+    session = db.get_session()
+    try:
+        query = session.query(SystemLog)
+        if agent_id:
+            query = query.filter(SystemLog.agent_id == agent_id)
+        if event_type:
+            query = query.filter(SystemLog.event_type == event_type)
+        logs = query.order_by(SystemLog.timestamp.desc()).limit(limit).all()
+        db._prefetch_payloads(session, [_payload_hash(log.extra_data) for log in logs])
+        return [log.to_dict() for log in logs]
+    finally:
+        session.close()
+
+
+# --- MEDICIÓN ---
+
+def _best_of(fn, repeat):
+    """Mejor tiempo (s) de `repeat` ejecuciones y el último resultado"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _compare(name, rows, orm, core, repeat, calls=1):
+    orm_seconds, orm_result = _best_of(orm, repeat)
+    core_seconds, core_result = _best_of(core, repeat)
+    if orm_result != core_result:
+        raise AssertionError(f"{name}: las rutas ORM y Core devuelven resultados distintos")
+    per_row = max(rows, 1) * calls
+    return {
+        'operation': name,
+        'rows': rows,
+        'calls': calls,
+        'orm_ms': round(orm_seconds * 1000, 3),
+        'core_ms': round(core_seconds * 1000, 3),
+        'orm_us_per_row': round(orm_seconds / per_row * 1e6, 3),
+        'core_us_per_row': round(core_seconds / per_row * 1e6, 3),
+        'speedup': round(orm_seconds / core_seconds, 2) if core_seconds else None
+    }
+
+
+def run(rows, repeat=5, seed=42, directory=None, lookups=500):
+    """Mide las tres lecturas sobre una base con `rows` tareas y `rows` logs"""
+    options = {'directory': directory} if directory else {}
+    path = ensure_dataset(tasks=rows, logs=rows, history=10, seed=seed, **options)
+    db = DatabaseManager(f'sqlite:///{path}')
+    try:
+        with db.engine.connect() as conn:
+            ids = [row[0] for row in conn.execute(Task.__table__.select().with_only_columns(Task.__table__.c.id))]
+        task_ids = random.Random(seed).sample(ids, min(lookups, len(ids)))
+        results = [
+            _compare('get_all_tasks', len(ids),
+                     lambda: orm_get_all_tasks(db), lambda: db.get_all_tasks(), repeat),
+            _compare('get_logs', rows,
+                     lambda: orm_get_logs(db, limit=rows), lambda: db.get_logs(limit=rows), repeat),
+            _compare('get_logs_50', 50,
+                     lambda: [orm_get_logs(db, limit=50) for _ in range(20)],
+                     lambda: [db.get_logs(limit=50) for _ in range(20)], repeat, calls=20),
+            _compare('get_task', 1,
+                     lambda: [orm_get_task(db, task_id) for task_id in task_ids],
+                     lambda: [db.get_task(task_id) for task_id in task_ids], repeat, calls=len(task_ids))
+        ]
+        for result in results:
+            result['dataset_rows'] = rows
+        return results
+    finally:
+        db.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo por fila de las lecturas ORM frente a Core")
+    parser.add_argument('--rows', nargs='+', type=int, default=[10000, 100000], help="Tareas y logs de cada base")
+    parser.add_argument('--repeat', type=int, default=5, help="Repeticiones por medición (se toma la mejor)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=None, help="Directorio de las bases sintéticas")
+    parser.add_argument('--output', default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    results = {
+        'suite': 'read_path_bench',
+        'timestamp': datetime.utcnow().isoformat(),
+        **environment(),
+        'config': {'rows': args.rows, 'repeat': args.repeat, 'seed': args.seed},
+        'results': []
+    }
+    for rows in args.rows:
+        for result in run(rows, repeat=args.repeat, seed=args.seed, directory=args.data_dir):
+            results['results'].append(result)
+            print(f"{rows:>8} {result['operation']:<14} ORM {result['orm_us_per_row']:>9.2f} µs/fila  "
+                  f"Core {result['core_us_per_row']:>9.2f} µs/fila  x{result['speedup']}", flush=True)
+    print(f"✓ Resultados en {write_results(results, args.output, prefix='read_path_bench')}")
+
+
+if __name__ == "__main__":
+    main()
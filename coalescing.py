@@ -0,0 +1,98 @@
+"""
+Agrupación de Lecturas Concurrentes (single-flight)
+Solicitudes idénticas simultáneas comparten un único cálculo, con micro-caché opcional
+"""
+
+import asyncio
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+
+class SingleFlight:
+    """Ejecuta una vez cada cálculo en curso y comparte el resultado entre quienes lo piden.
+
+    La primera solicitud para una clave lanza el cálculo en el threadpool (así
+    el event loop sigue atendiendo a las demás); las que llegan mientras está
+    en curso esperan esa misma tarea. Con `ttl` > 0 el resultado se reutiliza
+    además durante ese tiempo. Todo el estado se maneja desde el event loop,
+    por lo que no hace falta bloqueo; `invalidate` solo incrementa una
+    generación y puede llamarse desde cualquier hilo. El resultado compartido
+    no debe modificarse.
+    """
+
+    def __init__(self, ttl=0.0, max_cached=1024):
+        self.ttl = ttl
+        self.max_cached = max_cached
+        self._inflight = {}
+        self._cache = {}
+        self._stats = {}
+        # Generación global y por nombre: invalidar las incrementa y deja obsoleto lo calculado antes
+        self._generation = 0
+        self._generations = {}
+
+    def _count(self, name, key):
+        stats = self._stats.setdefault(name, {'executed': 0, 'coalesced': 0, 'cache_hits': 0, 'errors': 0})
+        stats[key] += 1
+
+    async def run(self, name, fn, *args, ttl=None):
+        """Resultado de fn(*args), compartido entre llamadas concurrentes con el mismo nombre y argumentos"""
+        # Tras invalidar no se reutiliza ni se comparte un cálculo iniciado antes
+        key = (name, args, self._generation, self._generations.get(name, 0))
+        ttl = self.ttl if ttl is None else ttl
+        cached = self._cache.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self._count(name, 'cache_hits')
+                return cached[1]
+            del self._cache[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count(name, 'coalesced')
+        else:
+            self._count(name, 'executed')
+            task = asyncio.ensure_future(run_in_threadpool(fn, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(name, key, done, ttl))
+        # shield: si un cliente se desconecta, el cálculo sigue para los demás
+        return await asyncio.shield(task)
+
+    def _finish(self, name, key, task, ttl):
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self._count(name, 'errors')
+            return
+        if ttl > 0 and key[2:] == (self._generation, self._generations.get(name, 0)):
+            if len(self._cache) >= self.max_cached:
+                self._cache.clear()
+            self._cache[key] = (time.monotonic() + ttl, task.result())
+
+    def invalidate(self, name=None):
+        """Descarta la micro-caché y los cálculos en curso (de un nombre o todos).
+
+        Las entradas obsoletas ya no coinciden con ninguna clave y se descartan
+        al vencer o al llenarse la caché.
+        """
+        if name is None:
+            self._generation += 1
+        else:
+            self._generations[name] = self._generations.get(name, 0) + 1
+
+    def get_stats(self):
+        stats = {}
+        for name, counts in self._stats.items():
+            requests = counts['executed'] + counts['coalesced'] + counts['cache_hits']
+            stats[name] = {
+                **counts,
+                'requests': requests,
+                'shared_ratio': round(1 - counts['executed'] / requests, 4) if requests else 0.0
+            }
+        return {
+            'ttl_ms': round(self.ttl * 1000, 1),
+            'in_flight': len(self._inflight),
+            'cached': len(self._cache),
+            'endpoints': stats
+        }
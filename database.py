@@ -3,12 +3,21 @@ Sistema de Base de Datos para Multi-Agent Project Manager
 Gestiona memoria persistente de tareas, agentes y contexto
 """
 
-from sqlalchemy import create_engine, Column, String, DateTime, Text, JSON, Integer
+from sqlalchemy import bindparam, create_engine, inspect, select, literal_column, type_coerce, Column, String, DateTime, Text, JSON, Integer, Float, LargeBinary, func, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from sqlalchemy.orm import object_session, sessionmaker
+from collections import namedtuple
+from datetime import datetime, timedelta
 import json
+import re
+import threading
+import time
+import orjson
 import uuid
+import xxhash
+import zstandard
 
 Base = declarative_base()
 
@@ -29,23 +38,11 @@ class Task(Base):
     notes = Column(Text)
     subtasks = Column(JSON, default=list)
     extra_data = Column(JSON, default=dict)
+    parent_id = Column(String, nullable=True, index=True)  # Tarea padre (subtareas materializadas)
+    depends_on = Column(JSON, default=list)  # Ids de subtareas hermanas que deben terminar antes
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'project': self.project,
-            'title': self.title,
-            'description': self.description,
-            'status': self.status,
-            'priority': self.priority,
-            'assigned_agent': self.assigned_agent,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            'notes': self.notes,
-            'subtasks': self.subtasks,
-            'metadata': self.extra_data
-        }
+        return _task_dict(self, _session_resolver(self))
 
 
 class AgentMemory(Base):
@@ -57,7 +54,7 @@ class AgentMemory(Base):
     project = Column(String, nullable=False)
     context = Column(Text)
     personality_traits = Column(JSON, default=dict)
-    conversation_history = Column(JSON, default=list)
+    conversation_history = Column(JSON, default=list)  # Versiones anteriores: se migra a agent_history
     decisions_made = Column(JSON, default=list)
     last_active = Column(DateTime, default=datetime.utcnow)
     total_tasks_completed = Column(Integer, default=0)
@@ -70,7 +67,9 @@ class AgentMemory(Base):
             'project': self.project,
             'context': self.context,
             'personality_traits': self.personality_traits,
-            'conversation_history': self.conversation_history[-10:],  # Últimas 10 conversaciones
+            'conversation_history': _rehydrate_history(  # Últimas 10 conversaciones
+                _recent_history(object_session(self), self.agent_id, 10), _session_resolver(self)
+            ),
             'decisions_made': self.decisions_made[-10:],  # Últimas 10 decisiones
             'last_active': self.last_active.isoformat() if self.last_active else None,
             'total_tasks_completed': self.total_tasks_completed,
@@ -78,41 +77,538 @@ class AgentMemory(Base):
         }
 
 
+class AgentHistoryEntry(Base):
+    """Entrada del Historial de conversación de un agente (solo se agregan filas)"""
+    __tablename__ = 'agent_history'
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    agent_id = Column(String, nullable=False, index=True)
+    entry = Column(JSON)  # Resultados grandes como referencia a payloads
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+def _recent_history(session, agent_id, limit):
+    """Últimas `limit` entradas del historial de un agente, en orden cronológico"""
+    if session is None:
+        return []
+    table = AgentHistoryEntry.__table__
+    entries = session.execute(
+        select(table.c.entry)
+        .where(table.c.agent_id == agent_id)
+        .order_by(literal_column('rowid').desc())
+        .limit(limit)
+    ).scalars().all()
+    return entries[::-1]
+
+
+def _history_rows(agent_id, entries):
+    """Filas de agent_history para un historial guardado como lista (versiones anteriores y exportaciones).
+    
+    Los ids dependen de la posición: migrar o importar dos veces no duplica entradas.
+    """
+    now = datetime.utcnow()
+    return [
+        {
+            'id': str(uuid.uuid5(uuid.NAMESPACE_URL, f'agent_history/{agent_id}/{position}')),
+            'agent_id': agent_id,
+            'entry': entry,
+            'created_at': now
+        }
+        for position, entry in enumerate(entries or [])
+    ]
+
+
 class SystemLog(Base):
     """Log del Sistema"""
     __tablename__ = 'system_logs'
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     event_type = Column(String)  # task_created, task_updated, agent_action, etc.
     agent_id = Column(String)
     task_id = Column(String, nullable=True)
     description = Column(Text)
     extra_data = Column(JSON, default=dict)
     
+    def to_dict(self):
+        return _log_dict(self, _session_resolver(self))
+
+
+class TaskSubmission(Base):
+    """Envío de Tarea (claves de idempotencia y huellas de contenido)"""
+    __tablename__ = 'task_submissions'
+    
+    key = Column(String, primary_key=True)  # idem:<Idempotency-Key> o fp:<huella>
+    task_id = Column(String, nullable=False)
+    fingerprint = Column(String, nullable=True)  # Huella del contenido enviado con la clave
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class IdempotencyKeyConflict(ValueError):
+    """La clave de idempotencia ya se usó con un contenido distinto"""
+
+
+class MetricRollup(Base):
+    """Agregado de Métricas por intervalo (minuto, hora, día), agente y tipo de evento"""
+    __tablename__ = 'metric_rollups'
+    
+    granularity = Column(String, primary_key=True)  # minute, hour, day
+    bucket_start = Column(DateTime, primary_key=True)
+    agent_id = Column(String, primary_key=True)
+    event_type = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+    duration_count = Column(Integer, default=0)
+    duration_sum_ms = Column(Float, default=0.0)
+    duration_max_ms = Column(Float, default=0.0)
+    
+    def to_dict(self):
+        hours = ROLLUP_GRANULARITIES[self.granularity].total_seconds() / 3600
+        return {
+            'granularity': self.granularity,
+            'bucket_start': self.bucket_start.isoformat() if self.bucket_start else None,
+            'agent_id': self.agent_id,
+            'event_type': self.event_type,
+            'count': self.count,
+            'per_hour': round(self.count / hours, 3),
+            'error_count': self.error_count,
+            'error_rate': round(self.error_count / self.count, 4) if self.count else 0.0,
+            'avg_duration_ms': round(self.duration_sum_ms / self.duration_count, 1) if self.duration_count else None,
+            'max_duration_ms': round(self.duration_max_ms, 1) if self.duration_count else None
+        }
+
+
+class Payload(Base):
+    """Contenido direccionado por hash (resultados del LLM comprimidos con zstd)"""
+    __tablename__ = 'payloads'
+    
+    hash = Column(String, primary_key=True)  # xxh3_128 del contenido sin comprimir
+    data = Column(LargeBinary, nullable=False)
+    size = Column(Integer)  # Bytes sin comprimir
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class WebhookSubscription(Base):
+    """Suscripción a Webhooks de eventos de tareas"""
+    __tablename__ = 'webhook_subscriptions'
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    url = Column(String, nullable=False)
+    project = Column(String, nullable=True)  # None: todos los proyectos
+    event_types = Column(JSON, default=list)  # Vacío: todos los eventos
+    secret = Column(String, nullable=True)  # Clave HMAC para firmar las entregas
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def to_dict(self, include_secret=False):
+        result = {
+            'id': self.id,
+            'url': self.url,
+            'project': self.project,
+            'event_types': self.event_types or [],
+            'signed': bool(self.secret),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+        if include_secret:
+            result['secret'] = self.secret
+        return result
+
+
+class WebhookDeadLetter(Base):
+    """Evento de Webhook que no se pudo entregar tras agotar los reintentos"""
+    __tablename__ = 'webhook_dead_letters'
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    subscription_id = Column(String, index=True)
+    url = Column(String)
+    event_id = Column(String)
+    event_type = Column(String)
+    event = Column(JSON)  # Evento completo, tal como se habría entregado
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
     def to_dict(self):
         return {
             'id': self.id,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'subscription_id': self.subscription_id,
+            'url': self.url,
+            'event_id': self.event_id,
             'event_type': self.event_type,
-            'agent_id': self.agent_id,
-            'task_id': self.task_id,
-            'description': self.description,
-            'metadata': self.extra_data
+            'event': self.event,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
 
+# Eventos que se notifican a los listeners (y a los webhooks)
+WEBHOOK_EVENTS = ('task.updated', 'task.status_changed', 'task.completed', 'task.processed')
+
+
+def _task_event(previous_status, status):
+    if status == previous_status:
+        return 'task.updated'
+    return 'task.completed' if status == 'completed' else 'task.status_changed'
+
+
+ROLLUP_GRANULARITIES = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1)
+}
+
+
+def _bucket_start(timestamp, granularity):
+    if granularity == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def task_fingerprint(project, title, description):
+    """Huella xxhash del contenido normalizado de una tarea"""
+    normalized = '\x1f'.join(' '.join((value or '').casefold().split()) for value in (project, title, description))
+    return xxhash.xxh3_128_hexdigest(normalized.encode('utf-8'))
+
+
+# Contenidos a partir de este tamaño se guardan una sola vez en `payloads` y se referencian
+PAYLOAD_MIN_BYTES = 256
+PAYLOAD_PREFIX = 'payload:'  # Referencia en columnas de texto (Task.notes)
+PAYLOAD_KEY = '$payload'  # Referencia en columnas JSON: {"$payload": "<hash>"}
+PAYLOAD_HISTORY_KEYS = ('response', 'agent_response')
+_PAYLOAD_HASH = re.compile(r'[0-9a-f]{32}')
+
+_zstd = threading.local()
+
+
+def _compress(data):
+    if not hasattr(_zstd, 'compressor'):
+        _zstd.compressor = zstandard.ZstdCompressor(level=3)
+    return _zstd.compressor.compress(data)
+
+
+def _decompress(data):
+    if not hasattr(_zstd, 'decompressor'):
+        _zstd.decompressor = zstandard.ZstdDecompressor()
+    return _zstd.decompressor.decompress(data)
+
+
+def _payload_hash(value):
+    """Hash referenciado por un valor ('payload:<hash>' o {"$payload": "<hash>"}), o None"""
+    if isinstance(value, str) and value.startswith(PAYLOAD_PREFIX):
+        candidate = value[len(PAYLOAD_PREFIX):]
+    elif isinstance(value, dict) and len(value) == 1 and isinstance(value.get(PAYLOAD_KEY), str):
+        candidate = value[PAYLOAD_KEY]
+    else:
+        return None
+    return candidate if _PAYLOAD_HASH.fullmatch(candidate) else None
+
+
+def _store_payload(executor, content):
+    """Guarda un contenido (si no existe) y devuelve su hash; executor es una sesión o conexión"""
+    data = content.encode('utf-8')
+    digest = xxhash.xxh3_128_hexdigest(data)
+    stmt = sqlite_insert(Payload.__table__).values(
+        hash=digest, data=_compress(data), size=len(data), created_at=datetime.utcnow()
+    ).on_conflict_do_nothing(index_elements=['hash'])
+    executor.execute(stmt)
+    return digest
+
+
+def _dehydrate_text(executor, value):
+    if not isinstance(value, str) or _payload_hash(value) or len(value.encode('utf-8')) < PAYLOAD_MIN_BYTES:
+        return value
+    return PAYLOAD_PREFIX + _store_payload(executor, value)
+
+
+def _dehydrate_json(executor, value):
+    if value is None or _payload_hash(value):
+        return value
+    # Mismo texto que json.dumps(resultado, ensure_ascii=False) en las notas: un único payload
+    content = json.dumps(value, ensure_ascii=False)
+    if len(content.encode('utf-8')) < PAYLOAD_MIN_BYTES:
+        return value
+    return {PAYLOAD_KEY: _store_payload(executor, content)}
+
+
+def _dehydrate_history_entry(executor, entry):
+    if not isinstance(entry, dict):
+        return entry
+    return {
+        key: _dehydrate_json(executor, value) if key in PAYLOAD_HISTORY_KEYS else value
+        for key, value in entry.items()
+    }
+
+
+def _rehydrate_text(value, resolve):
+    digest = _payload_hash(value) if isinstance(value, str) else None
+    if digest is None:
+        return value
+    content = resolve(digest)
+    return content if content is not None else value
+
+
+def _rehydrate_json(value, resolve):
+    digest = _payload_hash(value) if isinstance(value, dict) else None
+    if digest is None:
+        return value
+    content = resolve(digest)
+    return json.loads(content) if content is not None else value
+
+
+def _rehydrate_history(entries, resolve):
+    return [
+        {
+            key: _rehydrate_json(value, resolve) if key in PAYLOAD_HISTORY_KEYS else value
+            for key, value in entry.items()
+        } if isinstance(entry, dict) else entry
+        for entry in entries or []
+    ]
+
+
+def _task_dict(task, resolve):
+    """Dict de una tarea a partir de un objeto Task o de una fila Core con sus columnas"""
+    return {
+        'id': task.id,
+        'project': task.project,
+        'title': task.title,
+        'description': task.description,
+        'status': task.status,
+        'priority': task.priority,
+        'assigned_agent': task.assigned_agent,
+        'created_at': task.created_at.isoformat() if task.created_at else None,
+        'updated_at': task.updated_at.isoformat() if task.updated_at else None,
+        'completed_at': task.completed_at.isoformat() if task.completed_at else None,
+        'notes': _rehydrate_text(task.notes, resolve),
+        'subtasks': task.subtasks,
+        'parent_id': task.parent_id,
+        'depends_on': task.depends_on or [],
+        'metadata': task.extra_data
+    }
+
+
+def _log_dict(log, resolve):
+    """Dict de un log a partir de un objeto SystemLog o de una fila Core con sus columnas"""
+    return {
+        'id': log.id,
+        'timestamp': log.timestamp.isoformat() if log.timestamp else None,
+        'event_type': log.event_type,
+        'agent_id': log.agent_id,
+        'task_id': log.task_id,
+        'description': log.description,
+        'metadata': _rehydrate_json(log.extra_data, resolve)
+    }
+
+
+_EMPTY_JSON = {'[]': list, '{}': dict, 'null': lambda: None}
+
+
+class _CoreReader:
+    """Lectura de filas con Core para las consultas frecuentes.
+
+    Las columnas JSON se leen como texto y se decodifican con orjson (los
+    valores vacíos sin parsear); cada fila se convierte en una namedtuple con
+    los nombres de las columnas, así _task_dict/_log_dict la usan igual que a
+    un objeto ORM pero con acceso a atributos por posición.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.columns = [
+            type_coerce(column, Text).label(column.name) if isinstance(column.type, JSON) else column
+            for column in table.columns
+        ]
+        self.json_positions = [i for i, column in enumerate(table.columns) if isinstance(column.type, JSON)]
+        self.row_type = namedtuple(f'{table.name}_row', [column.name for column in table.columns])
+        # Sentencia armada una sola vez: su clave de caché de compilación se calcula una vez
+        self.by_id = self.select().where(table.c.id == bindparam('id'))
+
+    def select(self):
+        return select(*self.columns)
+
+    def rows(self, result):
+        make = self.row_type._make
+        positions = self.json_positions
+        rows = []
+        for row in result.tuples():
+            values = list(row)
+            for i in positions:
+                value = values[i]
+                if value is not None:
+                    empty = _EMPTY_JSON.get(value)
+                    values[i] = empty() if empty else orjson.loads(value)
+            rows.append(make(values))
+        return rows
+
+
+def _session_resolver(instance):
+    """Resuelve hashes con la sesión del objeto, con caché por sesión"""
+    session = object_session(instance)
+
+    def resolve(digest):
+        if session is None:
+            return None
+        cache = session.info.setdefault('payloads', {})
+        if digest not in cache:
+            payload = session.get(Payload, digest)
+            cache[digest] = _decompress(payload.data).decode('utf-8') if payload else None
+        return cache[digest]
+
+    return resolve
+
+
+# Columnas que guardan referencias a payloads, por tabla: (columna, tipo de referencia)
+PAYLOAD_COLUMNS = {
+    'tasks': ('notes', 'text'),
+    'system_logs': ('extra_data', 'json'),
+    'agent_history': ('entry', 'entry')
+}
+
+
+def _payload_refs(kind, value):
+    if kind == 'entry':
+        if not isinstance(value, dict):
+            return []
+        return [_payload_hash(value.get(key)) for key in PAYLOAD_HISTORY_KEYS]
+    return [_payload_hash(value)]
+
+
+def _dehydrate_row(executor, table_name, row):
+    column, kind = PAYLOAD_COLUMNS.get(table_name, (None, None))
+    if column not in row:
+        return row
+    value = row[column]
+    if kind == 'text':
+        value = _dehydrate_text(executor, value)
+    elif kind == 'json':
+        value = _dehydrate_json(executor, value)
+    else:
+        value = _dehydrate_history_entry(executor, value)
+    return {**row, column: value}
+
+
+def _rehydrate_row(table_name, row, resolve):
+    column, kind = PAYLOAD_COLUMNS.get(table_name, (None, None))
+    if column not in row:
+        return row
+    if kind == 'entry':
+        return {**row, column: _rehydrate_history([row[column]], resolve)[0]}
+    rehydrate = {'text': _rehydrate_text, 'json': _rehydrate_json}[kind]
+    return {**row, column: rehydrate(row[column], resolve)}
+
+
+# Tablas incluidas en exportación/importación NDJSON
+BACKUP_TABLES = {
+    'tasks': {'model': Task, 'conflict': 'id'},
+    'agent_memory': {'model': AgentMemory, 'conflict': 'agent_id'},
+    'agent_history': {'model': AgentHistoryEntry, 'conflict': 'id'},
+    'system_logs': {'model': SystemLog, 'conflict': 'id'}
+}
+
+
+# Índices de texto completo (FTS5) sincronizados mediante triggers sobre las tablas base
+# Los triggers solo usan SQL estándar (otras conexiones sqlite3 pueden escribir en las tablas).
+# Un índice con payload_columns guarda su propia copia del texto: los triggers indexan
+# las columnas planas y DatabaseManager completa el contenido de las referencias a payloads
+SEARCH_INDEXES = {
+    'tasks_fts': {
+        'table': 'tasks',
+        'columns': ['title', 'description', 'notes'],
+        'payload_columns': ['notes']
+    },
+    'system_logs_fts': {'table': 'system_logs', 'columns': ['description']}
+}
+
+
+def _fts_query(query):
+    """Convierte texto libre en una consulta FTS5 segura (términos entre comillas, AND implícito)"""
+    terms = re.findall(r'\w+\*?', query or '')
+    return ' '.join(
+        f'"{term[:-1]}"*' if term.endswith('*') else f'"{term}"'
+        for term in terms
+    )
+
+
+def rollup_status(statuses):
+    """Estado de una tarea padre según el de sus subtareas (None si no tiene)"""
+    statuses = list(statuses)
+    if not statuses:
+        return None
+    if all(status == 'completed' for status in statuses):
+        return 'completed'
+    if 'blocked' in statuses:
+        return 'blocked'
+    return 'in_progress'
+
+
+_TASK_READER = _CoreReader(Task.__table__)
+_LOG_READER = _CoreReader(SystemLog.__table__)
+
+
 class DatabaseManager:
     """Gestor de Base de Datos"""
     
-    def __init__(self, db_path='sqlite:///multi_agent_system.db'):
+    def __init__(self, db_path='sqlite:///multi_agent_system.db', dedup_window_seconds=None):
         self.engine = create_engine(db_path, echo=False)
-        Base.metadata.create_all(self.engine)
+        # Ventana para detectar envíos duplicados por contenido (None o 0 la desactiva)
+        self.dedup_window_seconds = dedup_window_seconds
+        # Serializa las actualizaciones de memoria (las decisiones se leen, se extienden y se reescriben)
+        self._memory_lock = threading.Lock()
+        # Callbacks (event_type, data) que se llaman tras cada cambio confirmado (p.ej. webhooks)
+        self.listeners = []
+        self._create_schema()
         self.Session = sessionmaker(bind=self.engine)
+        self.search_enabled = self._init_search()
     
     def get_session(self):
         return self.Session()
     
+    def _create_schema(self, attempts=5):
+        for attempt in range(attempts):
+            try:
+                Base.metadata.create_all(self.engine)
+                self._add_missing_columns()
+                self._migrate_history()
+                return
+            except OperationalError:
+                # Otro proceso está creando las mismas tablas (varios workers sobre una base nueva)
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(0.05 * (attempt + 1))
+    
+    def _add_missing_columns(self):
+        """Agrega a las tablas existentes las columnas e índices nuevos del modelo"""
+        inspector = inspect(self.engine)
+        with self.engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                existing = {column['name'] for column in inspector.get_columns(table.name)}
+                missing = [column for column in table.columns if column.name not in existing]
+                for column in missing:
+                    column_type = column.type.compile(dialect=self.engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name not in existing_indexes:
+                        index.create(conn, checkfirst=True)
+    
+    def _migrate_history(self):
+        """Pasa a agent_history el historial guardado como lista en agent_memory (versiones anteriores)"""
+        table = AgentMemory.__table__
+        with self.engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.agent_id, table.c.conversation_history)
+                .where(func.json_array_length(table.c.conversation_history) > 0)
+            ).all()
+            for row in rows:
+                # Las entradas ya guardan sus resultados como referencias a payloads
+                history = _history_rows(row.agent_id, row.conversation_history)
+                conn.execute(
+                    sqlite_insert(AgentHistoryEntry.__table__).on_conflict_do_nothing(index_elements=['id']),
+                    history
+                )
+                conn.execute(table.update().where(table.c.agent_id == row.agent_id).values(conversation_history=[]))
+    
     # --- TAREAS ---
     
     def create_task(self, project, title, description, priority='medium', metadata=None):
@@ -132,54 +628,257 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def submit_task(self, project, title, description, priority='medium', metadata=None, idempotency_key=None):
+        """Crea una tarea salvo que sea un reintento o un duplicado reciente.
+        
+        Devuelve (tarea, creada). Si la clave de idempotencia ya fue usada, o si
+        existe una tarea con el mismo contenido dentro de la ventana de
+        deduplicación, devuelve la tarea existente con creada=False.
+        """
+        fingerprint = task_fingerprint(project, title, description)
+        keys = []
+        if idempotency_key:
+            keys.append(f'idem:{idempotency_key}')
+        fingerprint_key = None
+        if self.dedup_window_seconds:
+            fingerprint_key = f'fp:{fingerprint}'
+            keys.append(fingerprint_key)
+        if not keys:
+            return self.create_task(project, title, description, priority=priority, metadata=metadata), True
+        
+        for _ in range(3):
+            session = self.get_session()
+            try:
+                existing = self._find_submission(session, keys, fingerprint_key, fingerprint)
+                if existing:
+                    return existing.to_dict(), False
+                
+                task = Task(
+                    project=project,
+                    title=title,
+                    description=description,
+                    priority=priority,
+                    extra_data=metadata or {}
+                )
+                session.add(task)
+                session.flush()
+                if all(self._claim_submission(session, key, task.id, fingerprint, fingerprint_key) for key in keys):
+                    session.commit()
+                    return task.to_dict(), True
+                # Otro envío concurrente registró la misma clave: descartar esta tarea y devolver esa
+                session.rollback()
+            finally:
+                session.close()
+        raise RuntimeError('No se pudo registrar el envío de la tarea')
+    
+    def _submission_expired(self, session, submission, fingerprint_key):
+        """True si el registro apunta a una tarea eliminada o es una huella fuera de la ventana"""
+        if submission.key == fingerprint_key:
+            window_start = datetime.utcnow() - timedelta(seconds=self.dedup_window_seconds)
+            if submission.created_at < window_start:
+                return True
+        return session.get(Task, submission.task_id) is None
+    
+    def _claim_submission(self, session, key, task_id, fingerprint, fingerprint_key):
+        """Registra la clave para la tarea; False si un envío vigente ya la tiene.
+        
+        INSERT ... ON CONFLICT DO NOTHING, y si la clave existe pero venció, un
+        UPDATE condicionado al registro leído: si otro envío la reemplazó antes,
+        no afecta filas.
+        """
+        table = TaskSubmission.__table__
+        now = datetime.utcnow()
+        inserted = session.execute(
+            sqlite_insert(table)
+            .values(key=key, task_id=task_id, fingerprint=fingerprint, created_at=now)
+            .on_conflict_do_nothing(index_elements=['key'])
+        )
+        if inserted.rowcount == 1:
+            return True
+        current = session.execute(select(table).where(table.c.key == key)).first()
+        if current is None or not self._submission_expired(session, current, fingerprint_key):
+            return False
+        updated = session.execute(
+            table.update()
+            .where(table.c.key == key, table.c.task_id == current.task_id, table.c.created_at == current.created_at)
+            .values(task_id=task_id, fingerprint=fingerprint, created_at=now)
+        )
+        return updated.rowcount == 1
+    
+    def _find_submission(self, session, keys, fingerprint_key, fingerprint):
+        submissions = session.query(TaskSubmission).filter(TaskSubmission.key.in_(keys)).all()
+        # La clave de idempotencia tiene precedencia sobre la huella
+        for submission in sorted(submissions, key=lambda s: not s.key.startswith('idem:')):
+            if self._submission_expired(session, submission, fingerprint_key):
+                continue
+            if submission.key.startswith('idem:') and submission.fingerprint and submission.fingerprint != fingerprint:
+                raise IdempotencyKeyConflict('La clave de idempotencia ya se usó con otro contenido')
+            return session.get(Task, submission.task_id)
+        return None
+    
+    # Las lecturas frecuentes usan Core: sin identity map ni instrumentación de atributos,
+    # los dicts se arman directamente desde las filas (ver benchmarks/read_path_bench.py)
+    
     def get_task(self, task_id):
-        session = self.get_session()
-        try:
-            task = session.query(Task).filter(Task.id == task_id).first()
-            return task.to_dict() if task else None
-        finally:
-            session.close()
+        with self.engine.connect() as conn:
+            rows = _TASK_READER.rows(conn.execute(_TASK_READER.by_id, {'id': task_id}))
+            if not rows:
+                return None
+            return _task_dict(rows[0], self.load_payloads([_payload_hash(rows[0].notes)], conn).get)
     
     def get_all_tasks(self, project=None, status=None):
-        session = self.get_session()
-        try:
-            query = session.query(Task)
-            if project:
-                query = query.filter(Task.project == project)
-            if status:
-                query = query.filter(Task.status == status)
-            tasks = query.order_by(Task.created_at.desc()).all()
-            return [task.to_dict() for task in tasks]
-        finally:
-            session.close()
+        table = Task.__table__
+        query = _TASK_READER.select()
+        if project:
+            query = query.where(table.c.project == project)
+        if status:
+            query = query.where(table.c.status == status)
+        with self.engine.connect() as conn:
+            rows = _TASK_READER.rows(conn.execute(query.order_by(table.c.created_at.desc())))
+            resolve = self.load_payloads([_payload_hash(row.notes) for row in rows], conn).get
+        return [_task_dict(row, resolve) for row in rows]
     
     def update_task(self, task_id, **kwargs):
         session = self.get_session()
         try:
             task = session.query(Task).filter(Task.id == task_id).first()
             if task:
+                previous_status = task.status
+                notes = kwargs.get('notes')
+                if 'notes' in kwargs:
+                    kwargs['notes'] = _dehydrate_text(session, notes)
+                if kwargs.get('project', task.project) != task.project:
+                    # Las subtareas siguen a su tarea padre al cambiar de proyecto
+                    descendants = self._descendant_ids(session, task_id)
+                    if descendants:
+                        session.query(Task).filter(Task.id.in_(descendants)).update(
+                            {'project': kwargs['project']}, synchronize_session=False
+                        )
                 for key, value in kwargs.items():
                     if hasattr(task, key):
                         setattr(task, key, value)
                 task.updated_at = datetime.utcnow()
+                if kwargs.get('notes') is not notes:
+                    session.flush()
+                    self._index_task_notes(session, [(task.id, notes)])
+                if task.status != previous_status:
+                    self._record_status_change(session, task)
+                    if task.parent_id:
+                        self._rollup_parent(session, task.parent_id)
                 session.commit()
-                return task.to_dict()
+                result = task.to_dict()
+                self.notify(_task_event(previous_status, result['status']),
+                            {'task': result, 'previous_status': previous_status})
+                return result
             return None
         finally:
             session.close()
     
+    def claim_task(self, task_id, agent_id):
+        """Asigna la tarea al agente solo si nadie la tomó antes (atómico entre hilos y procesos)"""
+        table = Task.__table__
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                table.update()
+                .where(table.c.id == task_id, table.c.assigned_agent.is_(None))
+                .values(assigned_agent=agent_id, updated_at=datetime.utcnow())
+            )
+            return result.rowcount == 1
+    
     def delete_task(self, task_id):
         session = self.get_session()
         try:
             task = session.query(Task).filter(Task.id == task_id).first()
             if task:
-                session.delete(task)
+                # Las subtareas se eliminan con su tarea padre
+                pending = [task]
+                while pending:
+                    current = pending.pop()
+                    pending.extend(session.query(Task).filter(Task.parent_id == current.id).all())
+                    session.delete(current)
                 session.commit()
                 return True
             return False
         finally:
             session.close()
     
+    # --- SUBTAREAS ---
+    
+    def _descendant_ids(self, executor, task_id):
+        """Ids de las subtareas de una tarea, a cualquier profundidad"""
+        table = Task.__table__
+        tree = select(table.c.id).where(table.c.parent_id == task_id).cte('tree', recursive=True)
+        # UNION (no UNION ALL): un ciclo de parent_id no hace infinita la consulta
+        tree = tree.union(select(table.c.id).where(table.c.parent_id == tree.c.id))
+        return list(executor.execute(select(tree.c.id)).scalars())
+    
+    def get_descendant_ids(self, task_id):
+        with self.engine.connect() as conn:
+            return self._descendant_ids(conn, task_id)
+    
+    def create_subtasks(self, parent_id, subtasks):
+        """Crea subtareas como tareas hijas (mismo proyecto) en una sola transacción.
+        
+        `subtasks` es una lista de dicts con title, description, priority y
+        depends_on: índices, dentro de la misma lista, de las subtareas que deben
+        terminar antes. Solo se aceptan dependencias hacia subtareas anteriores,
+        por lo que el grafo resultante no tiene ciclos. Devuelve las subtareas
+        creadas (None si la tarea padre no existe).
+        """
+        session = self.get_session()
+        try:
+            parent = session.query(Task).filter(Task.id == parent_id).first()
+            if not parent:
+                return None
+            children = []
+            for spec in subtasks:
+                child = Task(
+                    id=str(uuid.uuid4()),
+                    project=parent.project,
+                    title=spec['title'],
+                    description=spec.get('description'),
+                    priority=spec.get('priority') or parent.priority,
+                    parent_id=parent.id,
+                    depends_on=[children[i].id for i in spec.get('depends_on') or [] if 0 <= i < len(children)],
+                    extra_data={}
+                )
+                children.append(child)
+            session.add_all(children)
+            session.flush()
+            self._rollup_parent(session, parent.id)
+            session.commit()
+            return [child.to_dict() for child in children]
+        finally:
+            session.close()
+    
+    def get_subtasks(self, parent_id):
+        """Subtareas de una tarea, en el orden en que fueron propuestas"""
+        session = self.get_session()
+        try:
+            children = session.query(Task).filter(Task.parent_id == parent_id).order_by(
+                Task.created_at, literal_column('tasks.rowid')
+            ).all()
+            self._prefetch_payloads(session, [_payload_hash(child.notes) for child in children])
+            return [child.to_dict() for child in children]
+        finally:
+            session.close()
+    
+    def _rollup_parent(self, session, parent_id):
+        """Propaga el estado de las subtareas a la tarea padre (y a sus ancestros)"""
+        while parent_id:
+            parent = session.query(Task).filter(Task.id == parent_id).first()
+            if parent is None:
+                return
+            status = rollup_status(
+                status for (status,) in session.query(Task.status).filter(Task.parent_id == parent_id)
+            )
+            if status is None or status == parent.status:
+                return
+            parent.status = status
+            parent.updated_at = datetime.utcnow()
+            self._record_status_change(session, parent)
+            parent_id = parent.parent_id
+    
     # --- MEMORIA DE AGENTES ---
     
     def get_or_create_agent_memory(self, agent_id, project, personality_traits=None):
@@ -199,17 +898,24 @@ class DatabaseManager:
             session.close()
     
     def update_agent_memory(self, agent_id, **kwargs):
+        with self._memory_lock:
+            return self._update_agent_memory(agent_id, **kwargs)
+    
+    def _update_agent_memory(self, agent_id, **kwargs):
         session = self.get_session()
         try:
             memory = session.query(AgentMemory).filter(AgentMemory.agent_id == agent_id).first()
             if memory:
                 for key, value in kwargs.items():
                     if hasattr(memory, key):
-                        if key in ['conversation_history', 'decisions_made']:
-                            # Agregar a la lista existente
-                            current = getattr(memory, key) or []
-                            current.append(value)
-                            setattr(memory, key, current)
+                        if key == 'conversation_history':
+                            # Una fila nueva por entrada: no se reescribe el historial completo
+                            session.add(AgentHistoryEntry(
+                                agent_id=agent_id, entry=_dehydrate_history_entry(session, value)
+                            ))
+                        elif key == 'decisions_made':
+                            # Agregar a la lista existente (lista nueva para que se detecte el cambio)
+                            setattr(memory, key, list(memory.decisions_made or []) + [value])
                         else:
                             setattr(memory, key, value)
                 memory.last_active = datetime.utcnow()
@@ -227,9 +933,24 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def get_memory_items(self, agent_id):
+        """Historial de conversación y decisiones completos de un agente (para indexarlos)"""
+        table = AgentMemory.__table__
+        history = AgentHistoryEntry.__table__
+        with self.engine.connect() as conn:
+            row = conn.execute(select(table.c.decisions_made).where(table.c.agent_id == agent_id)).first()
+            if row is None:
+                return None
+            entries = conn.execute(
+                select(history.c.entry).where(history.c.agent_id == agent_id).order_by(literal_column('rowid'))
+            ).scalars().all()
+            resolve = self.load_payloads([h for entry in entries for h in _payload_refs('entry', entry)], conn).get
+        return {'conversation_history': _rehydrate_history(entries, resolve), 'decisions_made': row.decisions_made or []}
+    
     # --- LOGS ---
     
-    def log_event(self, event_type, agent_id, description, task_id=None, metadata=None):
+    def log_event(self, event_type, agent_id, description, task_id=None, metadata=None,
+                  duration_ms=None, error=False):
         session = self.get_session()
         try:
             log = SystemLog(
@@ -237,23 +958,512 @@ class DatabaseManager:
                 agent_id=agent_id,
                 task_id=task_id,
                 description=description,
-                extra_data=metadata or {}
+                extra_data=_dehydrate_json(session, metadata or {})
             )
             session.add(log)
+            session.flush()
+            self._record_rollup(session, agent_id, event_type, log.timestamp, duration_ms=duration_ms, error=error)
             session.commit()
             return log.to_dict()
         finally:
             session.close()
     
     def get_logs(self, limit=50, agent_id=None, event_type=None):
+        table = SystemLog.__table__
+        query = _LOG_READER.select()
+        if agent_id:
+            query = query.where(table.c.agent_id == agent_id)
+        if event_type:
+            query = query.where(table.c.event_type == event_type)
+        with self.engine.connect() as conn:
+            rows = _LOG_READER.rows(conn.execute(query.order_by(table.c.timestamp.desc()).limit(limit)))
+            resolve = self.load_payloads([_payload_hash(row.extra_data) for row in rows], conn).get
+        return [_log_dict(row, resolve) for row in rows]
+    
+    # --- WEBHOOKS ---
+    
+    def add_listener(self, callback):
+        """Registra un callback(event_type, data) para los eventos de WEBHOOK_EVENTS"""
+        self.listeners.append(callback)
+    
+    def notify(self, event_type, data):
+        for listener in list(self.listeners):
+            try:
+                listener(event_type, data)
+            except Exception:
+                # Un listener con errores no debe hacer fallar la escritura ya confirmada
+                pass
+    
+    def create_webhook(self, url, project=None, event_types=None, secret=None):
+        session = self.get_session()
+        try:
+            subscription = WebhookSubscription(
+                url=url,
+                project=project,
+                event_types=list(event_types or []),
+                secret=secret
+            )
+            session.add(subscription)
+            session.commit()
+            return subscription.to_dict()
+        finally:
+            session.close()
+    
+    def get_webhooks(self, include_secret=False):
+        session = self.get_session()
+        try:
+            subscriptions = session.query(WebhookSubscription).order_by(WebhookSubscription.created_at).all()
+            return [subscription.to_dict(include_secret=include_secret) for subscription in subscriptions]
+        finally:
+            session.close()
+    
+    def delete_webhook(self, subscription_id):
+        session = self.get_session()
+        try:
+            subscription = session.query(WebhookSubscription).filter(WebhookSubscription.id == subscription_id).first()
+            if subscription:
+                session.delete(subscription)
+                session.commit()
+                return True
+            return False
+        finally:
+            session.close()
+    
+    def add_dead_letter(self, subscription_id, url, event, attempts, last_error):
+        session = self.get_session()
+        try:
+            dead_letter = WebhookDeadLetter(
+                subscription_id=subscription_id,
+                url=url,
+                event_id=event.get('id'),
+                event_type=event.get('type'),
+                event=event,
+                attempts=attempts,
+                last_error=last_error
+            )
+            session.add(dead_letter)
+            session.commit()
+            return dead_letter.to_dict()
+        finally:
+            session.close()
+    
+    def get_dead_letters(self, limit=50, subscription_id=None):
+        session = self.get_session()
+        try:
+            query = session.query(WebhookDeadLetter)
+            if subscription_id:
+                query = query.filter(WebhookDeadLetter.subscription_id == subscription_id)
+            dead_letters = query.order_by(WebhookDeadLetter.created_at.desc()).limit(limit).all()
+            return [dead_letter.to_dict() for dead_letter in dead_letters]
+        finally:
+            session.close()
+    
+    def get_dead_letter(self, dead_letter_id):
+        session = self.get_session()
+        try:
+            dead_letter = session.query(WebhookDeadLetter).filter(WebhookDeadLetter.id == dead_letter_id).first()
+            return dead_letter.to_dict() if dead_letter else None
+        finally:
+            session.close()
+    
+    def delete_dead_letter(self, dead_letter_id):
+        session = self.get_session()
+        try:
+            deleted = session.query(WebhookDeadLetter).filter(WebhookDeadLetter.id == dead_letter_id).delete()
+            session.commit()
+            return deleted > 0
+        finally:
+            session.close()
+    
+    # --- PAYLOADS ---
+    
+    def load_payloads(self, hashes, conn=None):
+        """Contenido (texto) de varios payloads por hash, en consultas por lotes"""
+        hashes = list({h for h in hashes if h})
+        if not hashes:
+            return {}
+        if conn is None:
+            with self.engine.connect() as conn:
+                return self.load_payloads(hashes, conn)
+        table = Payload.__table__
+        contents = {}
+        for i in range(0, len(hashes), 500):
+            rows = conn.execute(select(table.c.hash, table.c.data).where(table.c.hash.in_(hashes[i:i + 500])))
+            for digest, data in rows:
+                contents[digest] = _decompress(data).decode('utf-8')
+        return contents
+    
+    def _prefetch_payloads(self, session, hashes):
+        """Carga en la caché de la sesión los payloads que usarán los to_dict de un listado"""
+        cache = session.info.setdefault('payloads', {})
+        missing = [h for h in hashes if h and h not in cache]
+        if missing:
+            cache.update(self.load_payloads(missing, session.connection()))
+    
+    def rehydrate_rows(self, table_name, rows, conn=None):
+        """Reemplaza las referencias a payloads de filas crudas por su contenido"""
+        if table_name not in PAYLOAD_COLUMNS:
+            return rows
+        column, kind = PAYLOAD_COLUMNS[table_name]
+        hashes = [h for row in rows for h in _payload_refs(kind, row.get(column))]
+        contents = self.load_payloads(hashes, conn)
+        return [_rehydrate_row(table_name, row, contents.get) for row in rows]
+    
+    def purge_payloads(self):
+        """Elimina los payloads que ya no referencia ninguna fila; devuelve la cantidad"""
+        history_refs = ' UNION '.join(
+            f"SELECT json_extract(entry, '$.{key}.\"{PAYLOAD_KEY}\"') FROM agent_history"
+            for key in PAYLOAD_HISTORY_KEYS
+        )
+        with self.engine.begin() as conn:
+            result = conn.execute(text(
+                "DELETE FROM payloads WHERE hash NOT IN (SELECT ref FROM ("
+                f"SELECT substr(notes, {len(PAYLOAD_PREFIX) + 1}) AS ref FROM tasks WHERE notes LIKE '{PAYLOAD_PREFIX}%' "
+                f"UNION SELECT json_extract(extra_data, '$.\"{PAYLOAD_KEY}\"') FROM system_logs "
+                f"UNION {history_refs}) WHERE ref IS NOT NULL)"
+            ))
+            return result.rowcount
+    
+    # --- BÚSQUEDA ---
+    
+    def _init_search(self):
+        """Crea las tablas FTS5 y sus triggers si no existen"""
+        if self.engine.dialect.name != 'sqlite':
+            return False
+        try:
+            with self.engine.begin() as conn:
+                # Vista de una versión anterior (resolvía payloads con una función de Python)
+                conn.execute(text("DROP VIEW IF EXISTS tasks_search"))
+                for fts, spec in SEARCH_INDEXES.items():
+                    table = spec['table']
+                    payload_columns = spec.get('payload_columns', [])
+                    columns = ', '.join(spec['columns'])
+                    # Sin payloads el índice lee el texto de la tabla base (external content)
+                    content = '' if payload_columns else f", content='{table}', content_rowid='rowid'"
+
+                    def values(row):
+                        # Las referencias a payloads se indexan vacías hasta que se completa su contenido
+                        return ', '.join(
+                            f"CASE WHEN {row}.{c} LIKE '{PAYLOAD_PREFIX}%' THEN NULL ELSE {row}.{c} END"
+                            if c in payload_columns else f'{row}.{c}'
+                            for c in spec['columns']
+                        )
+
+                    existing = conn.execute(
+                        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                        {'name': fts}
+                    ).scalar()
+                    if existing and (content.strip(', ') not in existing if content else 'content=' in existing):
+                        # Índice de una versión anterior (otra fuente de contenido): recrearlo
+                        conn.execute(text(f"DROP TABLE {fts}"))
+                        for suffix in ('ai', 'ad', 'au'):
+                            conn.execute(text(f"DROP TRIGGER IF EXISTS {fts}_{suffix}"))
+                        existing = None
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                        f"{columns}{content}, "
+                        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                    ))
+                    conn.execute(text(
+                        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.rowid, {values('new')}); END"
+                    ))
+                    if payload_columns:
+                        # El índice guarda su copia: se borra y actualiza por rowid, sin los valores anteriores
+                        kept = ', '.join(
+                            f"{c} = CASE WHEN new.{c} IS old.{c} THEN {c} "
+                            f"WHEN new.{c} LIKE '{PAYLOAD_PREFIX}%' THEN NULL ELSE new.{c} END"
+                            if c in payload_columns else f'{c} = new.{c}'
+                            for c in spec['columns']
+                        )
+                        conn.execute(text(
+                            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                            f"DELETE FROM {fts} WHERE rowid = old.rowid; END"
+                        ))
+                        conn.execute(text(
+                            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+                            f"UPDATE {fts} SET {kept} WHERE rowid = new.rowid; END"
+                        ))
+                    else:
+                        conn.execute(text(
+                            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                            f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.rowid, {values('old')}); END"
+                        ))
+                        conn.execute(text(
+                            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+                            f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.rowid, {values('old')}); "
+                            f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.rowid, {values('new')}); END"
+                        ))
+                    # Bases existentes: indexar las filas que ya estaban antes del índice
+                    if not existing:
+                        self._rebuild_fts(conn, fts, spec)
+            return True
+        except OperationalError:
+            # SQLite compilado sin FTS5
+            return False
+    
+    def _rebuild_fts(self, conn, fts, spec, batch_size=1000):
+        """Vuelve a indexar todas las filas de la tabla base"""
+        payload_columns = spec.get('payload_columns', [])
+        if not payload_columns:
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+            return
+        table = spec['table']
+        columns = ', '.join(spec['columns'])
+        conn.execute(text(f"DELETE FROM {fts}"))
+        conn.execute(text(f"INSERT INTO {fts}(rowid, {columns}) SELECT rowid, {columns} FROM {table}"))
+        for column in payload_columns:
+            rows = conn.execute(text(
+                f"SELECT rowid, {column} FROM {table} WHERE {column} LIKE '{PAYLOAD_PREFIX}%'"
+            )).fetchall()
+            for i in range(0, len(rows), batch_size):
+                batch = rows[i:i + batch_size]
+                resolve = self.load_payloads([_payload_hash(row[1]) for row in batch], conn).get
+                conn.execute(
+                    text(f"UPDATE {fts} SET {column} = :value WHERE rowid = :rowid"),
+                    [{'rowid': row[0], 'value': _rehydrate_text(row[1], resolve)} for row in batch]
+                )
+    
+    def _index_task_notes(self, executor, notes_by_id):
+        """Indexa el contenido de las notas guardadas como payload (los triggers solo ven la referencia)"""
+        if not self.search_enabled or not notes_by_id:
+            return
+        executor.execute(
+            text("UPDATE tasks_fts SET notes = :notes WHERE rowid = (SELECT rowid FROM tasks WHERE id = :id)"),
+            [{'id': task_id, 'notes': notes} for task_id, notes in notes_by_id]
+        )
+    
+    def rebuild_search_index(self):
+        """Reconstruye y optimiza los índices de búsqueda desde las tablas base"""
+        if not self.search_enabled:
+            return False
+        with self.engine.begin() as conn:
+            for fts, spec in SEARCH_INDEXES.items():
+                self._rebuild_fts(conn, fts, spec)
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('optimize')"))
+        return True
+    
+    def search_tasks(self, query, project=None, status=None, limit=20):
+        """Busca tareas por título, descripción y notas, ordenadas por relevancia (bm25)"""
+        match = _fts_query(query)
+        if not self.search_enabled or not match:
+            return []
+        sql = (
+            "SELECT t.id, t.project, t.status, t.priority, t.title, t.assigned_agent, t.updated_at, "
+            "snippet(tasks_fts, -1, '[', ']', '…', 12) AS snippet, tasks_fts.rank AS rank "
+            "FROM tasks_fts JOIN tasks t ON t.rowid = tasks_fts.rowid "
+            "WHERE tasks_fts MATCH :match"
+        )
+        params = {'match': match, 'limit': limit}
+        if project:
+            sql += " AND t.project = :project"
+            params['project'] = project
+        if status:
+            sql += " AND t.status = :status"
+            params['status'] = status
+        sql += " ORDER BY tasks_fts.rank LIMIT :limit"
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(sql).columns(updated_at=DateTime), params).mappings().all()
+        return [
+            {**row, 'type': 'task', 'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None}
+            for row in rows
+        ]
+    
+    def search_logs(self, query, agent_id=None, event_type=None, limit=20):
+        """Busca en la descripción de los logs, ordenados por relevancia (bm25)"""
+        match = _fts_query(query)
+        if not self.search_enabled or not match:
+            return []
+        sql = (
+            "SELECT l.id, l.timestamp, l.event_type, l.agent_id, l.task_id, "
+            "snippet(system_logs_fts, 0, '[', ']', '…', 12) AS snippet, system_logs_fts.rank AS rank "
+            "FROM system_logs_fts JOIN system_logs l ON l.rowid = system_logs_fts.rowid "
+            "WHERE system_logs_fts MATCH :match"
+        )
+        params = {'match': match, 'limit': limit}
+        if agent_id:
+            sql += " AND l.agent_id = :agent_id"
+            params['agent_id'] = agent_id
+        if event_type:
+            sql += " AND l.event_type = :event_type"
+            params['event_type'] = event_type
+        sql += " ORDER BY system_logs_fts.rank LIMIT :limit"
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(sql).columns(timestamp=DateTime), params).mappings().all()
+        return [
+            {**row, 'type': 'log', 'timestamp': row['timestamp'].isoformat() if row['timestamp'] else None}
+            for row in rows
+        ]
+    
+    # --- MÉTRICAS ---
+    
+    def _record_rollup(self, session, agent_id, event_type, timestamp, duration_ms=None, error=False):
+        """Suma un evento a los agregados de minuto, hora y día (misma transacción que el evento)"""
+        timestamp = timestamp or datetime.utcnow()
+        has_duration = duration_ms is not None
+        duration = float(duration_ms) if has_duration else 0.0
+        table = MetricRollup.__table__
+        for granularity in ROLLUP_GRANULARITIES:
+            stmt = sqlite_insert(table).values(
+                granularity=granularity,
+                bucket_start=_bucket_start(timestamp, granularity),
+                agent_id=agent_id or '',
+                event_type=event_type or '',
+                count=1,
+                error_count=1 if error else 0,
+                duration_count=1 if has_duration else 0,
+                duration_sum_ms=duration,
+                duration_max_ms=duration
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['granularity', 'bucket_start', 'agent_id', 'event_type'],
+                set_={
+                    'count': table.c.count + 1,
+                    'error_count': table.c.error_count + stmt.excluded.error_count,
+                    'duration_count': table.c.duration_count + stmt.excluded.duration_count,
+                    'duration_sum_ms': table.c.duration_sum_ms + stmt.excluded.duration_sum_ms,
+                    'duration_max_ms': func.max(table.c.duration_max_ms, stmt.excluded.duration_max_ms)
+                }
+            )
+            session.execute(stmt)
+    
+    def _record_status_change(self, session, task):
+        """Registra finalizaciones (con su duración) y bloqueos de tareas en los agregados"""
+        now = task.updated_at or datetime.utcnow()
+        if task.status == 'completed':
+            if not task.completed_at:
+                task.completed_at = now
+            duration_ms = None
+            if task.created_at:
+                duration_ms = (task.completed_at - task.created_at).total_seconds() * 1000
+            self._record_rollup(session, task.assigned_agent, 'task_completed', now, duration_ms=duration_ms)
+        elif task.status == 'blocked':
+            self._record_rollup(session, task.assigned_agent, 'task_blocked', now, error=True)
+    
+    def get_timeseries(self, granularity='hour', start=None, end=None, agent_id=None, event_type=None):
+        """Serie temporal leída solo desde los agregados"""
+        if granularity not in ROLLUP_GRANULARITIES:
+            raise ValueError(f"Granularidad inválida: {granularity}")
         session = self.get_session()
         try:
-            query = session.query(SystemLog)
+            query = session.query(MetricRollup).filter(MetricRollup.granularity == granularity)
+            if start:
+                query = query.filter(MetricRollup.bucket_start >= _bucket_start(start, granularity))
+            if end:
+                query = query.filter(MetricRollup.bucket_start <= end)
             if agent_id:
-                query = query.filter(SystemLog.agent_id == agent_id)
+                query = query.filter(MetricRollup.agent_id == agent_id)
             if event_type:
-                query = query.filter(SystemLog.event_type == event_type)
-            logs = query.order_by(SystemLog.timestamp.desc()).limit(limit).all()
-            return [log.to_dict() for log in logs]
+                query = query.filter(MetricRollup.event_type == event_type)
+            rollups = query.order_by(MetricRollup.bucket_start, MetricRollup.agent_id, MetricRollup.event_type).all()
+            return [rollup.to_dict() for rollup in rollups]
         finally:
             session.close()
+    
+    def compact_rollups(self, minute_retention=timedelta(days=2), hour_retention=timedelta(days=90)):
+        """Elimina agregados finos antiguos; los de mayor granularidad conservan la historia"""
+        now = datetime.utcnow()
+        session = self.get_session()
+        try:
+            deleted = {}
+            for granularity, retention in (('minute', minute_retention), ('hour', hour_retention)):
+                deleted[granularity] = session.query(MetricRollup).filter(
+                    MetricRollup.granularity == granularity,
+                    MetricRollup.bucket_start < now - retention
+                ).delete(synchronize_session=False)
+            session.commit()
+            return deleted
+        finally:
+            session.close()
+    
+    def rebuild_rollups(self):
+        """Recalcula los conteos de eventos a partir de system_logs (bases existentes)"""
+        formats = {'minute': '%Y-%m-%d %H:%M:00', 'hour': '%Y-%m-%d %H:00:00', 'day': '%Y-%m-%d 00:00:00'}
+        with self.engine.begin() as conn:
+            conn.execute(MetricRollup.__table__.delete())
+            for granularity, fmt in formats.items():
+                conn.execute(text(
+                    "INSERT INTO metric_rollups (granularity, bucket_start, agent_id, event_type, count, "
+                    "error_count, duration_count, duration_sum_ms, duration_max_ms) "
+                    "SELECT :granularity, strftime(:fmt, timestamp) || '.000000', COALESCE(agent_id, ''), "
+                    "COALESCE(event_type, ''), COUNT(*), SUM(event_type = 'task_error'), 0, 0.0, 0.0 "
+                    "FROM system_logs GROUP BY 2, 3, 4"
+                ), {'granularity': granularity, 'fmt': fmt})
+                # Finalizaciones y bloqueos según el estado actual de las tareas
+                conn.execute(text(
+                    "INSERT INTO metric_rollups (granularity, bucket_start, agent_id, event_type, count, "
+                    "error_count, duration_count, duration_sum_ms, duration_max_ms) "
+                    "SELECT :granularity, strftime(:fmt, COALESCE(completed_at, updated_at)) || '.000000', "
+                    "COALESCE(assigned_agent, ''), 'task_' || status, COUNT(*), "
+                    "SUM(status = 'blocked'), SUM(status = 'completed'), "
+                    "SUM(CASE WHEN status = 'completed' THEN (julianday(COALESCE(completed_at, updated_at)) "
+                    "- julianday(created_at)) * 86400000.0 ELSE 0 END), "
+                    "MAX(CASE WHEN status = 'completed' THEN (julianday(COALESCE(completed_at, updated_at)) "
+                    "- julianday(created_at)) * 86400000.0 ELSE 0 END) "
+                    "FROM tasks WHERE status IN ('completed', 'blocked') GROUP BY 2, 3, 4"
+                ), {'granularity': granularity, 'fmt': fmt})
+    
+    # --- EXPORTACIÓN / IMPORTACIÓN ---
+    
+    def iter_rows(self, table_name, batch_size=1000):
+        """Recorre una tabla completa en lotes, sin cargarla en memoria.
+        
+        Cada lote es una lectura corta desde el último rowid leído: la exportación
+        no mantiene abierta una transacción de lectura que bloquee a los escritores
+        mientras el cliente descarga (las filas escritas entretanto pueden aparecer).
+        """
+        table = BACKUP_TABLES[table_name]['model'].__table__
+        rowid = literal_column('rowid')
+        # Orden de inserción (rowid): evita ordenar la tabla completa
+        query = select(rowid.label('_rowid'), *table.columns).order_by(rowid).limit(batch_size)
+        last = None
+        while True:
+            with self.engine.connect() as conn:
+                batch = query if last is None else query.where(rowid > last)
+                rows = [dict(row._mapping) for row in conn.execute(batch)]
+                if not rows:
+                    return
+                last = rows[-1]['_rowid']
+                for row in rows:
+                    del row['_rowid']
+                # Se exporta el contenido lógico: los payloads se resuelven por lote
+                rows = self.rehydrate_rows(table_name, rows, conn)
+            yield from rows
+            if len(rows) < batch_size:
+                return
+    
+    def bulk_upsert(self, table_name, rows):
+        """Inserta o actualiza un lote de filas en una sola transacción.
+        
+        Las filas llevan el contenido lógico (como las devuelve iter_rows); los
+        resultados grandes se guardan en payloads dentro de la misma transacción.
+        """
+        if not rows:
+            return 0
+        with self.engine.begin() as conn:
+            if table_name == 'agent_memory':
+                # Exportaciones anteriores: el historial venía dentro de la memoria
+                history = [entry for row in rows for entry in _history_rows(row['agent_id'], row.get('conversation_history'))]
+                rows = [{**row, 'conversation_history': []} if 'conversation_history' in row else row for row in rows]
+                self._upsert_rows(conn, 'agent_history', history)
+            return self._upsert_rows(conn, table_name, rows)
+    
+    def _upsert_rows(self, conn, table_name, rows):
+        if not rows:
+            return 0
+        spec = BACKUP_TABLES[table_name]
+        table = spec['model'].__table__
+        stmt = sqlite_insert(table)
+        conflict = spec['conflict']
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[conflict],
+            set_={c.name: stmt.excluded[c.name] for c in table.columns if c.name not in (conflict, 'id')}
+        )
+        stored = [_dehydrate_row(conn, table_name, row) for row in rows]
+        conn.execute(stmt, stored)
+        if table_name == 'tasks':
+            self._index_task_notes(conn, [
+                (row['id'], row['notes']) for row, saved in zip(rows, stored)
+                if saved.get('notes') is not row.get('notes')
+            ])
+        return len(stored)
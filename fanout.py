@@ -0,0 +1,80 @@
+"""
+Despacho Paralelo entre Proyectos (LangGraph)
+Una misma tarea se procesa en paralelo por varios agentes y sus resultados se combinan en un plan
+"""
+
+from typing import Annotated, Any, Dict, TypedDict
+
+from langgraph.graph import StateGraph, START, END
+
+# Orden de severidad para elegir el estado combinado
+STATUS_SEVERITY = ['completed', 'pending', 'in_progress', 'blocked']
+
+
+def _merge_dicts(left, right):
+    return {**left, **right}
+
+
+class FanOutState(TypedDict):
+    task: Dict[str, Any]
+    results: Annotated[Dict[str, Any], _merge_dicts]
+    merged: Dict[str, Any]
+
+
+def merge_results(results, agents):
+    """Combina las respuestas JSON de cada agente en un único plan"""
+    merged = {
+        'analisis': {},
+        'plan_accion': [],
+        'subtareas': [],
+        'proximos_pasos': [],
+        'estado_sugerido': 'completed',
+        'notas': {},
+        'agentes': []
+    }
+    for project, result in results.items():
+        agent_id = agents[project].agent_id
+        merged['agentes'].append(agent_id)
+        merged['analisis'][agent_id] = result.get('analisis', '')
+        merged['plan_accion'].extend(f"[{agent_id}] {step}" for step in result.get('plan_accion', []))
+        for subtask in result.get('subtareas', []):
+            if subtask not in merged['subtareas']:
+                merged['subtareas'].append(subtask)
+        merged['proximos_pasos'].extend(f"[{agent_id}] {step}" for step in result.get('proximos_pasos', []))
+        if result.get('notas'):
+            merged['notas'][agent_id] = result['notas']
+        if result.get('error'):
+            merged.setdefault('errores', {})[agent_id] = result['error']
+
+        status = result.get('estado_sugerido', 'in_progress')
+        if status not in STATUS_SEVERITY:
+            status = 'in_progress'
+        if STATUS_SEVERITY.index(status) > STATUS_SEVERITY.index(merged['estado_sugerido']):
+            merged['estado_sugerido'] = status
+    return merged
+
+
+def build_fanout_graph(agents, projects):
+    """Grafo START -> un nodo por proyecto (en paralelo) -> merge -> END"""
+    graph = StateGraph(FanOutState)
+
+    def make_node(project):
+        agent = agents[project]
+
+        def run_agent(state):
+            return {'results': {project: agent.process_task(state['task'])}}
+
+        return run_agent
+
+    def merge(state):
+        # Orden estable: el de la lista de proyectos, no el de finalización
+        results = {project: state['results'][project] for project in projects if project in state['results']}
+        return {'merged': merge_results(results, agents)}
+
+    graph.add_node('merge', merge)
+    for project in projects:
+        graph.add_node(project, make_node(project))
+        graph.add_edge(START, project)
+        graph.add_edge(project, 'merge')
+    graph.add_edge('merge', END)
+    return graph.compile()
@@ -0,0 +1,116 @@
+"""
+Comandos de Mantenimiento del Sistema Multi-Agente
+Uso: python manage.py <comando> [opciones]
+"""
+
+import argparse
+from datetime import timedelta
+import os
+
+from backup import export_ndjson, import_ndjson
+from database import BACKUP_TABLES, DatabaseManager
+from partitioning import PartitionedDatabaseManager
+from webhooks import run_receiver
+
+
+def rebuild_search(db, args):
+    """Reconstruye los índices de búsqueda de texto completo"""
+    if db.rebuild_search_index():
+        print("✓ Índices de búsqueda reconstruidos")
+    else:
+        print("✗ Búsqueda no disponible (SQLite sin FTS5)")
+
+
+def compact_rollups(db, args):
+    """Elimina agregados de minuto y hora fuera del período de retención"""
+    deleted = db.compact_rollups(
+        minute_retention=timedelta(hours=args.minute_hours),
+        hour_retention=timedelta(days=args.hour_days)
+    )
+    print(f"✓ Agregados eliminados: {deleted}")
+
+
+def rebuild_rollups(db, args):
+    """Recalcula los agregados de métricas desde logs y tareas"""
+    db.rebuild_rollups()
+    print("✓ Agregados de métricas recalculados")
+
+
+def purge_payloads(db, args):
+    """Elimina payloads que ya no referencia ninguna tarea, log o memoria"""
+    deleted = db.purge_payloads()
+    print(f"✓ Payloads eliminados: {deleted}")
+
+
+def export_data(db, args):
+    """Exporta tareas, memoria y logs a NDJSON (zstd si el archivo termina en .zst)"""
+    compress = args.zstd or args.output.endswith('.zst')
+    with open(args.output, 'wb') as output:
+        written = export_ndjson(db, output, tables=args.tables, compress=compress, batch_size=args.batch_size)
+    print(f"✓ Exportación escrita en {args.output} ({written} bytes)")
+
+
+def import_data(db, args):
+    """Importa un archivo NDJSON (plano o zstd) en transacciones por lotes"""
+    with open(args.input, 'rb') as source:
+        counts = import_ndjson(db, source, batch_size=args.batch_size)
+    print(f"✓ Filas importadas: {counts}")
+    if counts.get('system_logs'):
+        print("  Ejecuta 'python manage.py rebuild-rollups' para recalcular las métricas")
+
+
+def webhook_receiver(db, args):
+    """Receptor local de webhooks para pruebas: muestra los eventos que recibe"""
+    run_receiver(host=args.host, port=args.port, secret=args.secret, fail_rate=args.fail_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantenimiento del Multi-Agent Project Manager")
+    parser.add_argument('--db', default='sqlite:///multi_agent_system.db', help="URL de la base de datos")
+    parser.add_argument('--partition-dir', default=os.getenv('DB_PARTITION_DIR'),
+                        help="Directorio de las bases por proyecto (por defecto DB_PARTITION_DIR); ignora --db")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    cmd = subparsers.add_parser('rebuild-search', help="Reconstruir los índices FTS5 de tareas y logs")
+    cmd.set_defaults(handler=rebuild_search)
+
+    cmd = subparsers.add_parser('compact-rollups', help="Reducir agregados de métricas antiguos")
+    cmd.add_argument('--minute-hours', type=float, default=48, help="Horas de retención de agregados por minuto")
+    cmd.add_argument('--hour-days', type=float, default=90, help="Días de retención de agregados por hora")
+    cmd.set_defaults(handler=compact_rollups)
+
+    cmd = subparsers.add_parser('rebuild-rollups', help="Recalcular agregados de métricas desde system_logs")
+    cmd.set_defaults(handler=rebuild_rollups)
+
+    cmd = subparsers.add_parser('purge-payloads', help="Eliminar payloads sin referencias")
+    cmd.set_defaults(handler=purge_payloads)
+
+    cmd = subparsers.add_parser('export', help="Exportar datos a NDJSON")
+    cmd.add_argument('output', help="Archivo de salida (.ndjson o .ndjson.zst)")
+    cmd.add_argument('--tables', nargs='+', choices=list(BACKUP_TABLES), help="Tablas a exportar (todas por defecto)")
+    cmd.add_argument('--zstd', action='store_true', help="Comprimir con zstd")
+    cmd.add_argument('--batch-size', type=int, default=1000)
+    cmd.set_defaults(handler=export_data)
+
+    cmd = subparsers.add_parser('import', help="Importar datos desde NDJSON")
+    cmd.add_argument('input', help="Archivo de entrada (.ndjson o .ndjson.zst)")
+    cmd.add_argument('--batch-size', type=int, default=1000)
+    cmd.set_defaults(handler=import_data)
+
+    cmd = subparsers.add_parser('webhook-receiver', help="Receptor local de webhooks (pruebas)")
+    cmd.add_argument('--host', default='127.0.0.1')
+    cmd.add_argument('--port', type=int, default=9000)
+    cmd.add_argument('--secret', help="Verificar la firma con esta clave")
+    cmd.add_argument('--fail-rate', type=float, default=0.0, help="Fracción de entregas que responden 503")
+    cmd.set_defaults(handler=webhook_receiver, needs_db=False)
+
+    args = parser.parse_args()
+    # El receptor no usa la base de datos
+    db = None
+    if getattr(args, 'needs_db', True):
+        db = PartitionedDatabaseManager(args.partition_dir) if args.partition_dir else DatabaseManager(args.db)
+    args.handler(db, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Índice de Memoria por Relevancia
+Vectores TF-IDF con hashing (NumPy) sobre el historial y las decisiones de cada agente
+"""
+
+from collections import Counter
+import json
+import math
+import re
+import threading
+import unicodedata
+
+import numpy as np
+import xxhash
+
+from rate_limiter import estimate_tokens
+
+# Palabras sin contenido que no se indexan
+STOPWORDS = set("""
+    algo ante antes aqui asi aun cada como con contra cual cuando del desde donde durante ella ellas ellos
+    entre era eran esa esas ese eso esos esta estan estas este esto estos fue fueron hay las les los mas
+    mismo muy nos nuestra nuestro otra otro para pero poco por porque que quien se ser sera sin sobre
+    son su sus tambien tan tanto tiene tienen todo todos tras una uno unos unas usted ustedes ya
+    the and for with that this from are was were have has not you your
+""".split())
+
+_WORD = re.compile(r'\w{3,}')
+_COMBINING = re.compile(r'[\u0300-\u036f]')
+
+
+def _normalize(text):
+    return _COMBINING.sub('', unicodedata.normalize('NFKD', (text or '').casefold()))
+
+
+def term_counts(text):
+    """Frecuencia de cada término (se filtran los términos distintos, no cada aparición)"""
+    counts = Counter(_WORD.findall(_normalize(text)))
+    return {token: count for token, count in counts.items() if token not in STOPWORDS and not token.isdigit()}
+
+
+def _truncate(text, limit):
+    text = ' '.join(str(text or '').split())
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def conversation_item(entry):
+    """(texto a indexar, texto para el prompt) de una entrada del historial de conversación"""
+    if not isinstance(entry, dict):
+        return str(entry), _truncate(entry, 400)
+    date = str(entry.get('timestamp') or '')[:10]
+    response = entry.get('response')
+    if isinstance(response, dict):
+        plan = '; '.join(str(step) for step in response.get('plan_accion') or [])
+        subtasks = '; '.join(str(subtask) for subtask in response.get('subtareas') or [])
+        analysis = response.get('analisis') or ''
+        notes = response.get('notas') or ''
+        text = ' '.join(str(part) for part in (analysis, plan, subtasks, notes))
+        display = f"[{date}] Tarea {entry.get('task_id') or ''}: {_truncate(analysis, 300)}"
+        if plan:
+            display += f" | Plan: {_truncate(plan, 200)}"
+        return text, display
+    message = entry.get('user_message') or ''
+    answer = entry.get('agent_response') or ''
+    return f"{message} {answer}", f"[{date}] Usuario: {_truncate(message, 150)} | Respuesta: {_truncate(answer, 250)}"
+
+
+def decision_item(decision):
+    """(texto a indexar, texto para el prompt) de una decisión registrada"""
+    text = decision if isinstance(decision, str) else json.dumps(decision, ensure_ascii=False)
+    return text, f"Decisión: {_truncate(text, 400)}"
+
+
+class _Postings:
+    """Lista de apariciones de un término: (ítem, peso) en arrays que crecen por duplicación"""
+    __slots__ = ('items', 'weights', 'size')
+
+    def __init__(self, capacity=4):
+        self.items = np.empty(capacity, dtype=np.int32)
+        self.weights = np.empty(capacity, dtype=np.float32)
+        self.size = 0
+
+    def extend(self, items, weights):
+        needed = self.size + len(items)
+        if needed > len(self.items):
+            capacity = max(needed, 2 * len(self.items))
+            self.items = np.resize(self.items, capacity)
+            self.weights = np.resize(self.weights, capacity)
+        self.items[self.size:needed] = items
+        self.weights[self.size:needed] = weights
+        self.size = needed
+
+    def view(self):
+        return self.items[:self.size], self.weights[:self.size]
+
+
+class MemoryIndex:
+    """Índice invertido de vectores TF-IDF con hashing, actualizable ítem por ítem.
+
+    Cada término se proyecta con xxhash a una de `dimensions` columnas. Los
+    pesos de los documentos ((1 + log tf), normalizados) se guardan al agregar
+    el ítem y el IDF se aplica al consultar, por lo que agregar un ítem no
+    obliga a recalcular los anteriores. Una consulta solo recorre las listas de
+    sus términos y acumula puntajes con np.bincount.
+    """
+
+    def __init__(self, dimensions=1 << 18, max_query_terms=32):
+        self.dimensions = dimensions
+        self.max_query_terms = max_query_terms
+        self._postings = {}
+        self._df = np.zeros(dimensions, dtype=np.int32)
+        self._items = []
+        self._features = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _feature(self, token):
+        feature = self._features.get(token)
+        if feature is None:
+            feature = xxhash.xxh32_intdigest(token.encode('utf-8')) % self.dimensions
+            if len(self._features) < 500000:
+                self._features[token] = feature
+        return feature
+
+    def _vector(self, text):
+        counts = {}
+        for token, count in term_counts(text).items():
+            feature = self._feature(token)
+            counts[feature] = counts.get(feature, 0) + count
+        if not counts:
+            return {}
+        weights = {feature: 1.0 + math.log(count) for feature, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {feature: weight / norm for feature, weight in weights.items()}
+
+    def add_many(self, entries):
+        """Agrega ítems (texto a indexar, dato asociado); devuelve cuántos se agregaron"""
+        pending = {}
+        added = 0
+        with self._lock:
+            for text, item in entries:
+                added += 1
+                index = len(self._items)
+                self._items.append(item)
+                for feature, weight in self._vector(text).items():
+                    items, weights = pending.setdefault(feature, ([], []))
+                    items.append(index)
+                    weights.append(weight)
+            for feature, (items, weights) in pending.items():
+                postings = self._postings.get(feature)
+                if postings is None:
+                    postings = self._postings[feature] = _Postings(capacity=max(4, len(items)))
+                postings.extend(items, weights)
+                self._df[feature] += len(items)
+        return added
+
+    def add(self, text, item):
+        self.add_many([(text, item)])
+
+    def search(self, query, k=8):
+        """Los k ítems más relevantes para la consulta: lista de (puntaje, ítem), de mayor a menor"""
+        with self._lock:
+            total = len(self._items)
+            query_vector = self._vector(query)
+            if not total or not query_vector:
+                return []
+            features = np.fromiter(query_vector, dtype=np.int64, count=len(query_vector))
+            query_weights = np.fromiter(query_vector.values(), dtype=np.float32, count=len(query_vector))
+            idf = np.log((total + 1) / (self._df[features] + 1)).astype(np.float32) + 1.0
+            # Los términos más informativos primero; los muy comunes aportan poco
+            order = np.argsort(-idf * query_weights)[:self.max_query_terms]
+            item_arrays, weight_arrays = [], []
+            for position in order:
+                postings = self._postings.get(int(features[position]))
+                if postings is None:
+                    continue
+                items, weights = postings.view()
+                item_arrays.append(items)
+                weight_arrays.append(weights * (query_weights[position] * idf[position] * idf[position]))
+            if not item_arrays:
+                return []
+            scores = np.bincount(
+                np.concatenate(item_arrays), weights=np.concatenate(weight_arrays), minlength=total
+            )
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > k:
+                # Los que alcanzan el k-ésimo puntaje (con todos los empates, para desempatar por antigüedad)
+                threshold = np.partition(scores[candidates], len(candidates) - k)[len(candidates) - k]
+                candidates = candidates[scores[candidates] >= threshold]
+            # Mayor puntaje primero; a igual puntaje, el ítem más reciente
+            candidates = candidates[np.lexsort((-candidates, -scores[candidates]))][:k]
+            return [(float(scores[index]), self._items[index]) for index in candidates]
+
+    def select(self, query, k=8, max_tokens=600):
+        """Ítems relevantes (hasta k) cuyo texto para el prompt entra en max_tokens"""
+        selected = []
+        used = 0
+        for score, item in self.search(query, k=k):
+            tokens = estimate_tokens([item['text']], completion_tokens=0)
+            if used + tokens > max_tokens:
+                continue
+            selected.append({**item, 'score': round(score, 4)})
+            used += tokens
+        return selected
+
+
+def build_agent_index(history, decisions):
+    """Índice con el historial de conversación y las decisiones completas de un agente"""
+    index = MemoryIndex()
+    entries = []
+    for entry in history or []:
+        text, display = conversation_item(entry)
+        entries.append((text, {'kind': 'conversation', 'text': display}))
+    for decision in decisions or []:
+        text, display = decision_item(decision)
+        entries.append((text, {'kind': 'decision', 'text': display}))
+    index.add_many(entries)
+    return index
@@ -0,0 +1,416 @@
+"""
+Particionado de la Base de Datos por Proyecto
+Un archivo SQLite por proyecto para que las escrituras de un proyecto no bloqueen a los demás
+"""
+
+from datetime import datetime, timedelta
+import heapq
+import itertools
+import os
+import re
+import threading
+
+from sqlalchemy import literal_column, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import AgentMemory, DatabaseManager, IdempotencyKeyConflict, Task, TaskSubmission, task_fingerprint
+
+PARTITION_PREFIX = 'project_'
+
+
+def _partition_filename(project):
+    safe = re.sub(r'[^A-Za-z0-9_-]', '_', project)
+    return f'{PARTITION_PREFIX}{safe}.db'
+
+
+class PartitionedDatabaseManager:
+    """Gestor de Base de Datos particionado: una base SQLite por proyecto.
+
+    Expone la misma interfaz que DatabaseManager. Las tareas se ubican por
+    `project`, la memoria y los logs por el proyecto del agente, y las lecturas
+    sin proyecto (get_all_tasks, get_logs, búsquedas, métricas) consultan todas
+    las particiones y combinan los resultados ya ordenados con heapq.merge.
+    Lo que no corresponde a ningún proyecto va a la partición compartida.
+    """
+
+    def __init__(self, directory='data', dedup_window_seconds=None, max_cached_locations=100000):
+        self.directory = directory
+        self.dedup_window_seconds = dedup_window_seconds
+        self.max_cached_locations = max_cached_locations
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._partitions = {}
+        self._agent_projects = {}
+        self._task_locations = {}
+        # Lista compartida por todas las particiones: un listener recibe los eventos de cualquiera
+        self.listeners = []
+
+        self._shared = self._open(os.path.join(directory, 'shared.db'))
+        # Cargar particiones creadas en ejecuciones anteriores
+        for filename in sorted(os.listdir(directory)):
+            if filename.startswith(PARTITION_PREFIX) and filename.endswith('.db'):
+                manager = self._open(os.path.join(directory, filename))
+                for project in self._stored_projects(manager):
+                    self._partitions.setdefault(project, manager)
+        self.search_enabled = self._shared.search_enabled
+
+    def _open(self, path):
+        manager = DatabaseManager(f'sqlite:///{path}', dedup_window_seconds=self.dedup_window_seconds)
+        manager.listeners = self.listeners
+        return manager
+
+    @staticmethod
+    def _stored_projects(manager):
+        with manager.engine.connect() as conn:
+            projects = {row[0] for row in conn.execute(select(Task.project).distinct())}
+            projects |= {row[0] for row in conn.execute(select(AgentMemory.project).distinct())}
+        return projects
+
+    # --- RUTEO ---
+
+    def partition(self, project):
+        """Partición de un proyecto (se crea al primer uso)"""
+        if not project:
+            return self._shared
+        manager = self._partitions.get(project)
+        if manager is None:
+            with self._lock:
+                manager = self._partitions.get(project)
+                if manager is None:
+                    manager = self._open(os.path.join(self.directory, _partition_filename(project)))
+                    self._partitions[project] = manager
+        return manager
+
+    def all_partitions(self):
+        """Particiones distintas (incluida la compartida)"""
+        seen = {id(self._shared): self._shared}
+        for manager in list(self._partitions.values()):
+            seen.setdefault(id(manager), manager)
+        return list(seen.values())
+
+    def _remember_task(self, task):
+        if task:
+            if len(self._task_locations) >= self.max_cached_locations:
+                self._task_locations.clear()
+            self._task_locations[task['id']] = task['project']
+        return task
+
+    def _task_partition(self, task_id):
+        project = self._task_locations.get(task_id)
+        if project is not None:
+            return self.partition(project), None
+        for manager in self.all_partitions():
+            task = manager.get_task(task_id)
+            if task:
+                self._remember_task(task)
+                return manager, task
+        return None, None
+
+    def _agent_partition(self, agent_id):
+        project = self._agent_projects.get(agent_id)
+        if project is not None:
+            return self.partition(project)
+        for manager in self.all_partitions():
+            memory = manager.get_agent_memory(agent_id)
+            if memory:
+                self._agent_projects[agent_id] = memory['project']
+                return manager
+        return None
+
+    # --- TAREAS ---
+
+    def create_task(self, project, title, description, priority='medium', metadata=None):
+        return self._remember_task(
+            self.partition(project).create_task(project, title, description, priority=priority, metadata=metadata)
+        )
+
+    def submit_task(self, project, title, description, priority='medium', metadata=None, idempotency_key=None):
+        """Como DatabaseManager.submit_task; las claves de idempotencia valen para todos los proyectos.
+        
+        Las huellas de contenido incluyen el proyecto y quedan en su partición.
+        Las claves se registran en la compartida después de crear la tarea: si
+        otro envío registró la misma clave antes, la tarea creada se descarta.
+        """
+        manager = self.partition(project)
+        if not idempotency_key:
+            task, created = manager.submit_task(project, title, description, priority=priority, metadata=metadata)
+            return self._remember_task(task), created
+        
+        key = f'idem:{idempotency_key}'
+        fingerprint = task_fingerprint(project, title, description)
+        for _ in range(3):
+            existing = self._find_idempotent_task(key, fingerprint)
+            if existing:
+                return existing, False
+            task, created = manager.submit_task(project, title, description, priority=priority, metadata=metadata)
+            if self._claim_idempotency_key(key, task['id'], fingerprint):
+                return self._remember_task(task), created
+            if created:
+                manager.delete_task(task['id'])
+        raise RuntimeError('No se pudo registrar el envío de la tarea')
+    
+    def _find_idempotent_task(self, key, fingerprint):
+        table = TaskSubmission.__table__
+        with self._shared.engine.connect() as conn:
+            current = conn.execute(select(table).where(table.c.key == key)).first()
+        # La clave de una tarea eliminada se puede volver a usar
+        task = self.get_task(current.task_id) if current else None
+        if task and current.fingerprint and current.fingerprint != fingerprint:
+            raise IdempotencyKeyConflict('La clave de idempotencia ya se usó con otro contenido')
+        return task
+    
+    def _claim_idempotency_key(self, key, task_id, fingerprint):
+        """Registra la clave en la partición compartida; False si apunta a otra tarea vigente"""
+        table = TaskSubmission.__table__
+        now = datetime.utcnow()
+        with self._shared.engine.begin() as conn:
+            inserted = conn.execute(
+                sqlite_insert(table)
+                .values(key=key, task_id=task_id, fingerprint=fingerprint, created_at=now)
+                .on_conflict_do_nothing(index_elements=['key'])
+            )
+            if inserted.rowcount == 1:
+                return True
+            current = conn.execute(select(table).where(table.c.key == key)).first()
+        if current is None or self.get_task(current.task_id) is not None:
+            return False
+        # Su tarea fue eliminada: reemplazarla salvo que otro envío lo haya hecho antes
+        with self._shared.engine.begin() as conn:
+            updated = conn.execute(
+                table.update()
+                .where(table.c.key == key, table.c.task_id == current.task_id,
+                       table.c.created_at == current.created_at)
+                .values(task_id=task_id, fingerprint=fingerprint, created_at=now)
+            )
+            return updated.rowcount == 1
+
+    def get_task(self, task_id):
+        manager, task = self._task_partition(task_id)
+        if manager is None:
+            return None
+        task = task or manager.get_task(task_id)
+        if task is None and self._task_locations.pop(task_id, None) is not None:
+            # Ubicación en caché obsoleta (otro proceso movió o eliminó la tarea)
+            return self.get_task(task_id)
+        return task
+
+    def get_all_tasks(self, project=None, status=None):
+        if project:
+            return self.partition(project).get_all_tasks(project=project, status=status)
+        results = [manager.get_all_tasks(status=status) for manager in self.all_partitions()]
+        return list(heapq.merge(*results, key=lambda t: t['created_at'] or '', reverse=True))
+
+    def update_task(self, task_id, **kwargs):
+        manager, task = self._task_partition(task_id)
+        if manager is None:
+            return None
+        new_project = kwargs.get('project')
+        if new_project and self.partition(new_project) is not manager:
+            manager = self._move_task(task_id, manager, new_project)
+            if manager is None:
+                return None
+        task = manager.update_task(task_id, **kwargs)
+        if task is None and self._task_locations.pop(task_id, None) is not None:
+            return self.update_task(task_id, **kwargs)
+        return self._remember_task(task)
+
+    def _move_task(self, task_id, source, project):
+        """Mueve una tarea y sus subtareas a la partición de otro proyecto"""
+        table = Task.__table__
+        ids = [task_id] + source.get_descendant_ids(task_id)
+        with source.engine.connect() as conn:
+            rows = conn.execute(
+                select(table).where(table.c.id.in_(ids)).order_by(literal_column('rowid'))
+            ).mappings().all()
+        if not any(row['id'] == task_id for row in rows):
+            self._task_locations.pop(task_id, None)
+            return None
+        # Las notas viajan con su contenido: el destino guarda su propia copia del payload
+        rows = source.rehydrate_rows('tasks', [dict(row) for row in rows])
+        target = self.partition(project)
+        target.bulk_upsert('tasks', [{**row, 'project': project} for row in rows])
+        # Solo las filas copiadas (delete_task eliminaría también subtareas creadas mientras tanto)
+        moved = [row['id'] for row in rows]
+        with source.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.id.in_(moved)))
+        for moved_id in moved:
+            self._task_locations[moved_id] = project
+        return target
+
+    def claim_task(self, task_id, agent_id):
+        manager, _ = self._task_partition(task_id)
+        return manager.claim_task(task_id, agent_id) if manager else False
+
+    def delete_task(self, task_id):
+        manager, _ = self._task_partition(task_id)
+        self._task_locations.pop(task_id, None)
+        return manager.delete_task(task_id) if manager else False
+
+    # --- SUBTAREAS ---
+
+    def create_subtasks(self, parent_id, subtasks):
+        # Las subtareas heredan el proyecto: van a la partición de la tarea padre
+        manager, _ = self._task_partition(parent_id)
+        if manager is None:
+            return None
+        children = manager.create_subtasks(parent_id, subtasks)
+        for child in children or []:
+            self._remember_task(child)
+        return children
+
+    def get_subtasks(self, parent_id):
+        manager, _ = self._task_partition(parent_id)
+        return manager.get_subtasks(parent_id) if manager else []
+
+    # --- MEMORIA DE AGENTES ---
+
+    def get_or_create_agent_memory(self, agent_id, project, personality_traits=None):
+        self._agent_projects[agent_id] = project
+        return self.partition(project).get_or_create_agent_memory(
+            agent_id, project, personality_traits=personality_traits
+        )
+
+    def update_agent_memory(self, agent_id, **kwargs):
+        manager = self._agent_partition(agent_id)
+        return manager.update_agent_memory(agent_id, **kwargs) if manager else None
+
+    def get_agent_memory(self, agent_id):
+        manager = self._agent_partition(agent_id)
+        return manager.get_agent_memory(agent_id) if manager else None
+
+    def get_memory_items(self, agent_id):
+        manager = self._agent_partition(agent_id)
+        return manager.get_memory_items(agent_id) if manager else None
+
+    # --- LOGS ---
+
+    def _log_partition(self, agent_id, task_id):
+        manager = self._agent_partition(agent_id) if agent_id else None
+        if manager is None and task_id:
+            manager, _ = self._task_partition(task_id)
+        return manager or self._shared
+
+    def log_event(self, event_type, agent_id, description, task_id=None, metadata=None,
+                  duration_ms=None, error=False):
+        return self._log_partition(agent_id, task_id).log_event(
+            event_type, agent_id, description,
+            task_id=task_id, metadata=metadata, duration_ms=duration_ms, error=error
+        )
+
+    def get_logs(self, limit=50, agent_id=None, event_type=None):
+        managers = self.all_partitions()
+        if agent_id and agent_id in self._agent_projects:
+            # Los logs registrados antes de conocer al agente pueden estar en la compartida
+            agent_partition = self.partition(self._agent_projects[agent_id])
+            managers = [agent_partition] if agent_partition is self._shared else [agent_partition, self._shared]
+        # Cada partición devuelve sus `limit` más recientes; se combinan y recortan
+        results = [
+            manager.get_logs(limit=limit, agent_id=agent_id, event_type=event_type)
+            for manager in managers
+        ]
+        merged = heapq.merge(*results, key=lambda log: log['timestamp'] or '', reverse=True)
+        return list(itertools.islice(merged, limit))
+
+    # --- WEBHOOKS ---
+    # Las suscripciones y los eventos fallidos son globales: viven en la partición compartida
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def notify(self, event_type, data):
+        self._shared.notify(event_type, data)
+
+    def create_webhook(self, url, project=None, event_types=None, secret=None):
+        return self._shared.create_webhook(url, project=project, event_types=event_types, secret=secret)
+
+    def get_webhooks(self, include_secret=False):
+        return self._shared.get_webhooks(include_secret=include_secret)
+
+    def delete_webhook(self, subscription_id):
+        return self._shared.delete_webhook(subscription_id)
+
+    def add_dead_letter(self, subscription_id, url, event, attempts, last_error):
+        return self._shared.add_dead_letter(subscription_id, url, event, attempts, last_error)
+
+    def get_dead_letters(self, limit=50, subscription_id=None):
+        return self._shared.get_dead_letters(limit=limit, subscription_id=subscription_id)
+
+    def get_dead_letter(self, dead_letter_id):
+        return self._shared.get_dead_letter(dead_letter_id)
+
+    def delete_dead_letter(self, dead_letter_id):
+        return self._shared.delete_dead_letter(dead_letter_id)
+
+    # --- PAYLOADS ---
+
+    def purge_payloads(self):
+        return sum(manager.purge_payloads() for manager in self.all_partitions())
+
+    # --- BÚSQUEDA ---
+
+    def rebuild_search_index(self):
+        return all([manager.rebuild_search_index() for manager in self.all_partitions()])
+
+    def search_tasks(self, query, project=None, status=None, limit=20):
+        if project:
+            return self.partition(project).search_tasks(query, project=project, status=status, limit=limit)
+        results = [manager.search_tasks(query, status=status, limit=limit) for manager in self.all_partitions()]
+        return list(itertools.islice(heapq.merge(*results, key=lambda r: r['rank']), limit))
+
+    def search_logs(self, query, agent_id=None, event_type=None, limit=20):
+        results = [
+            manager.search_logs(query, agent_id=agent_id, event_type=event_type, limit=limit)
+            for manager in self.all_partitions()
+        ]
+        return list(itertools.islice(heapq.merge(*results, key=lambda r: r['rank']), limit))
+
+    # --- MÉTRICAS ---
+
+    def get_timeseries(self, granularity='hour', start=None, end=None, agent_id=None, event_type=None):
+        results = [
+            manager.get_timeseries(
+                granularity=granularity, start=start, end=end, agent_id=agent_id, event_type=event_type
+            )
+            for manager in self.all_partitions()
+        ]
+        return list(heapq.merge(
+            *results, key=lambda r: (r['bucket_start'] or '', r['agent_id'], r['event_type'])
+        ))
+
+    def compact_rollups(self, minute_retention=timedelta(days=2), hour_retention=timedelta(days=90)):
+        totals = {}
+        for manager in self.all_partitions():
+            for granularity, deleted in manager.compact_rollups(minute_retention, hour_retention).items():
+                totals[granularity] = totals.get(granularity, 0) + deleted
+        return totals
+
+    def rebuild_rollups(self):
+        for manager in self.all_partitions():
+            manager.rebuild_rollups()
+
+    # --- EXPORTACIÓN / IMPORTACIÓN ---
+
+    def iter_rows(self, table_name, batch_size=1000):
+        for manager in self.all_partitions():
+            yield from manager.iter_rows(table_name, batch_size=batch_size)
+
+    def bulk_upsert(self, table_name, rows):
+        """Reparte un lote entre particiones según proyecto (o agente, en logs e historial)"""
+        groups = {}
+        routes = {}
+        for row in rows:
+            if table_name in ('system_logs', 'agent_history'):
+                # Igual que log_event: partición del agente, o de la tarea, o la compartida
+                key = (row.get('agent_id'), row.get('task_id'))
+                if key not in routes:
+                    routes[key] = self._log_partition(*key)
+                manager = routes[key]
+            else:
+                project = row.get('project')
+                if table_name == 'agent_memory' and project:
+                    self._agent_projects[row['agent_id']] = project
+                elif table_name == 'tasks' and project:
+                    self._remember_task(row)
+                manager = self.partition(project)
+            groups.setdefault(id(manager), (manager, []))[1].append(row)
+        return sum(manager.bulk_upsert(table_name, group) for manager, group in groups.values())
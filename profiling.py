@@ -0,0 +1,162 @@
+"""
+Perfilado por Solicitud
+Profiler de muestreo que genera stacks colapsados (formato flamegraph) para solicitudes puntuales
+"""
+
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+import os
+import sys
+import threading
+import time
+import uuid
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Profiler de la solicitud en curso (se propaga a los hilos del threadpool de Starlette)
+_active_profiler = ContextVar('active_profiler', default=None)
+
+
+class SamplingProfiler:
+    """Muestrea periódicamente los stacks de los hilos que atienden una solicitud.
+
+    Solo se muestrean los hilos registrados con `track` (el del event loop y,
+    en endpoints sincrónicos, el del threadpool), así los hilos de fondo
+    (despachador de la cola, webhooks, índices de memoria) no aparecen. De
+    esos stacks se registran los que pasan por código del proyecto. Otras
+    solicitudes async concurrentes comparten el hilo del event loop y sus
+    stacks también pueden aparecer.
+    """
+
+    def __init__(self, interval=0.005, root=PROJECT_DIR):
+        self.interval = interval
+        self.root = root
+        self.counts = Counter()
+        self.samples = 0
+        self.thread_ids = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def track(self, thread_id=None):
+        """Agrega un hilo a muestrear (por defecto el actual)"""
+        self.thread_ids.add(thread_id or threading.get_ident())
+        return self
+
+    def _is_project_file(self, filename):
+        return filename.startswith(self.root) and 'site-packages' not in filename
+
+    def _sample(self):
+        frames = sys._current_frames()
+        for thread_id in list(self.thread_ids):
+            frame = frames.get(thread_id)
+            stack = []
+            relevant = False
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                if not relevant and self._is_project_file(code.co_filename):
+                    relevant = True
+                frame = frame.f_back
+            if relevant:
+                self.counts[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self
+
+    def collapsed(self):
+        """Stacks en formato colapsado: 'marco;marco;... cantidad' por línea"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class ProfileStore:
+    """Últimos perfiles en memoria (y opcionalmente en disco)"""
+
+    def __init__(self, max_profiles=50, directory=None):
+        self._profiles = deque(maxlen=max_profiles)
+        self._lock = threading.Lock()
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def add(self, method, path, status_code, started, duration_ms, profiler):
+        profile = {
+            'id': str(uuid.uuid4()),
+            'method': method,
+            'path': path,
+            'status_code': status_code,
+            'started_at': started.isoformat(),
+            'duration_ms': round(duration_ms, 1),
+            'samples': profiler.samples,
+            'stacks': len(profiler.counts),
+            'collapsed': profiler.collapsed()
+        }
+        if self.directory:
+            with open(os.path.join(self.directory, f"{profile['id']}.collapsed"), 'w', encoding='utf-8') as f:
+                f.write(profile['collapsed'])
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
+
+    def list(self):
+        with self._lock:
+            return [
+                {k: v for k, v in profile.items() if k != 'collapsed'}
+                for profile in reversed(self._profiles)
+            ]
+
+    def get(self, profile_id):
+        with self._lock:
+            for profile in self._profiles:
+                if profile['id'] == profile_id:
+                    return profile
+        return None
+
+
+def track_thread():
+    """Registra el hilo actual en el profiler de la solicitud, si se está perfilando.
+
+    Los endpoints sincrónicos lo llaman al empezar: corren en un hilo del
+    threadpool, distinto del que ejecuta el middleware.
+    """
+    profiler = _active_profiler.get()
+    if profiler is not None:
+        profiler.track()
+
+
+async def profile_request(request, call_next, store, interval=0.005):
+    """Ejecuta la solicitud bajo el profiler de muestreo y guarda el resultado"""
+    started = datetime.utcnow()
+    start = time.perf_counter()
+    profiler = SamplingProfiler(interval=interval).track().start()
+    token = _active_profiler.set(profiler)
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        _active_profiler.reset(token)
+        profiler.stop()
+        profile = store.add(
+            request.method,
+            request.url.path,
+            status_code,
+            started,
+            (time.perf_counter() - start) * 1000,
+            profiler
+        )
+    response.headers['X-Profile-Id'] = profile['id']
+    return response
@@ -0,0 +1,195 @@
+"""
+Limitador de Tasa para el LLM
+Token buckets de solicitudes y tokens por minuto compartidos entre agentes y procesos (SQLite)
+"""
+
+from datetime import datetime
+import os
+import sqlite3
+import threading
+import time
+
+import tiktoken
+
+# Tokens de salida que se reservan por llamada hasta conocer el uso real
+DEFAULT_COMPLETION_TOKENS = 800
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def _get_encoding(model):
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding('o200k_base')
+            except Exception:
+                # Sin acceso a los archivos BPE: se usa una estimación por caracteres
+                _encodings[model] = None
+        return _encodings[model]
+
+
+def estimate_tokens(texts, model='gpt-4.1-mini', completion_tokens=DEFAULT_COMPLETION_TOKENS):
+    """Estima los tokens de una llamada: prompt (tiktoken) + reserva para la respuesta"""
+    encoding = _get_encoding(model)
+    prompt_tokens = 0
+    for content in texts:
+        if encoding is not None:
+            prompt_tokens += len(encoding.encode(content, disallowed_special=()))
+        else:
+            prompt_tokens += len(content) // 4 + 1
+        prompt_tokens += 4  # Overhead por mensaje
+    return prompt_tokens + completion_tokens
+
+
+class TokenBucketRateLimiter:
+    """Token buckets de solicitudes y tokens por minuto persistidos en SQLite.
+
+    El estado vive en un archivo SQLite y se actualiza dentro de transacciones
+    BEGIN IMMEDIATE, por lo que todos los hilos y workers de uvicorn que usan el
+    mismo archivo comparten el mismo presupuesto. Cuando no hay capacidad, la
+    llamada espera (en lugar de fallar) hasta que el bucket se recarga.
+    """
+
+    def __init__(self, path='rate_limiter.db', requests_per_minute=None, tokens_per_minute=None,
+                 name='llm', max_sleep=1.0):
+        self.path = path
+        self.name = name
+        self.max_sleep = max_sleep
+        self.limits = {}
+        if requests_per_minute:
+            self.limits['requests'] = float(requests_per_minute)
+        if tokens_per_minute:
+            self.limits['tokens'] = float(tokens_per_minute)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {'acquired': 0, 'waited': 0, 'total_wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+        if self.enabled:
+            self._init_buckets()
+
+    @classmethod
+    def from_env(cls):
+        """Configuración desde LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE y LLM_RATE_LIMIT_DB"""
+        return cls(
+            path=os.getenv('LLM_RATE_LIMIT_DB', 'rate_limiter.db'),
+            requests_per_minute=float(os.getenv('LLM_REQUESTS_PER_MINUTE', '0')),
+            tokens_per_minute=float(os.getenv('LLM_TOKENS_PER_MINUTE', '0'))
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.limits)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_buckets(self):
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "name TEXT PRIMARY KEY, level REAL NOT NULL, capacity REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for kind, per_minute in self.limits.items():
+                # Si cambió el límite se actualiza la capacidad sin perder el nivel actual
+                conn.execute(
+                    "INSERT INTO buckets (name, level, capacity, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET capacity = excluded.capacity, "
+                    "level = MIN(level, excluded.capacity)",
+                    (f'{self.name}:{kind}', per_minute, per_minute, time.time())
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _try_consume(self, amounts):
+        """Consume de todos los buckets a la vez; devuelve 0 o los segundos a esperar"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            levels = {}
+            wait = 0.0
+            for kind, amount in amounts.items():
+                level, capacity, updated_at = conn.execute(
+                    "SELECT level, capacity, updated_at FROM buckets WHERE name = ?",
+                    (f'{self.name}:{kind}',)
+                ).fetchone()
+                rate = capacity / 60.0
+                level = min(capacity, level + max(0.0, now - updated_at) * rate)
+                levels[kind] = level
+                # Una llamada mayor que la capacidad solo exige el bucket lleno
+                needed = min(amount, capacity)
+                # Tolerancia: la recarga acumula errores de redondeo y una espera ínfima no avanza el reloj
+                if level + 1e-6 < needed:
+                    wait = max(wait, (needed - level) / rate)
+            if wait == 0.0:
+                for kind, amount in amounts.items():
+                    levels[kind] -= amount
+            for kind, level in levels.items():
+                conn.execute(
+                    "UPDATE buckets SET level = ?, updated_at = ? WHERE name = ?",
+                    (level, now, f'{self.name}:{kind}')
+                )
+            conn.execute('COMMIT')
+            return wait
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def acquire(self, tokens=0):
+        """Bloquea hasta que haya una solicitud y `tokens` disponibles; devuelve la espera"""
+        if not self.enabled:
+            return 0.0
+        amounts = {kind: (1 if kind == 'requests' else tokens) for kind in self.limits}
+        started = time.monotonic()
+        slept = False
+        while True:
+            wait = self._try_consume(amounts)
+            if wait == 0.0:
+                break
+            slept = True
+            time.sleep(min(wait, self.max_sleep))
+        waited = time.monotonic() - started
+        with self._stats_lock:
+            self._stats['acquired'] += 1
+            if slept:
+                self._stats['waited'] += 1
+            self._stats['total_wait_seconds'] += waited
+            self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], waited)
+        return waited
+
+    def adjust_tokens(self, estimated, actual):
+        """Corrige el bucket de tokens con el uso real (devuelve o descuenta la diferencia)"""
+        if 'tokens' not in self.limits or actual is None:
+            return
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                "UPDATE buckets SET level = MIN(capacity, level + ?) WHERE name = ?",
+                (float(estimated - actual), f'{self.name}:tokens')
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {
+            'timestamp': datetime.utcnow().isoformat(),
+            'enabled': self.enabled,
+            'limits_per_minute': dict(self.limits),
+            **stats
+        }
@@ -0,0 +1,233 @@
+"""
+Enrutamiento de Modelos
+Elige el nivel de modelo por prioridad, tamaño del prompt y resultados previos, con fallbacks
+"""
+
+from datetime import datetime
+import os
+import threading
+import time
+
+from rate_limiter import estimate_tokens
+
+# Precios aproximados en USD por millón de tokens (entrada, salida)
+MODEL_TIERS = {
+    'small': {
+        'model': os.getenv('LLM_MODEL_SMALL', 'gpt-4.1-nano'),
+        'temperature': 0.7,
+        'price_per_million': (0.10, 0.40)
+    },
+    'standard': {
+        'model': os.getenv('LLM_MODEL_STANDARD', 'gpt-4.1-mini'),
+        'temperature': 0.7,
+        'price_per_million': (0.40, 1.60)
+    },
+    'large': {
+        'model': os.getenv('LLM_MODEL_LARGE', 'gpt-4.1'),
+        'temperature': 0.7,
+        'price_per_million': (2.00, 8.00)
+    }
+}
+
+TIER_ORDER = ['small', 'standard', 'large']
+
+# Por defecto todo va al nivel estándar (el modelo de siempre); los cambios de nivel son opcionales
+DEFAULT_POLICY = {
+    # Nivel según la prioridad de la tarea (None = conversación)
+    'priority_tiers': {'low': 'standard', 'medium': 'standard', 'high': 'standard', 'urgent': 'standard',
+                       None: 'standard'},
+    # Prompts con hasta small_prompt_tokens bajan un nivel; desde large_prompt_tokens suben uno (None: no cambian)
+    'small_prompt_tokens': None,
+    'large_prompt_tokens': None,
+    # Una ruta con más errores o más latencia que esto pasa al final de la lista
+    'max_error_rate': 0.3,
+    'slow_latency_ms': 30000,
+    'min_calls': 5,
+    # Pasado este tiempo sin uso, una ruta degradada vuelve a probarse
+    'retry_after_seconds': 60
+}
+
+# Política escalonada (LLM_ROUTING=tiered): tareas simples y conversaciones cortas a un modelo más
+# barato, urgentes y prompts largos a uno más capaz
+TIERED_POLICY = {
+    **DEFAULT_POLICY,
+    'priority_tiers': {'low': 'small', 'medium': 'standard', 'high': 'standard', 'urgent': 'large', None: 'standard'},
+    'small_prompt_tokens': 1200,
+    'large_prompt_tokens': 6000
+}
+
+ROUTING_POLICIES = {'standard': DEFAULT_POLICY, 'tiered': TIERED_POLICY}
+
+
+class RouteStats:
+    """Estadísticas de una ruta (agente, nivel)"""
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self.calls = 0
+        self.errors = 0
+        self.fallbacks = 0
+        self.total_latency_ms = 0.0
+        self.ewma_latency_ms = None
+        self.ewma_error_rate = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        self.last_call = 0.0
+
+    def record(self, latency_ms, ok, input_tokens=0, output_tokens=0, price=(0.0, 0.0)):
+        self.calls += 1
+        self.last_call = time.monotonic()
+        self.total_latency_ms += latency_ms
+        if self.ewma_latency_ms is None:
+            self.ewma_latency_ms = latency_ms
+        else:
+            self.ewma_latency_ms += self.alpha * (latency_ms - self.ewma_latency_ms)
+        self.ewma_error_rate += self.alpha * ((0.0 if ok else 1.0) - self.ewma_error_rate)
+        if not ok:
+            self.errors += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cost_usd += (input_tokens * price[0] + output_tokens * price[1]) / 1_000_000
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'fallbacks': self.fallbacks,
+            'avg_latency_ms': round(self.total_latency_ms / self.calls, 1) if self.calls else None,
+            'ewma_latency_ms': round(self.ewma_latency_ms, 1) if self.ewma_latency_ms is not None else None,
+            'ewma_error_rate': round(self.ewma_error_rate, 3),
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'cost_usd': round(self.cost_usd, 6)
+        }
+
+
+class ModelRouter:
+    """Enrutador de modelos por agente.
+
+    `client_factory(model, temperature)` devuelve el cliente de chat para un
+    nivel e `invoke(messages, client)` realiza la llamada (con el límite de
+    tasa). Si una llamada falla se intenta con el siguiente nivel candidato.
+    """
+
+    def __init__(self, client_factory, invoke, tiers=None, default_policy=None):
+        self.client_factory = client_factory
+        self.invoke_fn = invoke
+        self.tiers = tiers or MODEL_TIERS
+        self.default_policy = default_policy or DEFAULT_POLICY
+        self.policies = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, client_factory, invoke):
+        """Política base desde LLM_ROUTING: standard (por defecto) o tiered"""
+        name = os.getenv('LLM_ROUTING', 'standard')
+        if name not in ROUTING_POLICIES:
+            raise ValueError(f"LLM_ROUTING desconocido: {name} (opciones: {', '.join(ROUTING_POLICIES)})")
+        return cls(client_factory, invoke, default_policy=ROUTING_POLICIES[name])
+
+    def get_policy(self, agent_id):
+        policy = {**self.default_policy, **self.policies.get(agent_id, {})}
+        policy['priority_tiers'] = {**self.default_policy['priority_tiers'], **policy['priority_tiers']}
+        return policy
+
+    def set_policy(self, agent_id, **overrides):
+        """Ajusta la política de un agente (solo las claves indicadas)"""
+        unknown = set(overrides) - set(self.default_policy)
+        if unknown:
+            raise ValueError(f"Parámetros de política desconocidos: {', '.join(sorted(unknown))}")
+        for tier in (overrides.get('priority_tiers') or {}).values():
+            if tier not in self.tiers:
+                raise ValueError(f"Nivel de modelo desconocido: {tier}")
+        with self._lock:
+            current = self.policies.setdefault(agent_id, {})
+            current.update({k: v for k, v in overrides.items() if v is not None})
+        return self.get_policy(agent_id)
+
+    def _route_stats(self, agent_id, tier):
+        key = (agent_id, tier)
+        if key not in self._stats:
+            self._stats[key] = RouteStats()
+        return self._stats[key]
+
+    def _is_healthy(self, agent_id, tier, policy):
+        stats = self._stats.get((agent_id, tier))
+        if not stats or stats.calls < policy['min_calls']:
+            return True
+        if time.monotonic() - stats.last_call >= policy['retry_after_seconds']:
+            return True
+        return (stats.ewma_error_rate <= policy['max_error_rate']
+                and stats.ewma_latency_ms <= policy['slow_latency_ms'])
+
+    def choose(self, agent_id, priority=None, prompt_tokens=0):
+        """Devuelve los niveles a intentar, en orden (el primero es el elegido)"""
+        policy = self.get_policy(agent_id)
+        tier = policy['priority_tiers'].get(priority, policy['priority_tiers'][None])
+        index = TIER_ORDER.index(tier)
+        if policy['large_prompt_tokens'] and prompt_tokens >= policy['large_prompt_tokens']:
+            index = min(index + 1, len(TIER_ORDER) - 1)
+        elif (policy['small_prompt_tokens'] and prompt_tokens <= policy['small_prompt_tokens']
+              and priority not in ('high', 'urgent')):
+            index = max(index - 1, 0)
+        primary = TIER_ORDER[index]
+
+        # Fallbacks: primero hacia arriba (más capacidad), luego hacia abajo
+        candidates = [primary] + TIER_ORDER[index + 1:] + TIER_ORDER[:index][::-1]
+        with self._lock:
+            healthy = [t for t in candidates if self._is_healthy(agent_id, t, policy)]
+        # Las rutas degradadas se mantienen como último recurso
+        return healthy + [t for t in candidates if t not in healthy]
+
+    def invoke(self, agent_id, messages, priority=None):
+        """Invoca el modelo elegido; ante errores usa los niveles de respaldo.
+        
+        Devuelve (respuesta, nivel utilizado).
+        """
+        prompt_tokens = estimate_tokens([m.content for m in messages], completion_tokens=0)
+        last_error = None
+        for attempt, tier in enumerate(self.choose(agent_id, priority, prompt_tokens)):
+            config = self.tiers[tier]
+            client = self.client_factory(config['model'], config['temperature'])
+            started = time.perf_counter()
+            try:
+                response = self.invoke_fn(messages, client)
+            except Exception as e:
+                last_error = e
+                with self._lock:
+                    self._route_stats(agent_id, tier).record((time.perf_counter() - started) * 1000, ok=False)
+                continue
+            usage = getattr(response, 'usage_metadata', None) or {}
+            with self._lock:
+                stats = self._route_stats(agent_id, tier)
+                stats.record(
+                    (time.perf_counter() - started) * 1000,
+                    ok=True,
+                    input_tokens=usage.get('input_tokens', 0),
+                    output_tokens=usage.get('output_tokens', 0),
+                    price=config['price_per_million']
+                )
+                if attempt:
+                    stats.fallbacks += 1
+            return response, tier
+        raise last_error
+
+    def record_failure(self, agent_id, tier):
+        """Registra una respuesta inutilizable (p.ej. JSON mal formado) contra la ruta que la produjo"""
+        with self._lock:
+            stats = self._route_stats(agent_id, tier)
+            stats.ewma_error_rate += stats.alpha * (1.0 - stats.ewma_error_rate)
+            stats.errors += 1
+
+    def get_stats(self):
+        with self._lock:
+            routes = {}
+            for (agent_id, tier), stats in sorted(self._stats.items()):
+                routes.setdefault(agent_id, {})[tier] = {'model': self.tiers[tier]['model'], **stats.to_dict()}
+            return {
+                'timestamp': datetime.utcnow().isoformat(),
+                'tiers': {tier: config['model'] for tier, config in self.tiers.items()},
+                'routes': routes
+            }
@@ -0,0 +1,205 @@
+"""
+Planificador de Tareas
+Elige la próxima tarea pendiente según prioridad, antigüedad y reparto justo entre proyectos
+"""
+
+from collections import deque
+from datetime import datetime
+import itertools
+import threading
+import time
+
+PRIORITIES = ['low', 'medium', 'high', 'urgent']
+
+DEFAULT_PRIORITY_WEIGHTS = {
+    'low': 1.0,
+    'medium': 2.0,
+    'high': 4.0,
+    'urgent': 8.0
+}
+
+
+class TaskScheduler:
+    """Cola de tareas con prioridad, envejecimiento y reparto justo por proyecto
+
+    Puntaje de una tarea en espera:
+        (peso_prioridad + espera / aging_seconds) / penalización_proyecto
+
+    Cada `aging_seconds` de espera suma un punto, por lo que una tarea `low`
+    termina superando a una `urgent` recién llegada y nunca queda postergada
+    indefinidamente. La penalización crece cuando un proyecto consumió más
+    tiempo de LLM que la fracción que le corresponde según `project_shares`.
+    El consumo se atenúa con una vida media de `usage_half_life` segundos.
+    """
+
+    def __init__(self, priority_weights=None, project_shares=None, aging_seconds=60.0,
+                 fairness_weight=1.0, usage_half_life=300.0):
+        self.priority_weights = dict(DEFAULT_PRIORITY_WEIGHTS)
+        self.project_shares = {}
+        self.aging_seconds = aging_seconds
+        self.fairness_weight = fairness_weight
+        self.usage_half_life = usage_half_life
+        self.configure(priority_weights=priority_weights, project_shares=project_shares)
+
+        # (proyecto, prioridad) -> deque FIFO de (encolada, id, secuencia); el primero siempre es el más antiguo
+        self._queues = {}
+        # id -> secuencia de su entrada vigente: las entradas removidas o reemplazadas quedan obsoletas
+        self._queued = {}
+        self._sequence = itertools.count()
+        self._usage = {}
+        self._usage_updated = time.monotonic()
+        self._stats = {priority: self._empty_stats() for priority in PRIORITIES}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _empty_stats():
+        return {'enqueued': 0, 'dispatched': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+
+    def configure(self, priority_weights=None, project_shares=None, aging_seconds=None,
+                  fairness_weight=None, usage_half_life=None):
+        """Actualiza los parámetros del planificador"""
+        if priority_weights:
+            self.priority_weights.update(priority_weights)
+        if project_shares:
+            self.project_shares.update(project_shares)
+        if aging_seconds is not None:
+            self.aging_seconds = max(float(aging_seconds), 1e-6)
+        if fairness_weight is not None:
+            self.fairness_weight = float(fairness_weight)
+        if usage_half_life is not None:
+            self.usage_half_life = max(float(usage_half_life), 1e-6)
+        return self.get_config()
+
+    def get_config(self):
+        return {
+            'priority_weights': dict(self.priority_weights),
+            'project_shares': dict(self.project_shares),
+            'aging_seconds': self.aging_seconds,
+            'fairness_weight': self.fairness_weight,
+            'usage_half_life': self.usage_half_life
+        }
+
+    # --- COLA ---
+
+    def enqueue(self, task):
+        """Encola una tarea; devuelve False si ya estaba en la cola"""
+        priority = task.get('priority') or 'medium'
+        if priority not in self.priority_weights:
+            priority = 'medium'
+        with self._lock:
+            if task['id'] in self._queued:
+                return False
+            key = (task['project'], priority)
+            sequence = next(self._sequence)
+            self._queues.setdefault(key, deque()).append((time.monotonic(), task['id'], sequence))
+            self._queued[task['id']] = sequence
+            self._stats.setdefault(priority, self._empty_stats())['enqueued'] += 1
+            return True
+
+    def remove(self, task_id):
+        """Quita una tarea de la cola (se descarta de forma perezosa)"""
+        with self._lock:
+            return self._queued.pop(task_id, None) is not None
+
+    def next_task(self):
+        """Extrae el id de la tarea con mayor puntaje, o None si la cola está vacía"""
+        with self._lock:
+            now = time.monotonic()
+            self._decay_usage(now)
+            best_key, best_score = None, None
+            for key, queue in self._queues.items():
+                # Descartar tareas removidas (o vueltas a encolar con otra entrada)
+                while queue and not self._is_live(queue[0]):
+                    queue.popleft()
+                if not queue:
+                    continue
+                score = self._score(key, queue[0][0], now)
+                if best_score is None or score > best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                return None
+
+            enqueued_at, task_id, _ = self._queues[best_key].popleft()
+            del self._queued[task_id]
+            wait = now - enqueued_at
+            stats = self._stats[best_key[1]]
+            stats['dispatched'] += 1
+            stats['total_wait'] += wait
+            stats['max_wait'] = max(stats['max_wait'], wait)
+            return task_id
+
+    def _is_live(self, entry):
+        return self._queued.get(entry[1]) == entry[2]
+
+    def _score(self, key, enqueued_at, now):
+        project, priority = key
+        base = self.priority_weights.get(priority, 1.0) + (now - enqueued_at) / self.aging_seconds
+        return base / self._fairness_penalty(project)
+
+    def _fairness_penalty(self, project):
+        total_usage = sum(self._usage.values())
+        if total_usage <= 0 or self.fairness_weight <= 0:
+            return 1.0
+        projects = {key[0] for key, queue in self._queues.items() if queue} | set(self._usage)
+        total_share = sum(self.project_shares.get(p, 1.0) for p in projects)
+        target = self.project_shares.get(project, 1.0) / total_share if total_share else 0.0
+        if target <= 0:
+            return 1.0 + self.fairness_weight
+        used = self._usage.get(project, 0.0) / total_usage
+        return 1.0 + self.fairness_weight * max(0.0, used / target - 1.0)
+
+    # --- CONSUMO DE LLM ---
+
+    def record_usage(self, project, seconds):
+        """Registra el tiempo de LLM consumido por un proyecto"""
+        with self._lock:
+            self._decay_usage(time.monotonic())
+            self._usage[project] = self._usage.get(project, 0.0) + max(seconds, 0.0)
+
+    def _decay_usage(self, now):
+        elapsed = now - self._usage_updated
+        if elapsed <= 0:
+            return
+        factor = 0.5 ** (elapsed / self.usage_half_life)
+        for project in self._usage:
+            self._usage[project] *= factor
+        self._usage_updated = now
+
+    # --- ESTADÍSTICAS ---
+
+    def __len__(self):
+        return len(self._queued)
+
+    def get_stats(self):
+        """Profundidad de cola y tiempos de espera por clase de prioridad"""
+        with self._lock:
+            now = time.monotonic()
+            self._decay_usage(now)
+            depth = {}
+            oldest = {}
+            for (project, priority), queue in self._queues.items():
+                live = [entry[0] for entry in queue if self._is_live(entry)]
+                if not live:
+                    continue
+                depth[priority] = depth.get(priority, 0) + len(live)
+                oldest[priority] = max(oldest.get(priority, 0.0), now - live[0])
+
+            by_priority = {}
+            for priority, stats in self._stats.items():
+                dispatched = stats['dispatched']
+                by_priority[priority] = {
+                    'queue_depth': depth.get(priority, 0),
+                    'oldest_wait_seconds': round(oldest.get(priority, 0.0), 3),
+                    'enqueued': stats['enqueued'],
+                    'dispatched': dispatched,
+                    'avg_wait_seconds': round(stats['total_wait'] / dispatched, 3) if dispatched else 0.0,
+                    'max_wait_seconds': round(stats['max_wait'], 3)
+                }
+
+            return {
+                'timestamp': datetime.utcnow().isoformat(),
+                'queue_depth': len(self._queued),
+                'by_priority': by_priority,
+                'project_usage_seconds': {p: round(u, 3) for p, u in self._usage.items()},
+                'config': self.get_config()
+            }
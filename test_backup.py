@@ -0,0 +1,86 @@
+"""
+Pruebas de Exportación e Importación NDJSON
+Ida y vuelta plana y con zstd, upserts y lecturas que no bloquean a los escritores (sin LLM)
+"""
+
+import io
+import json
+import sqlite3
+
+import pytest
+
+from backup import ZSTD_MAGIC, export_ndjson, import_ndjson, iter_export
+from database import PAYLOAD_MIN_BYTES, DatabaseManager
+
+AGENT = 'OptimizadorConsorcio'
+
+
+def _source(path):
+    db = DatabaseManager(f"sqlite:///{path}")
+    db.get_or_create_agent_memory(AGENT, 'ConsorcioOpt')
+    db.update_agent_memory(AGENT, decisions_made={'decision': 'Priorizar cobranza'})
+    result = {'analisis': 'Morosidad alta ' * (PAYLOAD_MIN_BYTES // 10), 'estado_sugerido': 'in_progress'}
+    for i in range(5):
+        task = db.create_task('ConsorcioOpt', f'Tarea {i}', 'Detalle ñandú', metadata={'orden': i})
+        db.update_task(task['id'], notes=json.dumps(result, ensure_ascii=False), status='completed')
+        db.update_agent_memory(AGENT, conversation_history={'task_id': task['id'], 'response': result})
+        db.log_event('task_processed', AGENT, f'Procesada {i}', task_id=task['id'], metadata=result)
+    return db
+
+
+def _snapshot(db):
+    memory = db.get_memory_items(AGENT)
+    return {
+        'tasks': sorted((t['id'], t['title'], t['description'], t['notes'], t['status'], t['created_at'],
+                         json.dumps(t['metadata'])) for t in db.get_all_tasks()),
+        'logs': sorted((log['id'], log['description'], log['timestamp'], json.dumps(log['metadata']))
+                       for log in db.get_logs(limit=100)),
+        'history': memory['conversation_history'],
+        'decisions': memory['decisions_made']
+    }
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_round_trip(tmp_path, compress):
+    source = _source(tmp_path / 'source.db')
+    exported = io.BytesIO()
+    assert export_ndjson(source, exported, compress=compress, batch_size=2) == len(exported.getvalue())
+    assert exported.getvalue().startswith(ZSTD_MAGIC) == compress
+
+    exported.seek(0)
+    target = DatabaseManager(f"sqlite:///{tmp_path / 'target.db'}")
+    counts = import_ndjson(target, exported, batch_size=3)
+    assert counts == {'tasks': 5, 'agent_memory': 1, 'agent_history': 5, 'system_logs': 5}
+    assert _snapshot(target) == _snapshot(source)
+    # El archivo del llamador sigue abierto
+    assert not exported.closed
+
+    # Reimportar actualiza las filas existentes en lugar de duplicarlas
+    exported.seek(0)
+    import_ndjson(target, exported)
+    assert _snapshot(target) == _snapshot(source)
+
+
+def test_export_selected_tables_in_chunks(tmp_path):
+    source = _source(tmp_path / 'source.db')
+    chunks = list(iter_export(source, tables=['tasks'], chunk_size=256))
+    assert len(chunks) > 1
+    lines = b''.join(chunks).decode('utf-8').splitlines()
+    assert [json.loads(line)['table'] for line in lines] == ['tasks'] * 5
+
+
+def test_unknown_table_is_rejected(tmp_path):
+    target = DatabaseManager(f"sqlite:///{tmp_path / 'target.db'}")
+    with pytest.raises(ValueError):
+        import_ndjson(target, io.BytesIO(b'{"table": "users", "row": {}}\n'))
+
+
+def test_export_does_not_block_writers(tmp_path):
+    path = tmp_path / 'source.db'
+    source = _source(path)
+    rows = source.iter_rows('tasks', batch_size=2)
+    first = next(rows)
+    # Exportación a medio descargar: otro proceso puede escribir sin esperar
+    with sqlite3.connect(path, timeout=0.1) as conn:
+        conn.execute("UPDATE tasks SET title = 'Renombrada' WHERE id = ?", (first['id'],))
+    assert len([first, *rows]) == 5
@@ -0,0 +1,153 @@
+"""
+Pruebas de la Agrupación de Lecturas Concurrentes
+Cálculos compartidos, micro-caché con TTL e invalidación (sin servidor ni base de datos)
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+import coalescing
+from coalescing import SingleFlight
+
+
+class FakeClock:
+    """Reloj controlado para time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Reads:
+    """Lectura que cuenta sus ejecuciones y espera a `release` antes de terminar"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, value=0):
+        self.calls += 1
+        self.release.wait(5)
+        return {'value': value, 'call': self.calls}
+
+
+async def _started(flight):
+    """Espera a que los cálculos lanzados estén en curso"""
+    await asyncio.sleep(0)
+    while not flight._inflight:
+        await asyncio.sleep(0.001)
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight, read = SingleFlight(), Reads()
+        read.release.clear()
+        calls = [asyncio.ensure_future(flight.run('report', read)) for _ in range(5)]
+        await _started(flight)
+        read.release.set()
+        results = await asyncio.gather(*calls)
+        # Sin TTL, una llamada posterior vuelve a calcular
+        later = await flight.run('report', read)
+        return flight, results, later
+
+    flight, results, later = asyncio.run(scenario())
+    assert all(result is results[0] for result in results)
+    assert later['call'] == 2
+    stats = flight.get_stats()
+    assert stats['endpoints']['report'] == {
+        'executed': 2, 'coalesced': 4, 'cache_hits': 0, 'errors': 0, 'requests': 6, 'shared_ratio': 0.6667
+    }
+    assert stats['in_flight'] == 0 and stats['cached'] == 0
+
+
+def test_arguments_are_part_of_the_key():
+    async def scenario():
+        flight, read = SingleFlight(ttl=10), Reads()
+        return [await flight.run('status', read, project) for project in ('A', 'B', 'A')], read.calls
+
+    results, calls = asyncio.run(scenario())
+    assert [result['value'] for result in results] == ['A', 'B', 'A']
+    assert calls == 2
+
+
+def test_ttl_reuses_the_result_until_it_expires(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(coalescing.time, 'monotonic', clock)
+
+    async def scenario():
+        flight, read = SingleFlight(ttl=0.3), Reads()
+        first = await flight.run('agents', read)
+        clock.now += 0.2
+        cached = await flight.run('agents', read)
+        clock.now += 0.2
+        expired = await flight.run('agents', read)
+        # Un ttl por llamada reemplaza al general
+        await flight.run('report', read, ttl=0)
+        uncached = await flight.run('report', read, ttl=0)
+        return flight, first, cached, expired, uncached
+
+    flight, first, cached, expired, uncached = asyncio.run(scenario())
+    assert cached is first
+    assert expired['call'] == 2
+    assert uncached['call'] == 4
+    assert flight.get_stats()['endpoints']['agents']['cache_hits'] == 1
+
+
+def test_invalidate_drops_cached_results():
+    async def scenario():
+        flight, read = SingleFlight(ttl=60), Reads()
+        await flight.run('report', read)
+        await flight.run('agents', read)
+        flight.invalidate('report')
+        report = await flight.run('report', read)
+        agents = await flight.run('agents', read)
+        flight.invalidate()
+        again = await flight.run('agents', read)
+        return report, agents, again
+
+    report, agents, again = asyncio.run(scenario())
+    assert report['call'] == 3
+    assert agents['call'] == 2
+    assert again['call'] == 4
+
+
+def test_invalidate_during_a_computation():
+    async def scenario():
+        flight, read = SingleFlight(ttl=60), Reads()
+        read.release.clear()
+        before = asyncio.ensure_future(flight.run('report', read))
+        await _started(flight)
+        # Una escritura desde otro hilo mientras se calcula
+        await asyncio.to_thread(flight.invalidate)
+        after = asyncio.ensure_future(flight.run('report', read))
+        await asyncio.sleep(0.01)
+        read.release.set()
+        before, after = await asyncio.gather(before, after)
+        latest = await flight.run('report', read)
+        return before, after, latest
+
+    before, after, latest = asyncio.run(scenario())
+    # La solicitud posterior no se sumó al cálculo anterior, y el anterior no quedó en caché
+    assert after is not before
+    assert latest is after
+
+
+def test_errors_are_shared_but_not_cached():
+    def failing():
+        raise RuntimeError('base bloqueada')
+
+    async def scenario():
+        flight = SingleFlight(ttl=60)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await flight.run('report', failing)
+        return flight
+
+    stats = asyncio.run(scenario()).get_stats()
+    assert stats['endpoints']['report']['errors'] == 2
+    assert stats['cached'] == 0
@@ -0,0 +1,61 @@
+"""
+Pruebas del Coordinador de Proyectos
+Reclamo atómico de tareas entre la asignación directa y la cola (agentes simulados, sin LLM)
+"""
+
+import os
+
+# agents crea el cliente del LLM al importarse; estas pruebas no lo llaman
+os.environ.setdefault("OPENAI_API_KEY", "sin-uso")
+
+import pytest
+
+from agents import ProjectCoordinator
+from database import DatabaseManager
+
+
+@pytest.fixture
+def coordinator(tmp_path):
+    coordinator = ProjectCoordinator(DatabaseManager(f"sqlite:///{tmp_path / 'coordinator.db'}"))
+    calls = []
+    for agent in coordinator.agents.values():
+        agent.process_task = lambda task, agent=agent: calls.append((agent.agent_id, task['id'])) or {
+            'analisis': 'ok', 'subtareas': [], 'estado_sugerido': 'in_progress'
+        }
+    coordinator.calls = calls
+    yield coordinator
+    coordinator.stop_dispatcher()
+
+
+def test_assign_claims_the_task(coordinator):
+    task = coordinator.db.create_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    result = coordinator.assign_task(task)
+    assert 'error' not in result
+    assert coordinator.calls == [('OptimizadorConsorcio', task['id'])]
+    assert coordinator.db.get_task(task['id'])['assigned_agent'] == 'OptimizadorConsorcio'
+
+
+def test_claimed_task_is_not_processed_twice(coordinator):
+    task = coordinator.db.create_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    # Otro worker la reclamó entre la creación y la asignación
+    assert coordinator.db.claim_task(task['id'], 'OtroWorker')
+    result = coordinator.assign_task(task)
+    assert result['error']
+    assert coordinator.calls == []
+    assert coordinator.db.get_task(task['id'])['assigned_agent'] == 'OtroWorker'
+
+
+def test_queue_skips_tasks_assigned_directly(coordinator):
+    task = coordinator.db.create_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    coordinator.enqueue_task(task)
+    coordinator.assign_task(task)
+    assert coordinator.process_queue() == []
+    assert len(coordinator.calls) == 1
+
+
+def test_queue_processes_each_task_once(coordinator):
+    tasks = [coordinator.db.create_task('SocialConsorcio', f'Tarea {i}', 'Detalle') for i in range(3)]
+    assert coordinator.enqueue_pending_tasks() == 3
+    assert len(coordinator.process_queue()) == 3
+    assert coordinator.enqueue_pending_tasks() == 0
+    assert sorted(task_id for _, task_id in coordinator.calls) == sorted(task['id'] for task in tasks)
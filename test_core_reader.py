@@ -0,0 +1,77 @@
+"""
+Pruebas de las Lecturas con Core
+Las consultas frecuentes devuelven lo mismo que el to_dict de los modelos ORM (sin LLM)
+"""
+
+import json
+
+import pytest
+
+from database import PAYLOAD_MIN_BYTES, DatabaseManager, SystemLog, Task
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'reader.db'}")
+    session = db.get_session()
+    try:
+        # Filas con JSON vacío, nulo o ausente, como las dejan versiones anteriores e importaciones
+        session.add(Task(id='vacia', project='ConsorcioOpt', title='Sin datos', subtasks=None, extra_data=None,
+                         depends_on=None))
+        session.add(SystemLog(id='nulo', event_type='system', description='Sin metadata', extra_data=None))
+        session.commit()
+    finally:
+        session.close()
+
+    parent = db.create_task('ConsorcioOpt', 'Cobranza «marzo»', 'Detalle con ñ y emojis 🏢', priority='urgent',
+                            metadata={'origen': 'api', 'etiquetas': ['a', 'b'], 'anidado': {'x': 1.5, 'y': None}})
+    children = db.create_subtasks(parent['id'], [{'title': 'Relevar'}, {'title': 'Llamar', 'depends_on': [0]}])
+    db.update_task(parent['id'], notes='Notas cortas', subtasks=['Relevar', 'Llamar'])
+    db.update_task(children[0]['id'], status='completed', notes=json.dumps(
+        {'analisis': 'Detalle ' * PAYLOAD_MIN_BYTES}, ensure_ascii=False
+    ))
+    db.log_event('task_processed', 'OptimizadorConsorcio', 'Procesada', task_id=parent['id'],
+                 metadata={'resultado': 'x' * PAYLOAD_MIN_BYTES})
+    db.log_event('task_created', None, 'Creada', metadata={'lista': [], 'vacio': {}})
+    return db
+
+
+def _orm(db, model):
+    session = db.get_session()
+    try:
+        return {row.id: row.to_dict() for row in session.query(model).all()}
+    finally:
+        session.close()
+
+
+def test_tasks_match_the_orm(db):
+    expected = _orm(db, Task)
+    assert len(expected) == 4
+    assert {task['id']: task for task in db.get_all_tasks()} == expected
+    for task_id, task in expected.items():
+        assert db.get_task(task_id) == task
+    assert db.get_task('inexistente') is None
+
+    # Los tipos también coinciden (listas y dicts vacíos, None)
+    empty = db.get_task('vacia')
+    assert empty['subtasks'] is None and empty['metadata'] is None and empty['depends_on'] == []
+
+
+def test_filtered_tasks_match_the_orm(db):
+    expected = _orm(db, Task)
+    completed = db.get_all_tasks(status='completed')
+    assert [task['title'] for task in completed] == ['Relevar']
+    assert completed[0] == expected[completed[0]['id']]
+    assert completed[0]['notes'].startswith('{"analisis": "Detalle')
+    assert all(task == expected[task['id']] for task in db.get_all_tasks(project='ConsorcioOpt'))
+
+
+def test_logs_match_the_orm(db):
+    expected = _orm(db, SystemLog)
+    logs = db.get_logs(limit=100)
+    assert {log['id']: log for log in logs} == expected
+    assert [log['id'] for log in db.get_logs(limit=1, agent_id='OptimizadorConsorcio')] == [
+        log_id for log_id, log in expected.items() if log['agent_id'] == 'OptimizadorConsorcio'
+    ]
+    assert db.get_logs(event_type='task_created')[0]['metadata'] == {'lista': [], 'vacio': {}}
+    assert expected['nulo']['metadata'] is None
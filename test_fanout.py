@@ -0,0 +1,105 @@
+"""
+Pruebas del Despacho Paralelo entre Proyectos
+Combinación de planes y ejecución del grafo con agentes simulados (sin LLM)
+"""
+
+import os
+import threading
+
+# agents crea el cliente del LLM al importarse; estas pruebas no lo llaman
+os.environ.setdefault("OPENAI_API_KEY", "sin-uso")
+
+import pytest
+
+from agents import ProjectCoordinator
+from database import DatabaseManager
+from fanout import merge_results
+
+
+class _Agent:
+    def __init__(self, agent_id):
+        self.agent_id = agent_id
+
+
+AGENTS = {'A': _Agent('AgenteA'), 'B': _Agent('AgenteB'), 'C': _Agent('AgenteC')}
+
+
+def _merged_status(*statuses):
+    results = {project: {'estado_sugerido': status} for project, status in zip('ABC', statuses)}
+    return merge_results(results, AGENTS)['estado_sugerido']
+
+
+# --- merge_results ---
+
+def test_most_severe_status_wins():
+    assert _merged_status('completed', 'completed') == 'completed'
+    assert _merged_status('completed', 'pending') == 'pending'
+    assert _merged_status('pending', 'in_progress', 'completed') == 'in_progress'
+    assert _merged_status('in_progress', 'blocked', 'pending') == 'blocked'
+
+
+def test_unknown_or_missing_status_counts_as_in_progress():
+    assert _merged_status('completed', 'archivada') == 'in_progress'
+    assert merge_results({'A': {}}, AGENTS)['estado_sugerido'] == 'in_progress'
+    assert merge_results({}, AGENTS)['estado_sugerido'] == 'completed'
+
+
+def test_merge_tags_steps_and_deduplicates_subtasks():
+    merged = merge_results({
+        'A': {'analisis': 'Costos', 'plan_accion': ['Relevar'], 'subtareas': ['Presupuesto', 'Difusión'],
+              'notas': 'Urgente'},
+        'B': {'analisis': 'Difusión', 'subtareas': ['Difusión', 'Encuesta'], 'proximos_pasos': ['Publicar'],
+              'error': 'Timeout'}
+    }, AGENTS)
+    assert merged['agentes'] == ['AgenteA', 'AgenteB']
+    assert merged['analisis'] == {'AgenteA': 'Costos', 'AgenteB': 'Difusión'}
+    assert merged['plan_accion'] == ['[AgenteA] Relevar']
+    assert merged['subtareas'] == ['Presupuesto', 'Difusión', 'Encuesta']
+    assert merged['proximos_pasos'] == ['[AgenteB] Publicar']
+    assert merged['notas'] == {'AgenteA': 'Urgente'}
+    assert merged['errores'] == {'AgenteB': 'Timeout'}
+
+
+# --- ProjectCoordinator.fan_out_task ---
+
+@pytest.fixture
+def coordinator(tmp_path):
+    coordinator = ProjectCoordinator(DatabaseManager(f"sqlite:///{tmp_path / 'fanout.db'}"))
+    statuses = {'ConsorcioOpt': 'completed', 'SocialConsorcio': 'blocked', 'SocialEmprendedores': 'pending'}
+    # Cada agente espera a los demás: solo termina si los tres corren en paralelo
+    barrier = threading.Barrier(len(statuses), timeout=5)
+    for project, agent in coordinator.agents.items():
+        def process_task(task, agent=agent, status=statuses[project]):
+            barrier.wait()
+            return {'analisis': f"{agent.agent_id}: {task['title']}", 'subtareas': ['Relevar'],
+                    'estado_sugerido': status}
+        agent.process_task = process_task
+    return coordinator
+
+
+def test_fan_out_runs_agents_in_parallel_and_stores_the_merge(coordinator):
+    db = coordinator.db
+    task = db.create_task('ConsorcioOpt', 'Campaña de expensas', 'Detalle')
+    projects = ['SocialEmprendedores', 'ConsorcioOpt', 'SocialConsorcio']
+    result = coordinator.fan_out_task(task, projects)
+
+    assert result['agents'] == ['MentorEmprendedor', 'OptimizadorConsorcio', 'SocialManagerConsorcio']
+    assert result['merged']['agentes'] == result['agents']
+    assert result['merged']['estado_sugerido'] == 'blocked'
+    assert result['merged']['subtareas'] == ['Relevar']
+
+    stored = db.get_task(task['id'])
+    assert stored['status'] == 'blocked'
+    assert stored['assigned_agent'] == 'OptimizadorConsorcio'
+    assert stored['metadata']['fan_out']['projects'] == projects
+    assert db.get_logs(event_type='task_fanout_merged')[0]['task_id'] == task['id']
+
+    # La tarea ya fue tomada: no se vuelve a procesar
+    assert coordinator.fan_out_task(task, projects)['error']
+
+
+def test_fan_out_rejects_unknown_projects(coordinator):
+    task = coordinator.db.create_task('ConsorcioOpt', 'Campaña', 'Detalle')
+    assert 'Inexistente' in coordinator.fan_out_task(task, ['ConsorcioOpt', 'Inexistente'])['error']
+    assert coordinator.fan_out_task(task, [])['error']
+    assert coordinator.db.get_task(task['id'])['assigned_agent'] is None
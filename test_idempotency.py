@@ -0,0 +1,100 @@
+"""
+Pruebas de Envíos Idempotentes
+Claves de idempotencia y ventana de deduplicación por contenido (sin LLM)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import DatabaseManager, IdempotencyKeyConflict, TaskSubmission, task_fingerprint
+
+
+def _db(tmp_path, dedup_window_seconds=None):
+    return DatabaseManager(f"sqlite:///{tmp_path / 'submissions.db'}", dedup_window_seconds=dedup_window_seconds)
+
+
+def _age_submissions(db, prefix, seconds):
+    session = db.get_session()
+    try:
+        session.query(TaskSubmission).filter(TaskSubmission.key.like(f'{prefix}%')).update(
+            {'created_at': datetime.utcnow() - timedelta(seconds=seconds)}, synchronize_session=False
+        )
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_fingerprint_normalizes_case_and_spaces():
+    assert task_fingerprint('ConsorcioOpt', ' Revisar  cobranza ', 'Detalle') == \
+        task_fingerprint('consorcioopt', 'revisar cobranza', 'DETALLE')
+    assert task_fingerprint('ConsorcioOpt', 'a', 'b c') != task_fingerprint('ConsorcioOpt', 'a b', 'c')
+
+
+def test_same_key_returns_the_same_task(tmp_path):
+    db = _db(tmp_path)
+    task, created = db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle', idempotency_key='k1')
+    again, created_again = db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle', idempotency_key='k1')
+    assert created and not created_again
+    assert again['id'] == task['id']
+    assert len(db.get_all_tasks()) == 1
+
+
+def test_reused_key_with_another_body_is_rejected(tmp_path):
+    db = _db(tmp_path)
+    db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle', idempotency_key='k1')
+    with pytest.raises(IdempotencyKeyConflict):
+        db.submit_task('ConsorcioOpt', 'Otra tarea', 'Detalle', idempotency_key='k1')
+    assert len(db.get_all_tasks()) == 1
+
+
+def test_key_of_a_deleted_task_can_be_reused(tmp_path):
+    db = _db(tmp_path)
+    task, _ = db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle', idempotency_key='k1')
+    db.delete_task(task['id'])
+    again, created = db.submit_task('ConsorcioOpt', 'Otra tarea', 'Detalle', idempotency_key='k1')
+    assert created and again['id'] != task['id']
+
+
+def test_concurrent_submissions_create_one_task(tmp_path):
+    db = _db(tmp_path, dedup_window_seconds=60)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(
+            lambda _: db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle', idempotency_key='k1'), range(16)
+        ))
+    assert sum(created for _, created in results) == 1
+    assert len({task['id'] for task, _ in results}) == 1
+    assert len(db.get_all_tasks()) == 1
+
+
+def test_without_window_identical_content_creates_tasks(tmp_path):
+    db = _db(tmp_path)
+    first, _ = db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    second, created = db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    assert created and second['id'] != first['id']
+
+
+def test_dedup_window(tmp_path):
+    db = _db(tmp_path, dedup_window_seconds=60)
+    first, created = db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    assert created
+    duplicate, created = db.submit_task('consorcioopt', ' cobranza ', 'detalle')
+    assert not created and duplicate['id'] == first['id']
+    other, created = db.submit_task('ConsorcioOpt', 'Cobranza', 'Otro detalle')
+    assert created and other['id'] != first['id']
+
+    # Fuera de la ventana el mismo contenido vuelve a crear una tarea
+    _age_submissions(db, 'fp:', 120)
+    later, created = db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    assert created and later['id'] != first['id']
+    duplicate, created = db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    assert not created and duplicate['id'] == later['id']
+
+
+def test_idempotency_key_outlives_the_window(tmp_path):
+    db = _db(tmp_path, dedup_window_seconds=60)
+    task, _ = db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle', idempotency_key='k1')
+    _age_submissions(db, '', 120)
+    again, created = db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle', idempotency_key='k1')
+    assert not created and again['id'] == task['id']
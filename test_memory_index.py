@@ -0,0 +1,98 @@
+"""
+Pruebas del Índice de Memoria por Relevancia
+Orden de los recuerdos, presupuesto de tokens e índice de cada agente (sin LLM)
+"""
+
+import os
+
+# agents crea el cliente del LLM al importarse; estas pruebas no lo llaman
+os.environ.setdefault("OPENAI_API_KEY", "sin-uso")
+
+from agents import OptimizadorConsorcio
+from database import DatabaseManager
+from memory_index import MemoryIndex, build_agent_index, term_counts
+
+
+def _index(*texts):
+    index = MemoryIndex()
+    index.add_many((text, {'text': text}) for text in texts)
+    return index
+
+
+def _texts(hits):
+    return [item['text'] for _, item in hits]
+
+
+def test_terms_ignore_case_accents_stopwords_and_numbers():
+    assert term_counts('La CAMPAÑA de expensas y la campana 2024 de expensas') == {
+        'campana': 2, 'expensas': 2
+    }
+
+
+def test_more_matching_terms_rank_first():
+    index = _index(
+        'Revisar la cobranza de expensas',
+        'Campaña de redes sociales para el consorcio',
+        'Cobranza de expensas atrasadas del consorcio'
+    )
+    hits = index.search('cobranza expensas consorcio')
+    assert _texts(hits) == [
+        'Cobranza de expensas atrasadas del consorcio',
+        'Revisar la cobranza de expensas',
+        'Campaña de redes sociales para el consorcio'
+    ]
+    assert hits[0][0] > hits[1][0] > hits[2][0]
+    assert index.search('ascensores') == []
+    assert index.search('de la') == []
+
+
+def test_rare_terms_weigh_more_than_common_ones():
+    index = _index(*(['Reunión del consorcio'] * 5), 'Consorcio con filtraciones', 'Filtraciones en el techo')
+    # "filtraciones" aparece en menos ítems: pesa más que "consorcio"
+    assert _texts(index.search('consorcio filtraciones', k=2)) == [
+        'Consorcio con filtraciones', 'Filtraciones en el techo'
+    ]
+
+
+def test_ties_prefer_recent_items_and_k_limits():
+    index = _index('Plan de cobranza', 'Plan de cobranza', 'Plan de cobranza')
+    index.add('Plan de cobranza', {'text': 'último'})
+    assert _texts(index.search('cobranza', k=2)) == ['último', 'Plan de cobranza']
+    assert len(index.search('cobranza')) == 4
+    assert len(index) == 4
+
+
+def test_select_respects_the_token_budget():
+    index = _index('Cobranza ' + 'detalle ' * 200, 'Cobranza breve')
+    selected = index.select('cobranza', max_tokens=50)
+    assert [item['text'] for item in selected] == ['Cobranza breve']
+    assert selected[0]['score'] > 0
+
+
+def test_agent_index_includes_history_and_decisions():
+    index = build_agent_index(
+        [{'task_id': 't1', 'timestamp': '2024-03-01T10:00:00',
+          'response': {'analisis': 'Morosidad alta', 'plan_accion': ['Llamar a los morosos']}},
+         {'user_message': '¿Cómo publico en Instagram?', 'agent_response': 'Con un calendario semanal'}],
+        ['Priorizar la cobranza de morosos', {'decision': 'Cambiar de proveedor de limpieza'}]
+    )
+    kinds = [item['kind'] for _, item in index.search('morosos')]
+    assert sorted(kinds) == ['conversation', 'decision']
+    assert index.search('proveedor')[0][1]['text'].startswith('Decisión: {"decision"')
+    assert index.search('instagram')[0][1]['text'].startswith('[] Usuario: ¿Cómo publico en Instagram?')
+
+
+def test_agent_recall_includes_new_entries(tmp_path):
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'memory.db'}")
+    agent = OptimizadorConsorcio(db)
+    agent.remember({'task_id': 't1', 'response': {'analisis': 'Renegociar el seguro del edificio'}})
+    assert agent.wait_memory_index(5)
+    agent.remember({'user_message': 'Horarios de la pileta', 'agent_response': 'De 9 a 18'})
+    assert [item['text'] for item in agent.recall('seguro edificio')][0].startswith('[')
+    assert 'pileta' in agent.recall('pileta')[0]['text']
+    assert 'Renegociar el seguro' in agent.get_system_prompt('seguro')
+
+    # Otra instancia reconstruye el índice desde la base
+    reopened = OptimizadorConsorcio(db)
+    assert reopened.wait_memory_index(5)
+    assert len(reopened.memory_index) == 2
@@ -0,0 +1,118 @@
+"""
+Pruebas de Métricas Agregadas
+Agregados por minuto, hora y día, compactación y reconstrucción desde los logs (sin LLM)
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import DatabaseManager, SystemLog
+
+AGENT = 'OptimizadorConsorcio'
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(f"sqlite:///{tmp_path / 'metrics.db'}")
+
+
+def _move_logs(db, description, timestamp):
+    session = db.get_session()
+    try:
+        session.query(SystemLog).filter(SystemLog.description == description).update(
+            {'timestamp': timestamp}, synchronize_session=False
+        )
+        session.commit()
+    finally:
+        session.close()
+
+
+def _counts(series):
+    """(eventos, errores) por agente y tipo, sumando los intervalos (la prueba puede cruzar un minuto)"""
+    counts = {}
+    for point in series:
+        key = (point['agent_id'], point['event_type'])
+        count, errors = counts.get(key, (0, 0))
+        counts[key] = (count + point['count'], errors + point['error_count'])
+    return counts
+
+
+def test_events_are_aggregated_per_bucket(db):
+    db.log_event('task_processed', AGENT, 'Procesada', duration_ms=100)
+    db.log_event('task_processed', AGENT, 'Procesada', duration_ms=300)
+    db.log_event('task_error', AGENT, 'Falló', error=True)
+    db.log_event('task_created', None, 'Creada')
+
+    for granularity in ('minute', 'hour', 'day'):
+        series = db.get_timeseries(granularity)
+        assert _counts(series) == {
+            (AGENT, 'task_processed'): (2, 0),
+            (AGENT, 'task_error'): (1, 1),
+            ('', 'task_created'): (1, 0)
+        }
+    processed = db.get_timeseries('day', agent_id=AGENT, event_type='task_processed')
+    assert len(processed) == 1
+    assert processed[0]['avg_duration_ms'] == 200.0
+    assert processed[0]['max_duration_ms'] == 300.0
+    assert processed[0]['per_hour'] == round(2 / 24, 3)
+    error = db.get_timeseries('day', event_type='task_error')[0]
+    assert error['error_rate'] == 1.0
+    assert error['avg_duration_ms'] is None
+    assert db.get_timeseries('minute', agent_id='Otro') == []
+
+
+def test_invalid_granularity(db):
+    with pytest.raises(ValueError):
+        db.get_timeseries('week')
+
+
+def test_range_filters_whole_buckets(db):
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=5)
+    db.log_event('task_processed', AGENT, 'Antes')
+    db.log_event('task_processed', AGENT, 'Después')
+    _move_logs(db, 'Antes', hour + timedelta(minutes=10))
+    _move_logs(db, 'Después', hour + timedelta(hours=2, minutes=30))
+    db.rebuild_rollups()
+
+    series = db.get_timeseries('hour')
+    assert [point['bucket_start'] for point in series] == [
+        hour.isoformat(), (hour + timedelta(hours=2)).isoformat()
+    ]
+    # El inicio se alinea al comienzo de su intervalo
+    assert len(db.get_timeseries('hour', start=hour + timedelta(minutes=45))) == 2
+    assert len(db.get_timeseries('hour', start=hour + timedelta(hours=1))) == 1
+    assert len(db.get_timeseries('hour', end=hour + timedelta(hours=1))) == 1
+
+
+def test_rebuild_matches_the_live_counts(db):
+    for _ in range(3):
+        db.log_event('task_processed', AGENT, 'Procesada')
+    db.log_event('task_error', AGENT, 'Falló', error=True)
+    task = db.create_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    db.update_task(task['id'], assigned_agent=AGENT)
+    db.update_task(task['id'], status='completed')
+    live = {granularity: _counts(db.get_timeseries(granularity)) for granularity in ('minute', 'hour', 'day')}
+    assert live['hour'][(AGENT, 'task_completed')] == (1, 0)
+
+    db.rebuild_rollups()
+    for granularity, counts in live.items():
+        assert _counts(db.get_timeseries(granularity)) == counts
+    completed = db.get_timeseries('day', event_type='task_completed')[0]
+    assert completed['avg_duration_ms'] is not None
+
+
+def test_compaction_keeps_coarser_history(db):
+    now = datetime.utcnow()
+    db.log_event('task_processed', AGENT, 'Reciente')
+    db.log_event('task_processed', AGENT, 'Semana pasada')
+    db.log_event('task_processed', AGENT, 'Año pasado')
+    _move_logs(db, 'Semana pasada', now - timedelta(days=7))
+    _move_logs(db, 'Año pasado', now - timedelta(days=365))
+    db.rebuild_rollups()
+
+    assert db.compact_rollups() == {'minute': 2, 'hour': 1}
+    assert len(db.get_timeseries('minute')) == 1
+    assert len(db.get_timeseries('hour')) == 2
+    assert sum(point['count'] for point in db.get_timeseries('day')) == 3
+    assert db.compact_rollups() == {'minute': 0, 'hour': 0}
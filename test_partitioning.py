@@ -0,0 +1,125 @@
+"""
+Pruebas de la Base Particionada por Proyecto
+Ruteo de escrituras, importación en particiones y lecturas combinadas (sin LLM)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import sqlite3
+
+import pytest
+
+from backup import export_ndjson, import_ndjson
+from database import DatabaseManager, IdempotencyKeyConflict
+from partitioning import PartitionedDatabaseManager
+
+AGENT = 'OptimizadorConsorcio'
+
+
+def _count(path, table, agent_id=None):
+    with sqlite3.connect(path) as conn:
+        if agent_id:
+            return conn.execute(f"SELECT count(*) FROM {table} WHERE agent_id = ?", (agent_id,)).fetchone()[0]
+        return conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+
+def test_writes_go_to_the_project_partition(tmp_path):
+    db = PartitionedDatabaseManager(str(tmp_path))
+    db.get_or_create_agent_memory(AGENT, 'ConsorcioOpt')
+    task = db.create_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    db.create_task('SocialConsorcio', 'Calendario', 'Diciembre')
+    db.log_event('task_processed', AGENT, 'Procesada', task_id=task['id'])
+    db.log_event('system', None, 'Sin agente')
+
+    partition = tmp_path / 'project_ConsorcioOpt.db'
+    assert _count(partition, 'tasks') == 1
+    assert _count(tmp_path / 'project_SocialConsorcio.db', 'tasks') == 1
+    assert _count(partition, 'system_logs') == 1
+    assert _count(tmp_path / 'shared.db', 'system_logs') == 1
+
+
+def test_idempotency_keys_span_all_partitions(tmp_path):
+    db = PartitionedDatabaseManager(str(tmp_path))
+    task, created = db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle', idempotency_key='k1')
+    assert created
+    # La misma clave con otro proyecto no crea una segunda tarea
+    with pytest.raises(IdempotencyKeyConflict):
+        db.submit_task('SocialConsorcio', 'Cobranza', 'Detalle', idempotency_key='k1')
+    assert _count(tmp_path / 'project_SocialConsorcio.db', 'tasks') == 0
+    assert _count(tmp_path / 'shared.db', 'task_submissions') == 1
+
+    # Un reintento, aun desde otra instancia, devuelve la tarea original
+    reopened = PartitionedDatabaseManager(str(tmp_path))
+    retried, created = reopened.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle', idempotency_key='k1')
+    assert not created and retried['id'] == task['id']
+
+    # La clave de una tarea eliminada se puede volver a usar
+    reopened.delete_task(task['id'])
+    moved, created = reopened.submit_task('SocialConsorcio', 'Calendario', 'Diciembre', idempotency_key='k1')
+    assert created and moved['project'] == 'SocialConsorcio'
+    assert db.submit_task('SocialConsorcio', 'Calendario', 'Diciembre', idempotency_key='k1')[0]['id'] == moved['id']
+
+
+def test_concurrent_submissions_with_one_key(tmp_path):
+    db = PartitionedDatabaseManager(str(tmp_path))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(
+            lambda _: db.submit_task('ConsorcioOpt', 'Cobranza', 'Detalle', idempotency_key='k2'), range(16)
+        ))
+    assert len({task['id'] for task, _ in results}) == 1
+    assert sum(created for _, created in results) == 1
+    assert _count(tmp_path / 'project_ConsorcioOpt.db', 'tasks') == 1
+
+
+def test_reads_merge_all_partitions(tmp_path):
+    db = PartitionedDatabaseManager(str(tmp_path))
+    titles = []
+    for i, project in enumerate(['ConsorcioOpt', 'SocialConsorcio', 'SocialEmprendedores'] * 2):
+        titles.append(db.create_task(project, f'Tarea {i}', 'Detalle')['title'])
+        db.log_event('task_created', None, f'Log {i}')
+    # Más recientes primero, como con una sola base
+    assert [task['title'] for task in db.get_all_tasks()] == titles[::-1]
+    assert [log['description'] for log in db.get_logs(limit=4)] == [f'Log {i}' for i in (5, 4, 3, 2)]
+    assert len(db.get_all_tasks(project='SocialConsorcio')) == 2
+
+
+def test_import_routes_logs_by_agent(tmp_path):
+    source = DatabaseManager(f"sqlite:///{tmp_path / 'source.db'}")
+    source.get_or_create_agent_memory(AGENT, 'ConsorcioOpt')
+    source.update_agent_memory(AGENT, conversation_history={'task_id': 't1', 'response': {'analisis': 'ok'}})
+    task = source.create_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    for i in range(30):
+        source.log_event('task_processed', AGENT, f'Log {i}', task_id=task['id'])
+    exported = io.BytesIO()
+    export_ndjson(source, exported)
+    exported.seek(0)
+
+    directory = tmp_path / 'partitions'
+    db = PartitionedDatabaseManager(str(directory))
+    # Lotes chicos: los logs se escriben antes de que termine de leerse el archivo
+    counts = import_ndjson(db, exported, batch_size=10)
+    assert counts['system_logs'] == 30
+    assert counts['agent_memory'] == 1
+
+    partition = directory / 'project_ConsorcioOpt.db'
+    assert _count(partition, 'system_logs', AGENT) == 30
+    assert _count(directory / 'shared.db', 'system_logs', AGENT) == 0
+    assert _count(partition, 'agent_history', AGENT) == 1
+    assert len(db.get_logs(limit=100, agent_id=AGENT)) == 30
+
+    # Otro proceso que abre las mismas particiones encuentra lo importado
+    reopened = PartitionedDatabaseManager(str(directory))
+    assert len(reopened.get_logs(limit=100, agent_id=AGENT)) == 30
+    assert reopened.get_task(task['id'])['project'] == 'ConsorcioOpt'
+    assert len(reopened.get_memory_items(AGENT)['conversation_history']) == 1
+
+
+def test_agent_logs_include_the_shared_partition(tmp_path):
+    db = PartitionedDatabaseManager(str(tmp_path))
+    # Logs escritos antes de que exista la memoria del agente quedan en la compartida
+    db.log_event('agent_action', AGENT, 'Antes')
+    db.get_or_create_agent_memory(AGENT, 'ConsorcioOpt')
+    db.log_event('agent_action', AGENT, 'Después')
+    assert os.path.exists(tmp_path / 'project_ConsorcioOpt.db')
+    assert [log['description'] for log in db.get_logs(agent_id=AGENT)] == ['Después', 'Antes']
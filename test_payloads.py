@@ -0,0 +1,135 @@
+"""
+Pruebas de Payloads Deduplicados
+Referencias a contenidos grandes, limpieza de huérfanos y búsqueda sobre contenidos dehidratados (sin LLM)
+"""
+
+import json
+
+import pytest
+
+from database import (
+    PAYLOAD_KEY, PAYLOAD_MIN_BYTES, PAYLOAD_PREFIX, DatabaseManager, Payload,
+    _dehydrate_history_entry, _dehydrate_json, _dehydrate_text, _payload_hash,
+    _rehydrate_history, _rehydrate_json, _rehydrate_text
+)
+from memory_index import build_agent_index
+
+AGENT = 'OptimizadorConsorcio'
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(f"sqlite:///{tmp_path / 'payloads.db'}")
+
+
+def _payload_count(db):
+    session = db.get_session()
+    try:
+        return session.query(Payload).count()
+    finally:
+        session.close()
+
+
+def _result(analysis, size):
+    """Resultado de agente cuyo json.dumps ocupa exactamente `size` bytes"""
+    result = {'analisis': analysis, 'notas': ''}
+    result['notas'] = 'x' * (size - len(json.dumps(result, ensure_ascii=False).encode('utf-8')))
+    return result
+
+
+# --- Umbral ---
+
+def test_text_below_the_threshold_is_kept_inline(db):
+    # 'ñ' ocupa dos bytes: el umbral se mide en bytes, no en caracteres
+    value = 'ñ' * ((PAYLOAD_MIN_BYTES - 1) // 2) + 'a' * ((PAYLOAD_MIN_BYTES - 1) % 2)
+    assert len(value.encode('utf-8')) == PAYLOAD_MIN_BYTES - 1
+    with db.engine.begin() as conn:
+        assert _dehydrate_text(conn, value) == value
+    assert _payload_count(db) == 0
+
+
+def test_text_at_the_threshold_round_trips(db):
+    value = 'ñ' * (PAYLOAD_MIN_BYTES // 2)
+    assert len(value.encode('utf-8')) == PAYLOAD_MIN_BYTES
+    with db.engine.begin() as conn:
+        ref = _dehydrate_text(conn, value)
+        # Dehidratar una referencia o el mismo contenido no crea payloads nuevos
+        assert _dehydrate_text(conn, ref) == ref
+        assert _dehydrate_text(conn, value) == ref
+    assert ref.startswith(PAYLOAD_PREFIX)
+    assert _rehydrate_text(ref, db.load_payloads([_payload_hash(ref)]).get) == value
+    assert _payload_count(db) == 1
+
+
+def test_json_round_trips_at_the_threshold(db):
+    below = _result('Cobranza', PAYLOAD_MIN_BYTES - 1)
+    at = _result('Cobranza', PAYLOAD_MIN_BYTES)
+    with db.engine.begin() as conn:
+        assert _dehydrate_json(conn, below) == below
+        ref = _dehydrate_json(conn, at)
+    assert list(ref) == [PAYLOAD_KEY]
+    assert _rehydrate_json(ref, db.load_payloads([_payload_hash(ref)]).get) == at
+
+
+def test_history_entry_round_trips(db):
+    entry = {'task_id': 't1', 'response': _result('Cobranza', 2 * PAYLOAD_MIN_BYTES), 'timestamp': 'hoy'}
+    with db.engine.begin() as conn:
+        stored = _dehydrate_history_entry(conn, entry)
+    assert stored['task_id'] == 't1' and _payload_hash(stored['response'])
+    resolve = db.load_payloads([_payload_hash(stored['response'])]).get
+    assert _rehydrate_history([stored, 'texto suelto'], resolve) == [entry, 'texto suelto']
+
+
+def test_missing_payload_keeps_the_reference():
+    ref = PAYLOAD_PREFIX + '0' * 32
+    assert _rehydrate_text(ref, {}.get) == ref
+    assert _rehydrate_json({PAYLOAD_KEY: '0' * 32}, {}.get) == {PAYLOAD_KEY: '0' * 32}
+
+
+# --- Limpieza ---
+
+def test_purge_keeps_referenced_payloads(db):
+    db.get_or_create_agent_memory(AGENT, 'ConsorcioOpt')
+    result = _result('Análisis de morosidad', 2 * PAYLOAD_MIN_BYTES)
+    notes = json.dumps(result, ensure_ascii=False)
+    kept = db.create_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    db.update_task(kept['id'], notes=notes)
+    # Mismo contenido en notas e historial: un solo payload para ambos
+    db.update_agent_memory(AGENT, conversation_history={'task_id': kept['id'], 'response': result})
+    db.log_event('task_processed', AGENT, 'Procesada', metadata=_result('Log', 2 * PAYLOAD_MIN_BYTES))
+    orphan = db.create_task('ConsorcioOpt', 'Temporal', 'Detalle')
+    db.update_task(orphan['id'], notes='z' * PAYLOAD_MIN_BYTES)
+    db.delete_task(orphan['id'])
+    assert _payload_count(db) == 3
+
+    assert db.purge_payloads() == 1
+    assert db.purge_payloads() == 0
+    assert db.get_task(kept['id'])['notes'] == notes
+    assert db.get_memory_items(AGENT)['conversation_history'][0]['response'] == result
+    assert db.get_logs(limit=1)[0]['metadata'] == _result('Log', 2 * PAYLOAD_MIN_BYTES)
+
+
+# --- Búsqueda ---
+
+def test_search_finds_dehydrated_notes(db):
+    task = db.create_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    notes = json.dumps(_result('Plan de refinanciación de expensas', 2 * PAYLOAD_MIN_BYTES), ensure_ascii=False)
+    db.update_task(task['id'], notes=notes)
+    assert [hit['id'] for hit in db.search_tasks('refinanciacion expensas')] == [task['id']]
+    # Reconstruir el índice vuelve a resolver las referencias
+    db.rebuild_search_index()
+    assert [hit['id'] for hit in db.search_tasks('refinanciación')] == [task['id']]
+
+
+def test_recall_finds_dehydrated_history(db):
+    db.get_or_create_agent_memory(AGENT, 'ConsorcioOpt')
+    db.update_agent_memory(AGENT, conversation_history={
+        'task_id': 't1', 'response': _result('Renegociar el contrato de ascensores', 2 * PAYLOAD_MIN_BYTES)
+    })
+    db.update_agent_memory(AGENT, conversation_history={
+        'task_id': 't2', 'response': {'analisis': 'Campaña de redes sociales'}
+    })
+    items = db.get_memory_items(AGENT)
+    hits = build_agent_index(items['conversation_history'], items['decisions_made']).search('ascensores')
+    assert len(hits) == 1
+    assert 'Tarea t1' in hits[0][1]['text']
@@ -0,0 +1,69 @@
+"""
+Pruebas del Perfilado por Solicitud
+Muestreo limitado a los hilos de la solicitud (sin servidor ni LLM)
+"""
+
+import asyncio
+import threading
+import time
+
+from profiling import ProfileStore, SamplingProfiler, profile_request, track_thread
+
+
+def _busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _background_work(stop):
+    while not stop.is_set():
+        _busy(0.001)
+
+
+def test_background_threads_are_not_sampled():
+    stop = threading.Event()
+    background = threading.Thread(target=_background_work, args=(stop,), daemon=True)
+    background.start()
+    try:
+        profiler = SamplingProfiler(interval=0.001).track().start()
+        _busy(0.1)
+        profiler.stop()
+    finally:
+        stop.set()
+        background.join()
+    collapsed = profiler.collapsed()
+    assert 'test_profiling.py:_busy' in collapsed
+    assert '_background_work' not in collapsed
+
+
+class _Request:
+    method = 'POST'
+
+    class url:
+        path = '/api/coordinate/dispatch'
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self):
+        self.headers = {}
+
+
+def test_threadpool_handlers_join_the_profile():
+    def handler():
+        track_thread()
+        _busy(0.1)
+        return _Response()
+
+    async def call_next(request):
+        return await asyncio.to_thread(handler)
+
+    store = ProfileStore()
+    response = asyncio.run(profile_request(_Request(), call_next, store, interval=0.001))
+    profile = store.get(response.headers['X-Profile-Id'])
+    assert profile['path'] == '/api/coordinate/dispatch'
+    assert 'test_profiling.py:handler;test_profiling.py:_busy' in profile['collapsed']
+    # Fuera de una solicitud perfilada no hace nada
+    track_thread()
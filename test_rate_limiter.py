@@ -0,0 +1,124 @@
+"""
+Pruebas del Limitador de Tasa
+Recarga de los token buckets, esperas y presupuesto compartido entre instancias (sin LLM)
+"""
+
+import pytest
+
+import rate_limiter
+from rate_limiter import TokenBucketRateLimiter, estimate_tokens
+
+
+class FakeClock:
+    """Reloj controlado para time.time; time.sleep lo adelanta en lugar de dormir"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, 'time', clock.time)
+    monkeypatch.setattr(rate_limiter.time, 'sleep', clock.sleep)
+    return clock
+
+
+def _limiter(tmp_path, **limits):
+    return TokenBucketRateLimiter(path=str(tmp_path / 'limits.db'), **limits)
+
+
+def test_disabled_without_limits(tmp_path, clock):
+    limiter = _limiter(tmp_path)
+    assert not limiter.enabled
+    assert limiter.acquire(10_000) == 0.0
+    assert not (tmp_path / 'limits.db').exists()
+
+
+def test_requests_wait_for_the_refill(tmp_path, clock):
+    limiter = _limiter(tmp_path, requests_per_minute=60)
+    for _ in range(60):
+        limiter.acquire()
+    assert clock.sleeps == []
+    # Bucket vacío: una solicitud por segundo (en pasos de a lo sumo max_sleep)
+    limiter.acquire()
+    assert clock.sleeps == [pytest.approx(1.0)]
+    clock.now += 5
+    for _ in range(5):
+        limiter.acquire()
+    assert len(clock.sleeps) == 1
+    stats = limiter.get_stats()
+    assert stats['acquired'] == 66
+    assert stats['waited'] == 1
+
+
+def test_refill_is_capped_at_the_capacity(tmp_path, clock):
+    limiter = _limiter(tmp_path, requests_per_minute=10)
+    for _ in range(10):
+        limiter.acquire()
+    clock.now += 3600
+    for _ in range(10):
+        limiter.acquire()
+    assert clock.sleeps == []
+    # Una solicitud cada 6 s, en pasos de max_sleep
+    limiter.acquire()
+    assert sum(clock.sleeps) == pytest.approx(6.0)
+    assert len(clock.sleeps) == 6
+
+
+def test_token_bucket_and_long_waits(tmp_path, clock):
+    limiter = TokenBucketRateLimiter(path=str(tmp_path / 'limits.db'), tokens_per_minute=6000, max_sleep=2.0)
+    limiter.acquire(6000)
+    # 3000 tokens a 100 por segundo: 30 s en pasos de max_sleep
+    limiter.acquire(3000)
+    assert sum(clock.sleeps) == pytest.approx(30.0)
+    assert max(clock.sleeps) == 2.0
+    # Una llamada mayor que la capacidad solo espera el bucket lleno
+    clock.sleeps.clear()
+    limiter.acquire(20_000)
+    assert sum(clock.sleeps) == pytest.approx(60.0)
+
+
+def test_all_buckets_are_consumed_together(tmp_path, clock):
+    limiter = _limiter(tmp_path, requests_per_minute=60, tokens_per_minute=600)
+    limiter.acquire(600)
+    # Hay solicitudes pero no tokens: no se consume ninguna mientras espera
+    limiter.acquire(10)
+    assert sum(clock.sleeps) == pytest.approx(1.0)
+
+
+def test_adjust_returns_unused_tokens(tmp_path, clock):
+    limiter = _limiter(tmp_path, tokens_per_minute=1000)
+    limiter.acquire(1000)
+    limiter.adjust_tokens(estimated=1000, actual=400)
+    limiter.acquire(600)
+    assert clock.sleeps == []
+    # Usar más de lo estimado deja el bucket en negativo
+    limiter.adjust_tokens(estimated=0, actual=300)
+    limiter.acquire(100)
+    assert sum(clock.sleeps) == pytest.approx(24.0)
+
+
+def test_instances_share_the_budget(tmp_path, clock):
+    first = _limiter(tmp_path, requests_per_minute=2)
+    second = _limiter(tmp_path, requests_per_minute=2)
+    first.acquire()
+    first.acquire()
+    second.acquire()
+    assert sum(clock.sleeps) == pytest.approx(30.0)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens([], completion_tokens=0) == 0
+    short = estimate_tokens(['hola'], completion_tokens=0)
+    assert 4 < short < 10
+    assert estimate_tokens(['hola'] * 3, completion_tokens=100) == 3 * short + 100
+    assert estimate_tokens(['palabra ' * 500], completion_tokens=0) > 400
@@ -0,0 +1,130 @@
+"""
+Pruebas del Enrutamiento de Modelos
+Elección de nivel, políticas por agente y respaldo ante errores con un cliente simulado (sin LLM)
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import routing
+from routing import TIERED_POLICY, ModelRouter
+
+AGENT = 'OptimizadorConsorcio'
+MESSAGES = [SimpleNamespace(content='Revisar la cobranza de marzo')]
+
+
+class FakeModels:
+    """client_factory + invoke: los modelos en `failing` lanzan error"""
+
+    def __init__(self, *failing):
+        self.failing = set(failing)
+        self.calls = []
+
+    def client(self, model, temperature):
+        return model
+
+    def invoke(self, messages, client):
+        self.calls.append(client)
+        if client in self.failing:
+            raise RuntimeError(f'{client} no disponible')
+        return SimpleNamespace(content='{}', usage_metadata={'input_tokens': 1000, 'output_tokens': 500})
+
+
+def _router(models, **options):
+    return ModelRouter(models.client, models.invoke, **options)
+
+
+def _model(tier):
+    return routing.MODEL_TIERS[tier]['model']
+
+
+def test_default_policy_keeps_the_standard_tier():
+    router = _router(FakeModels())
+    for priority in ('low', 'medium', 'high', 'urgent', None):
+        for prompt_tokens in (0, 100_000):
+            assert router.choose(AGENT, priority, prompt_tokens)[0] == 'standard'
+
+
+def test_tiered_policy_by_priority_and_prompt_size():
+    router = _router(FakeModels(), default_policy=TIERED_POLICY)
+    assert router.choose(AGENT, 'low', 5000)[0] == 'small'
+    assert router.choose(AGENT, 'medium', 5000)[0] == 'standard'
+    assert router.choose(AGENT, 'urgent', 5000)[0] == 'large'
+    # Prompts cortos bajan un nivel, salvo en tareas high o urgent
+    assert router.choose(AGENT, 'medium', 500)[0] == 'small'
+    assert router.choose(AGENT, 'high', 500)[0] == 'standard'
+    assert router.choose(AGENT, None, 500)[0] == 'small'
+    # Prompts largos suben uno (sin pasar del máximo)
+    assert router.choose(AGENT, 'medium', 8000)[0] == 'large'
+    assert router.choose(AGENT, 'urgent', 8000)[0] == 'large'
+
+
+def test_fallbacks_go_up_then_down():
+    router = _router(FakeModels())
+    assert router.choose(AGENT, 'medium') == ['standard', 'large', 'small']
+    router.set_policy(AGENT, priority_tiers={'medium': 'large'})
+    assert router.choose(AGENT, 'medium') == ['large', 'standard', 'small']
+
+
+def test_policies_are_per_agent_and_validated():
+    router = _router(FakeModels())
+    router.set_policy(AGENT, priority_tiers={'low': 'small'}, small_prompt_tokens=1000)
+    assert router.choose(AGENT, 'low', 5000)[0] == 'small'
+    assert router.choose(AGENT, 'medium', 500)[0] == 'small'
+    assert router.choose('MentorEmprendedor', 'low', 500)[0] == 'standard'
+    with pytest.raises(ValueError):
+        router.set_policy(AGENT, priority_tiers={'low': 'enorme'})
+    with pytest.raises(ValueError):
+        router.set_policy(AGENT, temperatura=0.2)
+
+
+def test_failed_call_falls_back_to_the_next_tier():
+    models = FakeModels(_model('standard'))
+    router = _router(models)
+    response, tier = router.invoke(AGENT, MESSAGES, priority='medium')
+    assert tier == 'large'
+    assert models.calls == [_model('standard'), _model('large')]
+    routes = router.get_stats()['routes'][AGENT]
+    assert routes['standard']['errors'] == 1
+    assert routes['large']['fallbacks'] == 1
+    assert routes['large']['cost_usd'] == pytest.approx((1000 * 2.00 + 500 * 8.00) / 1_000_000)
+
+
+def test_all_tiers_failing_raises_the_last_error():
+    models = FakeModels(*(_model(tier) for tier in routing.TIER_ORDER))
+    with pytest.raises(RuntimeError, match=_model('small')):
+        _router(models).invoke(AGENT, MESSAGES)
+    assert len(models.calls) == 3
+
+
+def test_degraded_route_moves_last_until_retried(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(routing.time, 'monotonic', lambda: now[0])
+    models = FakeModels(_model('standard'))
+    router = _router(models)
+    for _ in range(5):
+        router.invoke(AGENT, MESSAGES)
+    assert router.choose(AGENT, 'medium') == ['large', 'small', 'standard']
+    # Pasado retry_after_seconds sin uso, la ruta vuelve a su lugar
+    now[0] += 60
+    assert router.choose(AGENT, 'medium')[0] == 'standard'
+
+
+def test_unusable_responses_count_against_the_route():
+    router = _router(FakeModels())
+    for _ in range(5):
+        _, tier = router.invoke(AGENT, MESSAGES)
+        router.record_failure(AGENT, tier)
+    assert router.choose(AGENT, 'medium')[-1] == 'standard'
+
+
+def test_policy_from_env(monkeypatch):
+    models = FakeModels()
+    monkeypatch.setenv('LLM_ROUTING', 'tiered')
+    assert ModelRouter.from_env(models.client, models.invoke).choose(AGENT, 'urgent')[0] == 'large'
+    monkeypatch.delenv('LLM_ROUTING')
+    assert ModelRouter.from_env(models.client, models.invoke).choose(AGENT, 'urgent')[0] == 'standard'
+    monkeypatch.setenv('LLM_ROUTING', 'barato')
+    with pytest.raises(ValueError):
+        ModelRouter.from_env(models.client, models.invoke)
@@ -0,0 +1,143 @@
+"""
+Pruebas del Planificador de Tareas
+Orden por prioridad, envejecimiento y reparto justo entre proyectos (sin base de datos ni LLM)
+"""
+
+import scheduler
+from scheduler import TaskScheduler
+
+
+class FakeClock:
+    """Reloj controlado para time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _task(task_id, project='ConsorcioOpt', priority='medium'):
+    return {'id': task_id, 'project': project, 'priority': priority}
+
+
+def _drain(queue):
+    order = []
+    while True:
+        task_id = queue.next_task()
+        if task_id is None:
+            return order
+        order.append(task_id)
+
+
+def test_priority_order_and_fifo(monkeypatch):
+    monkeypatch.setattr(scheduler.time, 'monotonic', FakeClock())
+    queue = TaskScheduler()
+    queue.enqueue(_task('low', priority='low'))
+    queue.enqueue(_task('medium-1'))
+    queue.enqueue(_task('urgent', priority='urgent'))
+    queue.enqueue(_task('medium-2'))
+    queue.enqueue(_task('high', priority='high'))
+    assert _drain(queue) == ['urgent', 'high', 'medium-1', 'medium-2', 'low']
+
+
+def test_unknown_priority_is_medium_and_duplicates_are_ignored(monkeypatch):
+    monkeypatch.setattr(scheduler.time, 'monotonic', FakeClock())
+    queue = TaskScheduler()
+    assert queue.enqueue(_task('a', priority='???'))
+    assert not queue.enqueue(_task('a'))
+    queue.enqueue(_task('b', priority='low'))
+    assert len(queue) == 2
+    assert _drain(queue) == ['a', 'b']
+
+
+def test_removed_tasks_are_skipped(monkeypatch):
+    monkeypatch.setattr(scheduler.time, 'monotonic', FakeClock())
+    queue = TaskScheduler()
+    queue.enqueue(_task('a', priority='urgent'))
+    queue.enqueue(_task('b'))
+    assert queue.remove('a')
+    assert not queue.remove('a')
+    assert _drain(queue) == ['b']
+    assert len(queue) == 0
+
+
+def test_aging_lets_old_low_priority_tasks_through(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler.time, 'monotonic', clock)
+    queue = TaskScheduler(aging_seconds=60)
+    queue.enqueue(_task('old-low', priority='low'))
+    # 1 + 600/60 = 11 supera al peso 8 de una urgente recién llegada
+    clock.now += 600
+    queue.enqueue(_task('new-urgent', priority='urgent'))
+    assert _drain(queue) == ['old-low', 'new-urgent']
+
+
+def test_aging_not_enough_keeps_priority(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler.time, 'monotonic', clock)
+    queue = TaskScheduler(aging_seconds=60)
+    queue.enqueue(_task('old-low', priority='low'))
+    clock.now += 120
+    queue.enqueue(_task('new-urgent', priority='urgent'))
+    assert _drain(queue) == ['new-urgent', 'old-low']
+
+
+def test_fair_share_penalizes_project_over_its_share(monkeypatch):
+    monkeypatch.setattr(scheduler.time, 'monotonic', FakeClock())
+    queue = TaskScheduler(fairness_weight=1.0)
+    queue.record_usage('ConsorcioOpt', 90)
+    queue.record_usage('SocialConsorcio', 10)
+    queue.enqueue(_task('busy', project='ConsorcioOpt'))
+    queue.enqueue(_task('idle', project='SocialConsorcio'))
+    assert _drain(queue) == ['idle', 'busy']
+
+
+def test_project_shares_allow_a_larger_consumption(monkeypatch):
+    monkeypatch.setattr(scheduler.time, 'monotonic', FakeClock())
+    queue = TaskScheduler(project_shares={'ConsorcioOpt': 9.0, 'SocialConsorcio': 1.0})
+    queue.record_usage('ConsorcioOpt', 85)
+    queue.record_usage('SocialConsorcio', 15)
+    queue.enqueue(_task('big-share', project='ConsorcioOpt'))
+    queue.enqueue(_task('small-share', project='SocialConsorcio'))
+    # ConsorcioOpt usó menos que su 90%: SocialConsorcio es la penalizada
+    assert _drain(queue) == ['big-share', 'small-share']
+
+
+def test_usage_decays_with_half_life(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler.time, 'monotonic', clock)
+    queue = TaskScheduler(usage_half_life=10)
+    queue.record_usage('ConsorcioOpt', 80)
+    clock.now += 20
+    usage = queue.get_stats()['project_usage_seconds']
+    assert usage['ConsorcioOpt'] == 20.0
+
+
+def test_stats_track_waits(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler.time, 'monotonic', clock)
+    queue = TaskScheduler()
+    queue.enqueue(_task('a', priority='high'))
+    clock.now += 5
+    assert queue.next_task() == 'a'
+    stats = queue.get_stats()['by_priority']['high']
+    assert stats['enqueued'] == 1
+    assert stats['dispatched'] == 1
+    assert stats['avg_wait_seconds'] == 5.0
+    assert stats['queue_depth'] == 0
+
+
+def test_requeued_task_is_dispatched_once(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler.time, 'monotonic', clock)
+    queue = TaskScheduler()
+    queue.enqueue(_task('a', priority='urgent'))
+    queue.enqueue(_task('b'))
+    # La entrada vieja de 'a' queda obsoleta: solo cuenta la nueva, con su nueva prioridad
+    assert queue.remove('a')
+    clock.now += 1
+    assert queue.enqueue(_task('a', priority='low'))
+    assert len(queue) == 2
+    assert queue.get_stats()['by_priority']['urgent']['queue_depth'] == 0
+    assert _drain(queue) == ['b', 'a']
@@ -0,0 +1,104 @@
+"""
+Pruebas de Búsqueda de Texto Completo
+Índices FTS5 sincronizados por triggers y reconstrucción sobre bases existentes (sin LLM)
+"""
+
+import sqlite3
+
+import pytest
+
+from database import DatabaseManager, _fts_query
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / 'search.db'
+
+
+def _ids(hits):
+    return [hit['id'] for hit in hits]
+
+
+def test_fts_query_quotes_terms():
+    assert _fts_query('cobranza "AND" expen*') == '"cobranza" "AND" "expen"*'
+    assert _fts_query(' -- ') == ''
+
+
+def test_tasks_follow_inserts_updates_and_deletes(path):
+    db = DatabaseManager(f"sqlite:///{path}")
+    task = db.create_task('ConsorcioOpt', 'Cobranza de expensas', 'Morosos de marzo')
+    assert _ids(db.search_tasks('expensas')) == [task['id']]
+    assert _ids(db.search_tasks('morosos', project='SocialConsorcio')) == []
+
+    db.update_task(task['id'], title='Mantenimiento del ascensor', notes='Pedir presupuestos')
+    assert db.search_tasks('expensas') == []
+    assert _ids(db.search_tasks('ascensor')) == [task['id']]
+    assert _ids(db.search_tasks('presupuesto*')) == [task['id']]
+    # Actualizar otras columnas no toca el texto indexado
+    db.update_task(task['id'], status='completed')
+    assert _ids(db.search_tasks('ascensor', status='completed')) == [task['id']]
+
+    db.delete_task(task['id'])
+    assert db.search_tasks('ascensor') == []
+    assert db.search_tasks('presupuestos') == []
+
+
+def test_deleting_a_parent_removes_its_subtasks(path):
+    db = DatabaseManager(f"sqlite:///{path}")
+    parent = db.create_task('ConsorcioOpt', 'Plan anual', 'Detalle')
+    db.create_subtasks(parent['id'], [{'title': 'Relevar ascensores'}])
+    assert len(db.search_tasks('ascensores')) == 1
+    db.delete_task(parent['id'])
+    assert db.search_tasks('ascensores') == []
+
+
+def test_logs_are_searchable(path):
+    db = DatabaseManager(f"sqlite:///{path}")
+    db.log_event('task_processed', 'OptimizadorConsorcio', 'Plan de refinanciación listo')
+    db.log_event('chat', 'MentorEmprendedor', 'Consulta sobre financiación')
+    assert len(db.search_logs('refinanciacion')) == 1
+    assert len(db.search_logs('financiacion', agent_id='MentorEmprendedor')) == 1
+    assert db.search_logs('financiacion', event_type='task_processed') == []
+
+
+def test_writes_from_other_connections_are_indexed(path):
+    db = DatabaseManager(f"sqlite:///{path}")
+    task = db.create_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    # Los triggers son SQL estándar: también los dispara un cliente sqlite3 cualquiera
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE tasks SET description = 'Revisar medidores de gas' WHERE id = ?", (task['id'],))
+    assert _ids(db.search_tasks('medidores')) == [task['id']]
+
+
+def test_existing_database_is_indexed(path):
+    db = DatabaseManager(f"sqlite:///{path}")
+    task = db.create_task('ConsorcioOpt', 'Cobranza de expensas', 'Detalle')
+    db.update_task(task['id'], notes='Refinanciar deudas ' * 40)
+    db.log_event('task_processed', None, 'Plan de refinanciación listo')
+    # Base de una versión sin índices de búsqueda
+    with sqlite3.connect(path) as conn:
+        for fts in ('tasks_fts', 'system_logs_fts'):
+            conn.execute(f"DROP TABLE {fts}")
+            for suffix in ('ai', 'ad', 'au'):
+                conn.execute(f"DROP TRIGGER {fts}_{suffix}")
+
+    reopened = DatabaseManager(f"sqlite:///{path}")
+    assert _ids(reopened.search_tasks('expensas')) == [task['id']]
+    # Las notas guardadas como payload se indexan con su contenido
+    assert _ids(reopened.search_tasks('deudas')) == [task['id']]
+    assert len(reopened.search_logs('refinanciacion')) == 1
+
+
+def test_rebuild_restores_a_stale_index(path):
+    db = DatabaseManager(f"sqlite:///{path}")
+    task = db.create_task('ConsorcioOpt', 'Cobranza', 'Detalle')
+    db.update_task(task['id'], notes='Refinanciar deudas ' * 40)
+    db.log_event('task_processed', None, 'Plan de refinanciación listo')
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM tasks_fts")
+    assert db.search_tasks('deudas') == []
+
+    assert db.rebuild_search_index()
+    assert _ids(db.search_tasks('deudas')) == [task['id']]
+    assert _ids(db.search_tasks('cobranza')) == [task['id']]
+    assert len(db.search_logs('refinanciacion')) == 1
@@ -0,0 +1,109 @@
+"""
+Pruebas de Subtareas
+Dependencias de las subtareas propuestas, estado de la tarea padre y cambio de proyecto (sin LLM)
+"""
+
+import os
+
+# agents crea el cliente del LLM al importarse; estas pruebas no lo llaman
+os.environ.setdefault("OPENAI_API_KEY", "sin-uso")
+
+from agents import subtask_specs
+from database import DatabaseManager, rollup_status
+from partitioning import PartitionedDatabaseManager
+
+
+# --- subtask_specs ---
+
+def test_specs_keep_only_backward_dependencies():
+    result = {
+        'subtareas': ['Relevar', 'Diseñar', 'Implementar', 'Probar'],
+        # 2 -> 1 válida; 3 -> 4 apunta hacia adelante; 4 -> 4 a sí misma; 4 -> 2 y 3 válidas
+        'dependencias': {'2': [1], '3': [4], '4': [4, 2, '3']}
+    }
+    specs = subtask_specs(result)
+    assert [spec['title'] for spec in specs] == ['Relevar', 'Diseñar', 'Implementar', 'Probar']
+    assert [spec['depends_on'] for spec in specs] == [[], [0], [], [1, 2]]
+
+
+def test_specs_skip_empty_titles_and_remap_positions():
+    result = {
+        'subtareas': ['Primera', '', {'titulo': 'Tercera'}, None, 'Quinta'],
+        # La 2 y la 4 se descartan: depender de ellas no genera dependencias
+        'dependencias': {'3': [1, 2], '5': [3, 4]}
+    }
+    specs = subtask_specs(result)
+    assert [spec['title'] for spec in specs] == ['Primera', 'Tercera', 'Quinta']
+    assert [spec['depends_on'] for spec in specs] == [[], [0], [1]]
+
+
+def test_specs_ignore_malformed_dependencies():
+    specs = subtask_specs({'subtareas': ['A', 'B'], 'dependencias': ['1', '2']})
+    assert [spec['depends_on'] for spec in specs] == [[], []]
+    specs = subtask_specs({'subtareas': ['A', 'B'], 'dependencias': {'2': ['x', None, 1]}})
+    assert [spec['depends_on'] for spec in specs] == [[], [0]]
+    assert subtask_specs({}) == []
+
+
+def test_specs_describe_the_parent_and_truncate_titles():
+    parent = {'title': 'Campaña', 'description': 'Lanzamiento de diciembre'}
+    specs = subtask_specs({'subtareas': ['x' * 300]}, parent)
+    assert len(specs[0]['title']) == 200
+    assert specs[0]['description'] == "Subtarea de: Campaña\n\nLanzamiento de diciembre"
+
+
+# --- rollup_status ---
+
+def test_rollup_status():
+    assert rollup_status([]) is None
+    assert rollup_status(['completed', 'completed']) == 'completed'
+    assert rollup_status(['completed', 'blocked', 'pending']) == 'blocked'
+    assert rollup_status(['completed', 'pending']) == 'in_progress'
+    assert rollup_status(iter(['pending'])) == 'in_progress'
+
+
+def test_parent_status_follows_children(tmp_path):
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'subtasks.db'}")
+    parent = db.create_task('ConsorcioOpt', 'Padre', 'Plan')
+    children = db.create_subtasks(parent['id'], [
+        {'title': 'A', 'description': None},
+        {'title': 'B', 'description': None, 'depends_on': [0, 5]}
+    ])
+    assert children[1]['depends_on'] == [children[0]['id']]
+    assert db.get_task(parent['id'])['status'] == 'in_progress'
+
+    db.update_task(children[0]['id'], status='blocked')
+    assert db.get_task(parent['id'])['status'] == 'blocked'
+    db.update_task(children[0]['id'], status='completed')
+    assert db.get_task(parent['id'])['status'] == 'in_progress'
+    db.update_task(children[1]['id'], status='completed')
+    assert db.get_task(parent['id'])['status'] == 'completed'
+
+
+# --- Cambio de proyecto ---
+
+def _tree(db):
+    parent = db.create_task('ConsorcioOpt', 'Padre', 'Plan')
+    children = db.create_subtasks(parent['id'], [{'title': 'A'}, {'title': 'B', 'depends_on': [0]}])
+    grandchild = db.create_subtasks(children[0]['id'], [{'title': 'A.1'}])[0]
+    return parent, children, grandchild
+
+
+def test_subtasks_follow_a_reassigned_parent(tmp_path):
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'subtasks.db'}")
+    parent, children, grandchild = _tree(db)
+    db.update_task(parent['id'], project='SocialConsorcio')
+    projects = {task['title']: task['project'] for task in db.get_all_tasks()}
+    assert projects == {'Padre': 'SocialConsorcio', 'A': 'SocialConsorcio', 'B': 'SocialConsorcio',
+                        'A.1': 'SocialConsorcio'}
+
+
+def test_partition_move_keeps_the_subtree(tmp_path):
+    db = PartitionedDatabaseManager(str(tmp_path))
+    parent, children, grandchild = _tree(db)
+    db.update_task(parent['id'], project='SocialConsorcio')
+    assert db.get_all_tasks(project='ConsorcioOpt') == []
+    moved = db.get_all_tasks(project='SocialConsorcio')
+    assert sorted(task['title'] for task in moved) == ['A', 'A.1', 'B', 'Padre']
+    assert [child['id'] for child in db.get_subtasks(parent['id'])] == [child['id'] for child in children]
+    assert db.get_task(grandchild['id'])['parent_id'] == children[0]['id']
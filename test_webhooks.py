@@ -0,0 +1,194 @@
+"""
+Pruebas del Despachador de Webhooks
+Entregas en lote, reintentos y eventos fallidos con un transporte httpx local (sin red)
+"""
+
+import json
+import time
+
+import httpx
+import pytest
+
+from database import DatabaseManager
+from webhooks import SIGNATURE_HEADER, WebhookDispatcher, matches, sign, validate_url, verify_signature
+
+
+class Receiver:
+    """Transporte httpx que responde con los códigos indicados (el último se repite)"""
+
+    def __init__(self, *codes):
+        self.codes = list(codes) or [204]
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        code = self.codes.pop(0) if len(self.codes) > 1 else self.codes[0]
+        return httpx.Response(code)
+
+    def events(self):
+        return [event for request in self.requests for event in json.loads(request.content)['events']]
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(f"sqlite:///{tmp_path / 'webhooks.db'}")
+
+
+def _dispatcher(db, receiver, **options):
+    client = httpx.Client(transport=httpx.MockTransport(receiver))
+    options = {'flush_interval': 0.02, 'retry_backoff': 0.01, 'max_attempts': 3, **options}
+    return WebhookDispatcher(db, client=client, **options).start()
+
+
+def _wait(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _task_event(dispatcher, project='ConsorcioOpt', event_type='task.updated'):
+    return dispatcher.enqueue(event_type, {'task': {'id': 't1', 'project': project, 'status': 'pending'}})
+
+
+def test_batches_events_per_subscription(db):
+    db.create_webhook('https://hooks.example/a')
+    db.create_webhook('https://hooks.example/b', project='SocialConsorcio')
+    receiver = Receiver(204)
+    dispatcher = _dispatcher(db, receiver, flush_interval=0.1, batch_size=2)
+    try:
+        for _ in range(3):
+            _task_event(dispatcher)
+        assert _wait(lambda: dispatcher.get_stats()['events_delivered'] == 3)
+    finally:
+        dispatcher.stop()
+    # Solo la suscripción sin filtro de proyecto: 3 eventos en lotes de 2
+    assert [str(request.url) for request in receiver.requests] == ['https://hooks.example/a'] * 2
+    assert len(receiver.events()) == 3
+
+
+def test_retries_until_delivered(db):
+    db.create_webhook('https://hooks.example/a')
+    receiver = Receiver(503, 429, 204)
+    dispatcher = _dispatcher(db, receiver)
+    try:
+        _task_event(dispatcher)
+        assert _wait(lambda: dispatcher.get_stats()['events_delivered'] == 1)
+    finally:
+        dispatcher.stop()
+    stats = dispatcher.get_stats()
+    assert stats['retries'] == 2
+    assert stats['failed_requests'] == 2
+    assert stats['dead_letters'] == 0
+    assert db.get_dead_letters() == []
+
+
+def test_dead_letter_after_max_attempts(db):
+    subscription = db.create_webhook('https://hooks.example/a')
+    dispatcher = _dispatcher(db, Receiver(500))
+    try:
+        event = _task_event(dispatcher)
+        assert _wait(lambda: dispatcher.get_stats()['dead_letters'] == 1)
+    finally:
+        dispatcher.stop()
+    dead_letter = db.get_dead_letters()[0]
+    assert dead_letter['subscription_id'] == subscription['id']
+    assert dead_letter['event_id'] == event['id']
+    assert dead_letter['attempts'] == 3
+    assert dead_letter['last_error'] == 'HTTP 500'
+
+
+def test_client_errors_are_not_retried(db):
+    db.create_webhook('https://hooks.example/a')
+    receiver = Receiver(401)
+    dispatcher = _dispatcher(db, receiver)
+    try:
+        _task_event(dispatcher)
+        assert _wait(lambda: dispatcher.get_stats()['dead_letters'] == 1)
+    finally:
+        dispatcher.stop()
+    assert len(receiver.requests) == 1
+    assert db.get_dead_letters()[0]['attempts'] == 1
+
+
+def test_unexpected_errors_do_not_stop_the_dispatcher(db):
+    db.create_webhook('https://hooks.example/a')
+    get_webhooks = db.get_webhooks
+    failures = iter([RuntimeError('base bloqueada')])
+
+    def flaky_get_webhooks(**options):
+        error = next(failures, None)
+        if error:
+            raise error
+        return get_webhooks(**options)
+
+    db.get_webhooks = flaky_get_webhooks
+    dispatcher = _dispatcher(db, Receiver(204))
+    try:
+        _task_event(dispatcher)
+        assert _wait(lambda: dispatcher.get_stats()['errors'] == 1)
+        _task_event(dispatcher)
+        assert _wait(lambda: dispatcher.get_stats()['events_delivered'] == 1)
+        stats = dispatcher.get_stats()
+        assert stats['running']
+        assert stats['events_dropped'] == 1
+        assert stats['last_error'] == 'RuntimeError: base bloqueada'
+    finally:
+        dispatcher.stop()
+    assert not dispatcher.get_stats()['running']
+
+
+def test_invalid_url_goes_to_dead_letters(db):
+    db.create_webhook('http://x\x00y')
+    dispatcher = WebhookDispatcher(db, flush_interval=0.02).start()
+    try:
+        _task_event(dispatcher)
+        assert _wait(lambda: dispatcher.get_stats()['dead_letters'] == 1)
+        assert dispatcher.get_stats()['running']
+    finally:
+        dispatcher.stop()
+    assert db.get_dead_letters()[0]['last_error'].startswith('InvalidURL')
+
+
+def test_redeliver_dead_letter(db):
+    db.create_webhook('https://hooks.example/a')
+    receiver = Receiver(401, 204)
+    dispatcher = _dispatcher(db, receiver)
+    try:
+        event = _task_event(dispatcher)
+        assert _wait(lambda: dispatcher.get_stats()['dead_letters'] == 1)
+        assert dispatcher.redeliver(db.get_dead_letters()[0])
+        assert _wait(lambda: dispatcher.get_stats()['events_delivered'] == 1)
+    finally:
+        dispatcher.stop()
+    assert [delivered['id'] for delivered in receiver.events()] == [event['id'], event['id']]
+
+
+def test_signed_deliveries(db):
+    db.create_webhook('https://hooks.example/a', secret='clave')
+    receiver = Receiver(204)
+    dispatcher = _dispatcher(db, receiver)
+    try:
+        _task_event(dispatcher)
+        assert _wait(lambda: dispatcher.get_stats()['events_delivered'] == 1)
+    finally:
+        dispatcher.stop()
+    request = receiver.requests[0]
+    assert verify_signature('clave', request.content, request.headers[SIGNATURE_HEADER])
+    assert not verify_signature('otra', request.content, request.headers[SIGNATURE_HEADER])
+    assert sign('clave', b'{}').startswith('sha256=')
+
+
+def test_matches_and_validate_url():
+    event = {'type': 'task.completed', 'project': 'ConsorcioOpt'}
+    assert matches({'project': None, 'event_types': []}, event)
+    assert matches({'project': 'ConsorcioOpt', 'event_types': ['task.completed']}, event)
+    assert not matches({'project': 'SocialConsorcio', 'event_types': []}, event)
+    assert not matches({'project': None, 'event_types': ['task.processed']}, event)
+
+    validate_url('https://hooks.example/a')
+    for url in ['http://x\x00y', 'ftp://hooks.example', 'http:///sin-host', 'hooks.example']:
+        with pytest.raises(ValueError):
+            validate_url(url)
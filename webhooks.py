@@ -0,0 +1,344 @@
+"""
+Webhooks de Tareas
+Despachador en segundo plano que agrupa los eventos por suscripción y los entrega con un cliente httpx compartido
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import queue
+import random
+import threading
+import time
+import uuid
+
+import httpx
+
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+DELIVERY_HEADER = 'X-Webhook-Delivery'
+
+# Respuestas que vale la pena reintentar (el resto de los 4xx no cambia al repetir)
+RETRYABLE_STATUS = {408, 409, 425, 429}
+
+
+def sign(secret, body):
+    """Firma HMAC-SHA256 del cuerpo de una entrega"""
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret, body, signature):
+    return hmac.compare_digest(sign(secret, body), signature or '')
+
+
+def validate_url(url):
+    """ValueError si la URL no es http(s) absoluta o httpx no puede usarla"""
+    try:
+        parsed = httpx.URL(url)
+    except (httpx.InvalidURL, TypeError) as e:
+        raise ValueError(f"URL inválida: {e}")
+    if parsed.scheme not in ('http', 'https') or not parsed.host:
+        raise ValueError("La URL debe ser http:// o https:// e incluir el host")
+
+
+def matches(subscription, event):
+    """True si la suscripción quiere el evento (por proyecto y tipo)"""
+    if subscription['project'] and subscription['project'] != event['project']:
+        return False
+    return not subscription['event_types'] or event['type'] in subscription['event_types']
+
+
+class WebhookDispatcher:
+    """Entrega eventos de tareas a las suscripciones, en lotes y fuera del hilo de la solicitud.
+
+    `enqueue` (registrado como listener de DatabaseManager) solo encola el
+    evento. Un hilo de fondo junta los eventos de hasta `flush_interval`
+    segundos, los agrupa por suscripción en lotes de `batch_size` y los envía
+    como un único POST {"events": [...]} con un httpx.Client compartido (las
+    conexiones se reutilizan). Los errores de red, 5xx, 408 y 429 se reintentan
+    con espera exponencial; tras `max_attempts` intentos, o ante otro 4xx,
+    cada evento del lote pasa a la tabla de eventos fallidos.
+    """
+
+    def __init__(self, db, batch_size=50, flush_interval=0.5, max_attempts=5, retry_backoff=1.0,
+                 timeout=10.0, max_connections=20, delivery_workers=4, subscription_ttl=5.0,
+                 max_queue=10000, client=None):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.subscription_ttl = subscription_ttl
+        self.client = client or httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._retries = []  # heap de (momento, secuencia, suscripción, eventos, intento)
+        self._sequence = itertools.count()
+        self._pool = ThreadPoolExecutor(max_workers=delivery_workers, thread_name_prefix='webhook-delivery')
+        self._subscriptions = None
+        self._subscriptions_expire = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {
+            'events_queued': 0,
+            'events_dropped': 0,
+            'events_delivered': 0,
+            'requests': 0,
+            'failed_requests': 0,
+            'retries': 0,
+            'dead_letters': 0,
+            'errors': 0
+        }
+        self.last_error = None
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    # --- ENCOLADO ---
+
+    def enqueue(self, event_type, data):
+        """Listener de DatabaseManager: encola el evento sin bloquear"""
+        task = data.get('task') or {}
+        event = {
+            'id': str(uuid.uuid4()),
+            'type': event_type,
+            'project': task.get('project'),
+            'created_at': datetime.utcnow().isoformat(),
+            'data': data
+        }
+        self._put(None, event)
+        return event
+
+    def redeliver(self, dead_letter):
+        """Vuelve a encolar un evento fallido para su suscripción; False si ya no existe"""
+        subscription = next(
+            (s for s in self._load_subscriptions(force=True) if s['id'] == dead_letter['subscription_id']), None
+        )
+        if subscription is None:
+            return False
+        self._put(subscription, dead_letter['event'])
+        return True
+
+    def _put(self, subscription, event):
+        try:
+            self._queue.put_nowait((subscription, event))
+            self._count('events_queued')
+        except queue.Full:
+            self._count('events_dropped')
+
+    # --- SUSCRIPCIONES ---
+
+    def refresh_subscriptions(self):
+        """Descarta la caché de suscripciones (tras crear o eliminar una)"""
+        self._subscriptions_expire = 0.0
+
+    def _load_subscriptions(self, force=False):
+        now = time.monotonic()
+        if force or self._subscriptions is None or now >= self._subscriptions_expire:
+            self._subscriptions = self.db.get_webhooks(include_secret=True)
+            self._subscriptions_expire = now + self.subscription_ttl
+        return self._subscriptions
+
+    # --- ENTREGA ---
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='webhook-dispatcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        """Detiene el despachador tras un último intento; los reintentos pendientes quedan como fallidos"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._pool.shutdown(wait=True)
+        self.client.close()
+
+    def _run(self):
+        while True:
+            stopping = self._stop.is_set()
+            items = []
+            try:
+                items = self._collect(block=not stopping)
+                deliveries = self._route(items) if items else []
+                now = time.monotonic()
+                while self._retries and (stopping or self._retries[0][0] <= now):
+                    _, _, subscription, events, attempt = heapq.heappop(self._retries)
+                    deliveries.append((subscription, events, attempt))
+                if deliveries:
+                    self._deliver(deliveries, final=stopping)
+            except Exception as e:
+                # Un error inesperado (p.ej. la base al leer suscripciones) no detiene el hilo:
+                # los eventos del lote se descartan y el error queda en las estadísticas
+                self._record_error(e)
+                self._count('events_dropped', len(items))
+            if stopping and self._queue.empty() and not self._retries:
+                return
+
+    def _record_error(self, error):
+        with self._lock:
+            self.stats['errors'] += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+
+    def _collect(self, block=True):
+        """Eventos de una ventana de flush_interval (espera como mucho hasta el próximo reintento)"""
+        timeout = self.flush_interval
+        if self._retries:
+            timeout = min(timeout, max(0.0, self._retries[0][0] - time.monotonic()))
+        try:
+            first = self._queue.get(timeout=timeout) if block else self._queue.get_nowait()
+        except queue.Empty:
+            return []
+        items = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(items) < self.batch_size * 10:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _route(self, items):
+        """Agrupa los eventos por suscripción, en lotes de batch_size"""
+        subscriptions = None
+        groups = {}
+        for subscription, event in items:
+            if subscription is not None:
+                targets = [subscription]
+            else:
+                if subscriptions is None:
+                    subscriptions = self._load_subscriptions()
+                targets = [s for s in subscriptions if matches(s, event)]
+            for target in targets:
+                groups.setdefault(target['id'], (target, []))[1].append(event)
+        deliveries = []
+        for subscription, events in groups.values():
+            for i in range(0, len(events), self.batch_size):
+                deliveries.append((subscription, events[i:i + self.batch_size], 1))
+        return deliveries
+
+    def _deliver(self, deliveries, final=False):
+        futures = [
+            (subscription, events, attempt, self._pool.submit(self._send, subscription, events))
+            for subscription, events, attempt in deliveries
+        ]
+        for subscription, events, attempt, future in futures:
+            try:
+                error, retryable = future.result()
+            except Exception as e:
+                self._record_error(e)
+                error, retryable = f"{type(e).__name__}: {e}", False
+            if error is None:
+                self._count('events_delivered', len(events))
+                continue
+            self._count('failed_requests')
+            if retryable and attempt < self.max_attempts and not final:
+                # Espera exponencial con un poco de variación para no sincronizar reintentos
+                delay = self.retry_backoff * (2 ** (attempt - 1)) * random.uniform(1.0, 1.25)
+                heapq.heappush(self._retries, (
+                    time.monotonic() + delay, next(self._sequence), subscription, events, attempt + 1
+                ))
+                self._count('retries')
+                continue
+            if final and retryable and attempt < self.max_attempts:
+                error = f"{error} (despachador detenido)"
+            self._dead_letter(subscription, events, attempt, error)
+
+    def _dead_letter(self, subscription, events, attempt, error):
+        for event in events:
+            try:
+                self.db.add_dead_letter(subscription['id'], subscription['url'], event, attempt, error)
+                self._count('dead_letters')
+            except Exception:
+                self._count('events_dropped')
+
+    def _send(self, subscription, events):
+        """POST de un lote; devuelve (error, reintentable), con error None si se entregó"""
+        body = json.dumps({'events': events}, ensure_ascii=False, default=str).encode('utf-8')
+        headers = {'Content-Type': 'application/json', DELIVERY_HEADER: str(uuid.uuid4())}
+        if subscription.get('secret'):
+            headers[SIGNATURE_HEADER] = sign(subscription['secret'], body)
+        self._count('requests')
+        try:
+            response = self.client.post(subscription['url'], content=body, headers=headers)
+        except httpx.HTTPError as e:
+            return f"{type(e).__name__}: {e}", True
+        except Exception as e:
+            # p.ej. InvalidURL: repetir no cambia el resultado
+            return f"{type(e).__name__}: {e}", False
+        if response.is_success:
+            return None, False
+        code = response.status_code
+        return f"HTTP {code}", code >= 500 or code in RETRYABLE_STATUS
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['queue_size'] = self._queue.qsize()
+        stats['pending_retries'] = len(self._retries)
+        stats['running'] = self._thread is not None and self._thread.is_alive()
+        stats['last_error'] = self.last_error
+        return stats
+
+
+# --- RECEPTOR LOCAL ---
+
+def run_receiver(host='127.0.0.1', port=9000, secret=None, fail_rate=0.0, output=print):
+    """Receptor de prueba: muestra cada evento recibido (y verifica la firma si hay clave).
+
+    Con fail_rate > 0 responde 503 a esa fracción de las entregas, para
+    probar los reintentos y los eventos fallidos.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if secret and not verify_signature(secret, body, self.headers.get(SIGNATURE_HEADER)):
+                output(f"✗ Firma inválida ({self.headers.get(DELIVERY_HEADER)})")
+                self.send_response(401)
+                self.end_headers()
+                return
+            if fail_rate and random.random() < fail_rate:
+                output(f"↻ Falla simulada ({self.headers.get(DELIVERY_HEADER)})")
+                self.send_response(503)
+                self.end_headers()
+                return
+            try:
+                events = json.loads(body).get('events') or []
+            except ValueError:
+                self.send_response(400)
+                self.end_headers()
+                return
+            for event in events:
+                task = (event.get('data') or {}).get('task') or {}
+                output(f"✓ {event.get('created_at')} {event.get('type'):<20} {task.get('id')} "
+                       f"[{task.get('status')}] {task.get('title')}")
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    output(f"Receptor de webhooks escuchando en http://{host}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()